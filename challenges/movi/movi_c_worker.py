@@ -65,6 +65,8 @@ parser.add_argument("--hdri_assets", type=str,
 parser.add_argument("--gso_assets", type=str,
                     default="gs://kubric-public/assets/GSO/GSO.json")
 parser.add_argument("--save_state", dest="save_state", action="store_true")
+parser.add_argument("--scene_container", action="store_true",
+                    help="write all layers into a single scene.npz instead of one file per frame")
 parser.set_defaults(save_state=False, frame_end=24, frame_rate=12,
                     resolution=256)
 FLAGS = parser.parse_args()
@@ -198,7 +200,8 @@ logging.info("Rendering the scene ...")
 data_stack = renderer.render()
 
 # --- Postprocessing
-kb.compute_visibility(data_stack["segmentation"], scene.assets)
+segmentation_stats = kb.segmentation_statistics(data_stack["segmentation"])
+kb.compute_visibility(data_stack["segmentation"], scene.assets, statistics=segmentation_stats)
 visible_foreground_assets = [asset for asset in scene.foreground_assets
                              if np.max(asset.metadata["visibility"]) > 0]
 visible_foreground_assets = sorted(  # sort assets by their visibility
@@ -206,16 +209,24 @@ visible_foreground_assets = sorted(  # sort assets by their visibility
     key=lambda asset: np.sum(asset.metadata["visibility"]),
     reverse=True)
 
+segmentation_lut = kb.post_processing.segmentation_remap_lut(scene.assets,
+                                                            visible_foreground_assets)
 data_stack["segmentation"] = kb.adjust_segmentation_idxs(
     data_stack["segmentation"],
     scene.assets,
-    visible_foreground_assets)
+    visible_foreground_assets,
+    lut=segmentation_lut)
 scene.metadata["num_instances"] = len(visible_foreground_assets)
 
 # Save to image files
-kb.write_image_dict(data_stack, output_dir)
-kb.post_processing.compute_bboxes(data_stack["segmentation"],
-                                  visible_foreground_assets)
+if FLAGS.scene_container:
+  kb.write_scene_container(data_stack, output_dir)
+else:
+  kb.write_image_dict(data_stack, output_dir)
+kb.post_processing.compute_bboxes(
+    data_stack["segmentation"], visible_foreground_assets,
+    statistics=kb.post_processing.remap_segmentation_statistics(segmentation_stats,
+                                                                segmentation_lut))
 
 # --- Metadata
 logging.info("Collecting and storing metadata for each object.")
@@ -230,4 +241,4 @@ kb.write_json(filename=output_dir / "events.json", data={
         collisions, scene, assets_subset=visible_foreground_assets),
 })
 
-kb.done()
+kb.done(output_dir)
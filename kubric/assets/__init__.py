@@ -13,4 +13,6 @@
 # limitations under the License.
 
 from .asset_source import AssetSource, ClosableResource
+from .asset_cache import AssetCache
+from .manifest_index import ManifestIndex, build_manifest_index
 from . import utils
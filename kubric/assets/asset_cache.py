@@ -0,0 +1,220 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local on-disk cache of extracted assets that is shared by many processes."""
+
+import collections
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from typing import Optional
+
+import tensorflow as tf
+
+from kubric.kubric_typing import PathLike
+
+logger = logging.getLogger(__name__)
+
+
+def extract_asset(tar_path: PathLike, asset_id: str, target_dir: PathLike) -> pathlib.Path:
+  """Extracts a .tar.gz (or .tar) archive so that its content ends up in target_dir / asset_id."""
+  target_dir = pathlib.Path(target_dir)
+  with tarfile.open(tar_path, "r:*") as tar:
+    # We support two kinds of archives:
+    #  1. flat archives that do not contain any directories
+    #  2. archives where the content is in a directory with the name of the asset
+    list_of_files = tar.getnames()
+    if asset_id in list_of_files and tar.getmember(asset_id).isdir():
+      # tarfile contains directory with name object_id, so we can just extract
+      assert f"{asset_id}/data.json" in list_of_files, list_of_files
+      tar.extractall(target_dir)
+    else:
+      # tarfile contains files only, so extract into a new directory
+      assert "data.json" in list_of_files, list_of_files
+      tar.extractall(target_dir / asset_id)
+    logger.debug("Extracted %s", repr([m.name for m in tar.getmembers()]))
+  return target_dir / asset_id
+
+
+def is_asset_dir(asset_path: PathLike) -> bool:
+  """Whether the asset is stored as a plain directory (instead of an archive)."""
+  return tf.io.gfile.isdir(str(asset_path))
+
+
+def copy_asset(asset_path: PathLike, asset_id: str, target_dir: PathLike) -> int:
+  """Copies (and unpacks) an asset archive or directory to target_dir / asset_id.
+
+  Returns:
+    The number of bytes that were copied.
+  """
+  target_dir = pathlib.Path(target_dir)
+  if is_asset_dir(asset_path):
+    num_bytes = 0
+    for src_dir, _, filenames in tf.io.gfile.walk(str(asset_path)):
+      dst_dir = target_dir / asset_id / os.path.relpath(src_dir, str(asset_path))
+      dst_dir.mkdir(parents=True, exist_ok=True)
+      for filename in filenames:
+        tf.io.gfile.copy(os.path.join(src_dir, filename), str(dst_dir / filename))
+        num_bytes += (dst_dir / filename).stat().st_size
+    assert (target_dir / asset_id / "data.json").exists(), asset_path
+    return num_bytes
+
+  tar_path = target_dir / os.path.basename(str(asset_path))
+  logger.debug("Copying %s to %s", str(asset_path), str(tar_path))
+  tf.io.gfile.copy(str(asset_path), str(tar_path))
+  num_bytes = tar_path.stat().st_size
+  extract_asset(tar_path, asset_id, target_dir)
+  tar_path.unlink()
+  return num_bytes
+
+
+def get_directory_size(path: PathLike) -> int:
+  return sum(os.path.getsize(os.path.join(root, filename))
+             for root, _, filenames in os.walk(path) for filename in filenames)
+
+
+@contextlib.contextmanager
+def file_lock(path: pathlib.Path):
+  """Holds an exclusive (inter-process) lock on the given lock file while in this context."""
+  with open(path, "a+", encoding="utf-8") as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    try:
+      yield
+    finally:
+      fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class AssetCache:
+  """Content-addressed cache of extracted assets in a local directory shared by many processes.
+
+  Entries are keyed by the (remote) path of the asset archive and its checksum, and live in
+  `cache_dir/entries/<key>/<asset_id>`. Each entry is downloaded and extracted by only one process
+  at a time (using a file lock per key) into a temporary directory, which is then atomically
+  renamed to its final location. If the total size of the cache exceeds `max_size` bytes, the
+  least recently used entries are evicted, except for the ones used within the last
+  `min_age` seconds (which might still be read by another process).
+
+  The counters in `stats` (hits, misses, bytes_fetched, evictions, bytes_evicted) only count the
+  operations of this instance (which can be used from several threads).
+  """
+
+  ENTRY_INFO = ".cache_entry.json"
+
+  def __init__(self, cache_dir: PathLike, max_size: Optional[int] = None,
+               min_age: float = 3600.):
+    self.cache_dir = pathlib.Path(cache_dir)
+    self.max_size = max_size
+    self.min_age = min_age
+    self.stats = collections.Counter(hits=0, misses=0, bytes_fetched=0, evictions=0,
+                                     bytes_evicted=0)
+    self._stats_lock = threading.Lock()
+    for subdir in ["entries", "locks", "tmp"]:
+      (self.cache_dir / subdir).mkdir(parents=True, exist_ok=True)
+
+  @staticmethod
+  def get_key(asset_path: PathLike, checksum: Optional[str] = None) -> str:
+    if checksum is None:
+      # without a checksum fall back to the size and modification time of the archive
+      stat = tf.io.gfile.stat(str(asset_path))
+      checksum = f"{stat.length}-{stat.mtime_nsec}"
+    return hashlib.sha256(f"{asset_path}:{checksum}".encode("utf-8")).hexdigest()[:32]
+
+  def fetch(self, asset_path: PathLike, asset_id: str,
+            checksum: Optional[str] = None) -> pathlib.Path:
+    """Returns the local directory of the extracted asset (downloading it if necessary)."""
+    key = self.get_key(asset_path, checksum)
+    entry_dir = self.cache_dir / "entries" / key
+    if self._touch(entry_dir):
+      self._count(hits=1)
+      return entry_dir / asset_id
+
+    with file_lock(self.cache_dir / "locks" / f"{key}.lock"):
+      # another process might have added the entry while we were waiting for the lock
+      if self._touch(entry_dir):
+        self._count(hits=1)
+        return entry_dir / asset_id
+
+      tmp_dir = pathlib.Path(tempfile.mkdtemp(prefix=f"{key}-", dir=self.cache_dir / "tmp"))
+      try:
+        fetched_size = copy_asset(asset_path, asset_id, tmp_dir)
+        size = get_directory_size(tmp_dir)
+        with open(tmp_dir / self.ENTRY_INFO, "w", encoding="utf-8") as f:
+          json.dump({"asset_path": str(asset_path), "asset_id": asset_id, "size": size}, f)
+        os.rename(tmp_dir, entry_dir)
+      except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    self._count(misses=1, bytes_fetched=fetched_size)
+
+    if self.max_size is not None:
+      self.evict(self.max_size, keep=key)
+    return entry_dir / asset_id
+
+  def evict(self, max_size: int, keep: Optional[str] = None):
+    """Removes least recently used entries until the cache is smaller than max_size bytes."""
+    with file_lock(self.cache_dir / "locks" / "evict.lock"):
+      entries = []
+      for entry_dir in (self.cache_dir / "entries").iterdir():
+        try:
+          info_path = entry_dir / self.ENTRY_INFO
+          last_used = info_path.stat().st_mtime_ns / 1e9
+          with open(info_path, "r", encoding="utf-8") as f:
+            size = json.load(f)["size"]
+        except (FileNotFoundError, NotADirectoryError):
+          continue
+        entries.append((last_used, size, entry_dir))
+
+      total_size = sum(size for _, size, _ in entries)
+      now = time.time()
+      for last_used, size, entry_dir in sorted(entries, key=lambda x: x[0]):
+        if total_size <= max_size:
+          break
+        if entry_dir.name == keep or now - last_used < self.min_age:
+          continue
+        with file_lock(self.cache_dir / "locks" / f"{entry_dir.name}.lock"):
+          # move the entry out of the way first, so that no process sees a partial entry
+          trash_dir = pathlib.Path(tempfile.mkdtemp(dir=self.cache_dir / "tmp"))
+          try:
+            os.rename(entry_dir, trash_dir / entry_dir.name)
+          except FileNotFoundError:
+            continue  # already evicted by another process
+          finally:
+            shutil.rmtree(trash_dir)
+        total_size -= size
+        self._count(evictions=1, bytes_evicted=size)
+        logger.debug("Evicted %s (%d bytes) from the asset cache", entry_dir.name, size)
+
+  def _count(self, **increments: int):
+    # (updating a Counter is not atomic)
+    with self._stats_lock:
+      self.stats.update(increments)
+
+  def _touch(self, entry_dir: pathlib.Path) -> bool:
+    """Marks the entry as used now and returns whether it exists."""
+    try:
+      # (the file system clock can be too coarse to order entries that are used in quick succession)
+      now = time.time_ns()
+      os.utime(entry_dir / self.ENTRY_INFO, ns=(now, now))
+      return True
+    except FileNotFoundError:
+      return False
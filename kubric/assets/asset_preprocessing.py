@@ -208,7 +208,7 @@ def create_blender_object_from_tmesh(tmesh, name):
   return bobj
 
 
-def kubricify(output_folder, obj=None, density=None, friction=None):
+def kubricify(output_folder, obj=None, density=None, friction=None, archive_format="gztar"):
   if obj is None:
     obj = get_active_object()
   with select(obj):
@@ -250,18 +250,32 @@ def kubricify(output_folder, obj=None, density=None, friction=None):
         "urdf": [str(urdf_path.relative_to(output_path))]
     }
     save_properties(output_path, properties)
-    compress_object_dir(output_path, obj.name)
+    compress_object_dir(output_path, obj.name, archive_format)
 
-  print("tidying up...")
-  shutil.rmtree(output_path)
+  if archive_format != "dir":
+    print("tidying up...")
+    shutil.rmtree(output_path)
   return properties
 
 
-def compress_object_dir(output_path, obj_name):
-  tar_path = str(output_path) + ".tar.gz"
-  print("Zipping into", tar_path)
-  with tarfile.open(tar_path, "w:gz") as tar:
+# archive formats supported by AssetSource: file suffix and tarfile mode
+ARCHIVE_FORMATS = {
+    "gztar": (".tar.gz", "w:gz"),  # smallest, but has to be decompressed for every fetch
+    "tar": (".tar", "w"),  # uncompressed, only has to be unpacked
+    "dir": ("", None),  # plain directory, can be used in place (e.g. from a shared mount)
+}
+
+
+def compress_object_dir(output_path, obj_name, archive_format="gztar"):
+  """Packages the asset directory in one of the ARCHIVE_FORMATS and returns the path."""
+  suffix, mode = ARCHIVE_FORMATS[archive_format]
+  if mode is None:
+    return output_path
+  tar_path = str(output_path) + suffix
+  print("Packing into", tar_path)
+  with tarfile.open(tar_path, mode) as tar:
     tar.add(output_path, arcname=obj_name)
+  return tar_path
 
 
 def save_collision_geometry(obj, output_path):
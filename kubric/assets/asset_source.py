@@ -12,22 +12,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import difflib
 import functools
 import logging
+import os
 import pathlib
 import shutil
-import tarfile
 import tempfile
+import threading
 
 import numpy as np
 import tensorflow as tf
 
-from typing import Optional, Dict, Any, Type
+from typing import Optional, Dict, Any, Iterable, Type
 import weakref
 
 from kubric import core
 from kubric import file_io
+from kubric.assets.asset_cache import AssetCache
+from kubric.assets.asset_cache import copy_asset
+from kubric.assets.manifest_index import ManifestIndex
+from kubric.assets.manifest_index import get_index_path
 from kubric.kubric_typing import PathLike
 
 
@@ -57,13 +63,26 @@ class ClosableResource:
 
 
 class AssetSource(ClosableResource):
-  """TODO(klausg): documentation."""
+  """TODO(klausg): documentation.
+
+  By default the assets are fetched into a temporary directory of each AssetSource. If a
+  `cache_dir` is given (or the KUBRIC_ASSET_CACHE_DIR environment variable is set), they are
+  instead fetched into a shared AssetCache with an optional size limit of `cache_size` bytes
+  (or KUBRIC_ASSET_CACHE_SIZE), which can be used by many processes at once.
+
+  Assets can be fetched ahead of time in background threads with `prefetch(asset_ids)`.
+
+  If an index file generated by `kubric.assets.manifest_index` exists next to the manifest,
+  `from_manifest` reads the (lazily loaded) index instead of parsing the whole JSON manifest.
+  """
 
   @classmethod
   def from_manifest(
       cls,
       manifest_path: PathLike,
-      scratch_dir: Optional[PathLike] = None
+      scratch_dir: Optional[PathLike] = None,
+      cache_dir: Optional[PathLike] = None,
+      cache_size: Optional[int] = None,
   ) -> "AssetSource":
     if manifest_path == "gs://kubric-public/assets/ShapeNetCore.v2.json":
       raise ValueError(f"The path `{manifest_path}` is a placeholder for the real path. "
@@ -72,18 +91,38 @@ class AssetSource(ClosableResource):
                        "https://shapenet.org/download/kubric")
 
     manifest_path = file_io.as_path(manifest_path)
-    manifest = file_io.read_json(manifest_path)
-    name = manifest.get("name", manifest_path.stem)  # default to filename
-    data_dir = manifest.get("data_dir", manifest_path.parent)  # default to manifest dir
+    manifest = cls._read_manifest_index(manifest_path)
+    if manifest is None:
+      manifest = file_io.read_json(manifest_path)
+    name = manifest.get("name") or manifest_path.stem  # default to filename
+    data_dir = manifest.get("data_dir") or manifest_path.parent  # default to manifest dir
     assets = manifest["assets"]
-    return cls(name=name, data_dir=data_dir, assets=assets, scratch_dir=scratch_dir)
+    return cls(name=name, data_dir=data_dir, assets=assets, scratch_dir=scratch_dir,
+               cache_dir=cache_dir, cache_size=cache_size)
+
+  @staticmethod
+  def _read_manifest_index(manifest_path) -> Optional[Dict[str, Any]]:
+    """Loads the index file of the manifest (if it exists and is up to date) or returns None."""
+    index_path = get_index_path(manifest_path)
+    if not index_path.exists():
+      return None
+    index = ManifestIndex(index_path)
+    manifest_stat = tf.io.gfile.stat(str(manifest_path))
+    if (index.info["manifest_size"] != manifest_stat.length or
+        index.info.get("manifest_mtime_nsec") != manifest_stat.mtime_nsec):
+      logging.warning("Ignoring outdated index %s of manifest %s", index_path, manifest_path)
+      return None
+    return {"name": index.info["name"], "data_dir": index.info["data_dir"], "assets": index}
 
   def __init__(
       self,
       name: str,
       data_dir: PathLike,
       assets: Dict[str, Any],
-      scratch_dir: Optional[PathLike] = None
+      scratch_dir: Optional[PathLike] = None,
+      cache_dir: Optional[PathLike] = None,
+      cache_size: Optional[int] = None,
+      max_prefetch_threads: int = 8,
   ):
     super().__init__()
     self.name = name
@@ -93,10 +132,23 @@ class AssetSource(ClosableResource):
     self.local_dir = pathlib.Path(tempfile.mkdtemp(prefix=name, dir=scratch_dir))
     self._assets = assets
 
+    cache_dir = cache_dir or os.environ.get("KUBRIC_ASSET_CACHE_DIR")
+    cache_size = cache_size or os.environ.get("KUBRIC_ASSET_CACHE_SIZE")
+    self.cache = None
+    if cache_dir:
+      self.cache = AssetCache(cache_dir, max_size=None if cache_size is None else int(cache_size))
+
+    self.max_prefetch_threads = max_prefetch_threads
+    self._prefetch_pool = None
+    self._fetches = {}  # asset_id -> Future of the asset_dir
+    self._fetches_lock = threading.Lock()
+
   def close(self):
     if self.is_closed:
       return
     try:
+      if self._prefetch_pool is not None:
+        self._prefetch_pool.shutdown(wait=True, cancel_futures=True)
       shutil.rmtree(self.local_dir)
     finally:
       super().close()
@@ -125,13 +177,26 @@ class AssetSource(ClosableResource):
 
   @functools.cached_property
   def categories(self):
+    if isinstance(self._assets, ManifestIndex):
+      return self._assets.categories
     return sorted(filter(None, {v["metadata"].get("category", "")
                                 for v in self._assets.values()}))
 
   @functools.cached_property
   def all_asset_ids(self):
+    if isinstance(self._assets, ManifestIndex):
+      return self._assets.ids()
     return sorted(self._assets.keys())
 
+  def get_asset_ids(self, category: Optional[str] = None):
+    """Sorted list of the ids of all assets (of the given category)."""
+    if category is None:
+      return self.all_asset_ids
+    if isinstance(self._assets, ManifestIndex):
+      return self._assets.ids(category)
+    return [asset_id for asset_id in self.all_asset_ids
+            if self._assets[asset_id]["metadata"].get("category") == category]
+
   @staticmethod
   def _resolve_asset_type(asset_type: str) -> Type:
     types = {
@@ -199,11 +264,11 @@ class AssetSource(ClosableResource):
     asset_type = self._resolve_asset_type(asset_entry["asset_type"])
     asset_path = self._resolve_asset_path(asset_entry.get("path", ""), asset_id)
 
-    # fetch and unpack tar.gz file if necessary
-    asset_dir = None if asset_path is None else self.fetch(asset_path, asset_id)
+    # fetch and unpack tar.gz file if necessary (or wait for it to be prefetched)
+    asset_dir = None if asset_path is None else self._get_asset_dir(asset_id)
 
     # construct kwargs
-    asset_kwargs = asset_entry.get("kwargs", {})
+    asset_kwargs = dict(asset_entry.get("kwargs", {}))  # copy to leave the manifest unchanged
     asset_kwargs.update(kwargs)
     asset_kwargs = self._adjust_paths(asset_kwargs, asset_dir)
     if asset_type == core.FileBasedObject:
@@ -216,29 +281,70 @@ class AssetSource(ClosableResource):
 
     return asset
 
-  def fetch(self, asset_path, asset_id):
-    local_path = self.local_dir / (asset_id + ".tar.gz")
-    if not local_path.exists():
-      logging.debug("Copying %s to %s", str(asset_path), str(local_path))
-      local_path.parent.mkdir(parents=True, exist_ok=True)
-      tf.io.gfile.copy(asset_path, local_path)
-
-      with tarfile.open(local_path, "r:gz") as tar:
-        # We support two kinds of archives:
-        #  1. flat archives that do not contain any directories
-        #  2. archives where the content is in a directory with the name of the asset
-        list_of_files = tar.getnames()
-        if asset_id in list_of_files and tar.getmember(asset_id).isdir():
-          # tarfile contains directory with name object_id, so we can just extract
-          assert f"{asset_id}/data.json" in list_of_files, list_of_files
-          tar.extractall(self.local_dir)
-        else:
-          # tarfile contains files only, so extract into a new directory
-          assert "data.json" in list_of_files, list_of_files
-          tar.extractall(self.local_dir / asset_id)
-        logging.debug("Extracted %s", repr([m.name for m in tar.getmembers()]))
-
-    return self.local_dir / asset_id
+  def prefetch(self, asset_ids: Iterable[str]) -> None:
+    """Starts fetching (and unpacking) the given assets in background threads.
+
+    Returns immediately. A later `create` only waits for the asset it needs.
+    """
+    with self._fetches_lock:
+      if self._prefetch_pool is None:
+        self._prefetch_pool = concurrent.futures.ThreadPoolExecutor(
+            self.max_prefetch_threads, thread_name_prefix=f"{self.name}-prefetch")
+      for asset_id in asset_ids:
+        future = self._fetches.get(asset_id)
+        # start again if an earlier fetch failed
+        if future is None or (future.done() and (future.cancelled() or future.exception())):
+          self._fetches[asset_id] = self._prefetch_pool.submit(self._fetch_asset, asset_id)
+
+  def _get_asset_dir(self, asset_id: str):
+    """Returns the local asset_dir, either from a (pending) prefetch or by fetching it now."""
+    with self._fetches_lock:
+      future = self._fetches.get(asset_id)
+      if future is None:
+        # register the fetch, so that a concurrent prefetch of this asset waits for it
+        future = self._fetches[asset_id] = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+        fetch_now = True
+      else:
+        fetch_now = False
+
+    if fetch_now:
+      try:
+        future.set_result(self._fetch_asset(asset_id))
+      except BaseException as e:
+        future.set_exception(e)
+    try:
+      return future.result()
+    except BaseException:
+      with self._fetches_lock:
+        # allow retrying after a failure (of this or a prefetch)
+        if self._fetches.get(asset_id) is future:
+          del self._fetches[asset_id]
+      raise
+
+  def _fetch_asset(self, asset_id: str):
+    asset_entry = self._assets[asset_id]
+    asset_path = self._resolve_asset_path(asset_entry.get("path", ""), asset_id)
+    if asset_path is None:
+      return None
+    return self.fetch(asset_path, asset_id, asset_entry.get("checksum"))
+
+  def fetch(self, asset_path, asset_id, checksum=None):
+    """Returns a local directory with the content of the asset archive (or directory).
+
+    Assets stored as plain directories on a local (or mounted) file system are used in place,
+    everything else is copied (and unpacked) to the cache or to the local_dir of this source.
+    """
+    if os.path.isdir(str(asset_path)):
+      return pathlib.Path(str(asset_path))
+
+    if self.cache is not None:
+      return self.cache.fetch(asset_path, asset_id, checksum)
+
+    asset_dir = self.local_dir / asset_id
+    if not asset_dir.exists():
+      copy_asset(asset_path, asset_id, self.local_dir)
+    return asset_dir
 
   def get_test_split(self, fraction=0.1):
     """
@@ -254,5 +360,6 @@ class AssetSource(ClosableResource):
     rng = np.random.default_rng(42)
     test_size = int(round(len(self.all_asset_ids) * fraction))
     test_ids = rng.choice(self.all_asset_ids, size=test_size, replace=False)
-    train_ids = [i for i in self.all_asset_ids if i not in test_ids]
+    test_set = set(test_ids)
+    train_ids = [i for i in self.all_asset_ids if i not in test_set]
     return train_ids, test_ids
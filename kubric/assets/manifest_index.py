@@ -0,0 +1,144 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A precomputed SQLite index of an asset manifest for fast startup of AssetSource.
+
+The index is stored next to the JSON manifest (e.g. `GSO.json` -> `GSO.index.sqlite`) and can be
+generated with:
+  python3 -m kubric.assets.manifest_index gs://kubric-public/assets/GSO/GSO.json
+"""
+
+import argparse
+import collections.abc
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import tensorflow as tf
+
+from kubric import file_io
+from kubric.kubric_typing import PathLike
+
+INDEX_SUFFIX = ".index.sqlite"
+
+
+def get_index_path(manifest_path: PathLike):
+  manifest_path = file_io.as_path(manifest_path)
+  return manifest_path.parent / (manifest_path.stem + INDEX_SUFFIX)
+
+
+def build_manifest_index(manifest_path: PathLike, index_path: Optional[PathLike] = None):
+  """Converts a JSON manifest into an index file (by default stored next to the manifest)."""
+  manifest_path = file_io.as_path(manifest_path)
+  index_path = get_index_path(manifest_path) if index_path is None else file_io.as_path(index_path)
+  # stat before reading, so that a concurrent edit of the manifest makes the index outdated
+  manifest_stat = tf.io.gfile.stat(str(manifest_path))
+  manifest = file_io.read_json(manifest_path)
+  info = {
+      "name": manifest.get("name"),
+      "data_dir": manifest.get("data_dir"),
+      # used to detect outdated indices (see AssetSource.from_manifest)
+      "manifest_size": manifest_stat.length,
+      "manifest_mtime_nsec": manifest_stat.mtime_nsec,
+  }
+
+  # sqlite needs a local file, so write to a temporary file first (also supports remote paths)
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    tmp_path = os.path.join(tmp_dir, "index.sqlite")
+    with sqlite3.connect(tmp_path) as db:
+      db.execute("CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT)")
+      db.executemany("INSERT INTO info VALUES (?, ?)",
+                     [(key, json.dumps(value)) for key, value in info.items()])
+      db.execute("CREATE TABLE assets (id TEXT PRIMARY KEY, category TEXT, entry TEXT)")
+      db.executemany("INSERT INTO assets VALUES (?, ?, ?)",
+                     [(asset_id, entry.get("metadata", {}).get("category"), json.dumps(entry))
+                      for asset_id, entry in manifest["assets"].items()])
+      db.execute("CREATE INDEX assets_category ON assets (category)")
+    db.close()
+    tf.io.gfile.copy(tmp_path, str(index_path), overwrite=True)
+  return index_path
+
+
+class ManifestIndex(collections.abc.Mapping):
+  """Read-only mapping from asset ids to manifest entries, backed by an index file.
+
+  Entries are only loaded (and parsed) from the index when they are accessed.
+  """
+
+  def __init__(self, index_path: PathLike):
+    index_path = str(index_path)
+    if not os.path.exists(index_path):
+      # sqlite can only read local files
+      self._tmp_dir = tempfile.TemporaryDirectory()
+      local_path = os.path.join(self._tmp_dir.name, os.path.basename(index_path))
+      tf.io.gfile.copy(index_path, local_path)
+      index_path = local_path
+    self.index_path = index_path
+    self._lock = threading.Lock()
+    self._db = None
+    self._db_pid = None
+    self.info = {key: json.loads(value)
+                 for key, value in self._query("SELECT key, value FROM info")}
+
+  def _query(self, query: str, *args) -> List[Any]:
+    with self._lock:
+      # connections cannot be shared with forked processes
+      if self._db is None or self._db_pid != os.getpid():
+        self._db = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True,
+                                   check_same_thread=False)
+        self._db_pid = os.getpid()
+      return self._db.execute(query, args).fetchall()
+
+  def __getitem__(self, asset_id: str) -> Dict[str, Any]:
+    rows = self._query("SELECT entry FROM assets WHERE id = ?", asset_id)
+    if not rows:
+      raise KeyError(asset_id)
+    return json.loads(rows[0][0])
+
+  def __contains__(self, asset_id) -> bool:
+    return bool(self._query("SELECT 1 FROM assets WHERE id = ?", asset_id))
+
+  def __iter__(self):
+    return iter(self.ids())
+
+  def __len__(self) -> int:
+    return self._query("SELECT COUNT(*) FROM assets")[0][0]
+
+  def ids(self, category: Optional[str] = None) -> List[str]:
+    """Sorted list of all asset ids (of the given category)."""
+    if category is None:
+      return [row[0] for row in self._query("SELECT id FROM assets ORDER BY id")]
+    return [row[0] for row in self._query("SELECT id FROM assets WHERE category = ? ORDER BY id",
+                                          category)]
+
+  @property
+  def categories(self) -> List[str]:
+    return [row[0] for row in self._query("SELECT DISTINCT category FROM assets "
+                                          "WHERE category IS NOT NULL AND category != '' "
+                                          "ORDER BY category")]
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Build the index file of an asset manifest.")
+  parser.add_argument("manifest_path", type=str)
+  parser.add_argument("--index_path", type=str, default=None)
+  flags = parser.parse_args()
+  print("Wrote", build_manifest_index(flags.manifest_path, flags.index_path))
+
+
+if __name__ == "__main__":
+  main()
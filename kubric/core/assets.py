@@ -24,6 +24,87 @@ import traitlets as tl
 from kubric.utils import next_global_count
 
 
+class Keyframes(dict):
+  """The keyframes of a single trait as a dict mapping frames to values.
+
+  Additionally caches the keyframes as a sorted array of frames and a matrix of values (one row
+  per frame) for vectorized interpolation. The cache is invalidated whenever keyframes change.
+  """
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self._arrays = None
+
+  def __setitem__(self, frame, value):
+    super().__setitem__(frame, value)
+    self._arrays = None
+
+  def __delitem__(self, frame):
+    super().__delitem__(frame)
+    self._arrays = None
+
+  def update(self, *args, **kwargs):
+    super().update(*args, **kwargs)
+    self._arrays = None
+
+  def setdefault(self, frame, value=None):
+    self._arrays = None
+    return super().setdefault(frame, value)
+
+  def pop(self, *args):
+    self._arrays = None
+    return super().pop(*args)
+
+  def popitem(self):
+    self._arrays = None
+    return super().popitem()
+
+  def clear(self):
+    super().clear()
+    self._arrays = None
+
+  def as_arrays(self):
+    """Returns the (sorted) frames of shape (N,) and corresponding values of shape (N, ...)."""
+    if self._arrays is None:
+      frames = np.array(sorted(self))
+      values = np.array([self[frame] for frame in frames])
+      self._arrays = frames, values
+    return self._arrays
+
+  def _neighbours(self, frames):
+    key_frames, _ = self.as_arrays()
+    right = np.searchsorted(key_frames, frames)
+    left = np.clip(right - 1, 0, len(key_frames) - 1)
+    right = np.clip(right, 0, len(key_frames) - 1)
+    return left, right, key_frames[left], key_frames[right]
+
+  def select(self, frames, interpolation="const"):
+    """Indices (into as_arrays) of the keyframes used for "const" or "nearest" interpolation."""
+    frames = np.asarray(frames)
+    left, right, left_frames, right_frames = self._neighbours(frames)
+    if interpolation == "const":
+      return np.where(right_frames == frames, right, left)
+    elif interpolation == "nearest":
+      return np.where(frames - left_frames <= right_frames - frames, left, right)
+    else:
+      raise ValueError(f"Unknown interpolation '{interpolation}'")
+
+  def interpolate(self, frames, interpolation="linear") -> np.ndarray:
+    """Values at the given frames as an array of shape (len(frames), ...)."""
+    _, values = self.as_arrays()
+    if interpolation != "linear":
+      return values[self.select(frames, interpolation)]
+
+    frames = np.asarray(frames)
+    left, right, left_frames, right_frames = self._neighbours(frames)
+    span = right_frames - left_frames
+    mixing = np.divide(frames - left_frames, span, where=span != 0,
+                       out=np.zeros(frames.shape, dtype=np.float64))
+    mixing = mixing.reshape(mixing.shape + (1,) * (values.ndim - 1))
+    dtype = values.dtype if np.issubdtype(values.dtype, np.floating) else np.float64
+    return (1 - mixing).astype(dtype) * values[left] + mixing.astype(dtype) * values[right]
+
+
 class Asset(tl.HasTraits):
   """ Base class for the entire OO interface in Kubric.
   All objects, materials, lights, and cameras inherit from Asset.
@@ -61,7 +142,7 @@ class Asset(tl.HasTraits):
     self.scenes = []
     # """Docstring for scenes TODO (klausg)."""
 
-    self.keyframes = collections.defaultdict(dict)
+    self.keyframes = collections.defaultdict(Keyframes)
     # """Docstring for keyframes TODO (klausg)."""
 
     # --- Initialize traits
@@ -93,6 +174,35 @@ class Asset(tl.HasTraits):
                                    frame=frame,
                                    type="keyframe"))
 
+  def set_keyframes(self, member: str, frames, values):
+    """Insert keyframes for many frames of a single trait at once.
+
+    In contrast to calling keyframe_insert once per frame, this does not change the current value
+    of the trait, and all observers are notified only once with a single "keyframe" change that
+    carries `frames` and the corresponding `new` values (instead of a single `frame`).
+
+    Args:
+      member: Name of the trait to animate.
+      frames: Sequence of N (integer) frame indices.
+      values: Sequence (or array) of N values for the trait, one for each frame.
+    """
+    if not self.has_trait(member):
+      raise KeyError(f"Unknown member '{member}'")
+    frames = [int(frame) for frame in frames]
+    if len(frames) != len(values):
+      raise ValueError(f"Got {len(frames)} frames but {len(values)} values for '{member}'.")
+
+    trait = self.traits()[member]
+    values = [trait.validate(self, value) for value in values]
+    self.keyframes[member].update(zip(frames, values))
+
+    # notify all the KeyframeSetters about all the new keyframes at once
+    self.notify_change(munch.Munch(name=member,
+                                   owner=self,
+                                   frames=frames,
+                                   new=values,
+                                   type="keyframe"))
+
   @contextlib.contextmanager
   def at_frame(self, frame, interpolation="linear"):
     if frame is None:
@@ -114,7 +224,7 @@ class Asset(tl.HasTraits):
         setattr(self, key, value)
 
   def get_value_at(self, name, frame, interpolation="linear"):
-    if name not in self.keyframes:
+    if not self.keyframes.get(name):
       # no animation data found, try retrieving static value
       return getattr(self, name)
     keyframes = self.keyframes[name]
@@ -122,33 +232,20 @@ class Asset(tl.HasTraits):
     if frame in keyframes:
       return keyframes[frame]
 
-    available_frames = sorted(keyframes.keys())
-    right_idx = np.searchsorted(available_frames, frame)
-    if right_idx == 0:
-      return keyframes[available_frames[0]]
-    if right_idx == len(available_frames):
-      return keyframes[available_frames[-1]]
-    left_frame, right_frame = available_frames[right_idx-1], available_frames[right_idx]
-
-    if interpolation == "const":
-      return keyframes[left_frame]
-    elif interpolation == "nearest":
-      if abs(frame - left_frame) <= abs(frame - right_frame):
-        return keyframes[left_frame]
-      else:
-        return keyframes[right_frame]
-    elif interpolation == "linear":
-      mixing = (frame - left_frame) / (right_frame - left_frame)
-      left_val = np.array(keyframes[left_frame])
-      right_val = np.array(keyframes[right_frame])
-      return (1-mixing) * left_val + mixing * right_val
+    if interpolation == "linear":
+      return keyframes.interpolate([frame], interpolation)[0]
+    # for "const" and "nearest" return the stored value itself (e.g. a Color) rather than an array
+    key_frames, _ = keyframes.as_arrays()
+    return keyframes[key_frames[keyframes.select(frame, interpolation)]]
 
   def get_values_over_time(self, name, frames=None, interpolation="linear"):
     if frames is None:
       frames = list(range(self.active_scene.frame_start,
                           self.active_scene.frame_end+1))
-    return np.array([self.get_value_at(name, frame=f, interpolation=interpolation)
-                     for f in frames], dtype=np.float32)
+    if not self.keyframes.get(name):
+      value = np.array(getattr(self, name), dtype=np.float32)
+      return np.repeat(value[np.newaxis], len(frames), axis=0)
+    return self.keyframes[name].interpolate(frames, interpolation).astype(np.float32)
 
   def __hash__(self):
     return hash(self.uid)
@@ -60,6 +60,48 @@ class Camera(objects.Object3D):
       image_coords[2] = np.sign(projected[2])
       return image_coords
 
+  def intrinsics_over_time(self, frames=None) -> np.ndarray:
+    """ Returns the intrinsics for each frame (shape = [len(frames), 3, 3])."""
+    if frames is None:
+      frames = range(self.active_scene.frame_start, self.active_scene.frame_end+1)
+    animated_traits = {name for name, keyframes in self.keyframes.items() if keyframes}
+    if animated_traits <= {"position", "quaternion"}:
+      # the intrinsics are static, so there is no need to evaluate them frame by frame
+      return np.repeat(self.intrinsics[np.newaxis], len(frames), axis=0)
+    intrinsics = []
+    for frame in frames:
+      with self.at_frame(frame):
+        intrinsics.append(self.intrinsics)
+    return np.stack(intrinsics)
+
+  def project_points(self, points3d, frames=None):
+    """ Compute the image space coordinates [0, 1] for points in world coordinates over time.
+
+    Batched version of project_point, which avoids entering `at_frame` for every frame.
+
+    Args:
+      points3d: Array of shape [T, N, 3] with N points (in world coordinates) for each frame.
+      frames: The T frames for which to project the points
+        (defaults to all frames of the active scene).
+
+    Returns:
+      Array of shape [T, N, 3] with the image coordinates of each point and the sign of its depth
+      as third coordinate (see project_point).
+    """
+    if frames is None:
+      frames = range(self.active_scene.frame_start, self.active_scene.frame_end+1)
+    points3d = np.asarray(points3d)
+    homo_transform = np.linalg.inv(self.matrix_world_over_time(frames))
+    homo_intrinsics = np.zeros((len(frames), 3, 4), dtype=np.float32)
+    homo_intrinsics[:, :, :3] = self.intrinsics_over_time(frames)
+
+    points4d = np.concatenate([points3d, np.ones(points3d.shape[:-1] + (1,))], axis=-1)
+    projected = homo_intrinsics @ homo_transform @ np.swapaxes(points4d, -1, -2)
+    projected = np.swapaxes(projected, -1, -2)
+    image_coords = projected / projected[..., 2:3]
+    image_coords[..., 2] = np.sign(projected[..., 2])
+    return image_coords
+
   def z_to_depth(self, z: ArrayLike) -> np.ndarray:
     raise NotImplementedError
 
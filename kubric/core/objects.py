@@ -106,6 +106,21 @@ def _euler_to_quat(euler_angles):
   return tuple(q3 * q2 * q1)
 
 
+def quaternions_to_rotation_matrices(quaternions: ArrayLike) -> np.ndarray:
+  """Converts (W, X, Y, Z) quaternions of shape [..., 4] to rotation matrices of shape [..., 3, 3].
+
+  Like pyquaternion, the quaternions are normalized before the conversion.
+  """
+  quaternions = np.asarray(quaternions, dtype=np.float64)
+  quaternions = quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+  w, x, y, z = np.moveaxis(quaternions, -1, 0)
+  return np.stack([
+      np.stack([1 - 2 * (y*y + z*z), 2 * (x*y - w*z), 2 * (x*z + w*y)], axis=-1),
+      np.stack([2 * (x*y + w*z), 1 - 2 * (x*x + z*z), 2 * (y*z - w*x)], axis=-1),
+      np.stack([2 * (x*z - w*y), 2 * (y*z + w*x), 1 - 2 * (x*x + y*y)], axis=-1),
+  ], axis=-2)
+
+
 class Object3D(assets.Asset):
   """
   Attributes:
@@ -150,6 +165,19 @@ class Object3D(assets.Asset):
     transformation[:3, 3] = self.position
     return transformation
 
+  def matrix_world_over_time(self, frames=None) -> np.ndarray:
+    """ Returns matrix_world for each frame (shape = [len(frames), 4, 4]).
+
+    Computed directly from the (linearly interpolated) keyframes, i.e. without changing the
+    state of the object like `at_frame` does.
+    """
+    positions = self.get_values_over_time("position", frames)
+    quaternions = self.get_values_over_time("quaternion", frames)
+    transformations = np.tile(np.eye(4), (len(positions), 1, 1))
+    transformations[:, :3, :3] = quaternions_to_rotation_matrices(quaternions)
+    transformations[:, :3, 3] = positions
+    return transformations
+
 
 class PhysicalObject(Object3D):
   """ Base class for all 3D objects with a geometry and that can participate in physics simulation.
@@ -258,6 +286,22 @@ class PhysicalObject(Object3D):
     axis_aligned_bbox = np.array([bbox3d.min(axis=0), bbox3d.max(axis=0)])
     return axis_aligned_bbox
 
+  def bbox_3d_over_time(self, frames=None) -> np.ndarray:
+    """ bbox_3d for each frame (shape = [len(frames), 8, 3]), computed from the keyframes.
+
+    Equivalent to evaluating bbox_3d inside `at_frame` for every frame, but without changing
+    the state of the object (and thus without triggering any observers).
+    """
+    bounds = np.array(self.bounds, dtype=np.float32)
+    scales = self.get_values_over_time("scale", frames)
+    # construct the bbox corners for every frame (in the same order as bbox_3d)
+    corners = np.array(list(itertools.product([0, 1], repeat=3)))
+    bbox_points = (bounds[corners, [0, 1, 2]][np.newaxis] * scales[:, np.newaxis]).astype(np.float64)
+    rotations = quaternions_to_rotation_matrices(self.get_values_over_time("quaternion", frames))
+    rotated_bbox_points = bbox_points @ np.swapaxes(rotations, -1, -2)
+    positions = self.get_values_over_time("position", frames)
+    return positions[:, np.newaxis] + rotated_bbox_points
+
 
 class Cube(PhysicalObject):
   @tl.default("bounds")
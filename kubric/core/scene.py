@@ -67,7 +67,8 @@ class Scene(tl.HasTraits):
                camera: Camera = UndefinedCamera(),
                ambient_illumination: color.Color = color.get_color("black"),
                background: color.Color = color.get_color("black")):
-    self._assets = []
+    self._assets = {}  # uid -> asset (in insertion order)
+    self._partitions = None
     self._views = []
     self.metadata = {}
     super().__init__(frame_start=frame_start, frame_end=frame_end, frame_rate=frame_rate,
@@ -101,15 +102,35 @@ class Scene(tl.HasTraits):
 
   @property
   def assets(self):
-    return tuple(self._assets)
+    return self._get_partitions()[0]
 
   @property
   def foreground_assets(self):
-    return tuple(a for a in self._assets if isinstance(a, Object3D) and not a.background)
+    return self._get_partitions()[1]
 
   @property
   def background_assets(self):
-    return tuple(a for a in self._assets if a.background)
+    return self._get_partitions()[2]
+
+  def get_asset(self, uid: str) -> Asset:
+    """Returns the asset with the given uid (raises KeyError if it is not part of this scene)."""
+    return self._assets[uid]
+
+  def _get_partitions(self):
+    """Cached (all, foreground, background) asset tuples; invalidated whenever they change."""
+    if self._partitions is None:
+      assets = tuple(self._assets.values())
+      self._partitions = (
+          assets,
+          tuple(a for a in assets if isinstance(a, Object3D) and not a.background),
+          tuple(a for a in assets if a.background))
+    return self._partitions
+
+  def _invalidate_partitions(self, change=None):  # pylint: disable=unused-argument
+    self._partitions = None
+
+  def __contains__(self, asset: Asset):
+    return isinstance(asset, Asset) and asset.uid in self._assets
 
   @property
   def views(self):
@@ -120,7 +141,7 @@ class Scene(tl.HasTraits):
       raise ValueError("View already registered")
     self._views.append(view)
 
-    for asset in self._assets:
+    for asset in self.assets:
       if not isinstance(asset, UndefinedAsset):
         view.add(asset)
 
@@ -129,7 +150,7 @@ class Scene(tl.HasTraits):
       raise ValueError("View not linked")
 
     self._views.remove(view)
-    for asset in self._assets:
+    for asset in self.assets:
       view.remove(asset)
 
   def add(self, asset: Union[Asset, List[Asset]]):
@@ -142,10 +163,12 @@ class Scene(tl.HasTraits):
     if isinstance(asset, UndefinedAsset):
       return
 
-    if asset in self._assets:
+    if asset.uid in self._assets:
       return
 
-    self._assets.append(asset)
+    self._assets[asset.uid] = asset
+    self._invalidate_partitions()
+    asset.observe(self._invalidate_partitions, "background")
     assert self not in asset.scenes
     asset.scenes.append(self)
 
@@ -162,9 +185,11 @@ class Scene(tl.HasTraits):
     return self
 
   def remove(self, asset: Asset):
-    if asset not in self._assets:
+    if asset.uid not in self._assets:
       raise ValueError(f"{asset} cannot be removed, because it is not part of this scene.")
-    self._assets.remove(asset)
+    del self._assets[asset.uid]
+    self._invalidate_partitions()
+    asset.unobserve(self._invalidate_partitions, "background")
     assert self in asset.scenes
     asset.scenes.remove(self)
 
@@ -193,7 +218,7 @@ class Scene(tl.HasTraits):
   @tl.observe("camera", type="change")
   def _observe_camera(self, change):
     new_camera = change.new
-    if new_camera not in self._assets:
+    if new_camera.uid not in self._assets:
       self.add(new_camera)
 
   def __hash__(self):
@@ -16,6 +16,7 @@ import abc
 from typing import Any, Callable, Dict, List
 from types import MappingProxyType
 import munch
+import traitlets as tl
 
 from kubric.core.scene import Scene
 from kubric.core.assets import Asset
@@ -67,22 +68,27 @@ class View(abc.ABC):
       return
 
     # else use add_asset to create a new view-object and store it
+    observers_before = _get_change_observers(asset)
     view_obj = self.add_asset(asset)
     if view_obj is None:
       return
 
     asset.linked_objects[self] = view_obj
 
-    # trigger change notification for all fields (for initialization)
-    # FIXME: This notifies all the views, but should only notify self.
-    #        Unfortunately traitlets doesn't have a solution ready for this,
-    #        so we will have to hack it in ourselves.
+    # trigger change notification for all fields (for initialization), but only for the observers
+    # that were registered by add_asset of this view (the other views are already up-to-date).
+    known_observers = {id(observer) for observers in observers_before.values()
+                       for observer in observers}
+    new_observers = {name: [observer for observer in observers
+                            if id(observer) not in known_observers]
+                     for name, observers in _get_change_observers(asset).items()}
     for trait_name in asset.trait_names():
       value = getattr(asset, trait_name)
       if isinstance(value, Asset):  # recursively add assets to the
         self.add(value)
-      asset.notify_change(munch.Munch(owner=asset, type="change",
-                                      name=trait_name, new=value, old=value))
+      change = munch.Munch(owner=asset, type="change", name=trait_name, new=value, old=value)
+      for observer in new_observers.get(trait_name, []) + new_observers.get(tl.All, []):
+        observer(change)
 
   def remove(self, asset: Asset) -> None:
     # use the view-specific remove function to delete the view-object
@@ -99,3 +105,9 @@ class View(abc.ABC):
   @abc.abstractmethod
   def remove_asset(self, asset: Asset) -> None:
     pass  # pragma: no cover
+
+
+def _get_change_observers(asset: Asset) -> Dict[Any, List[Callable]]:
+  """Returns the observers of "change" notifications for each trait name (or tl.All) of asset."""
+  return {name: notifiers.get("change", []) + notifiers.get(tl.All, [])
+          for name, notifiers in asset._trait_notifiers.items()}  # pylint: disable=protected-access
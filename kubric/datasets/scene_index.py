@@ -0,0 +1,99 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An index of the (complete) scene directories of a job, read by the dataset builders.
+
+Aggregates the completion manifests written by the workers (see kb.done) into a single file in
+the job directory, so that builders can list the complete scenes with a single request instead
+of listing and checking every scene directory. Generate it after the job has finished with:
+  python3 -m kubric.datasets.scene_index gs://research-brain-kubric-xgcp/jobs/movi_e/
+"""
+
+import argparse
+import concurrent.futures
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import tensorflow as tf
+
+from kubric import file_io
+from kubric.kubric_typing import PathLike
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "scene_index.json"
+
+
+def build_scene_index(job_dir: PathLike, index_path: Optional[PathLike] = None,
+                      max_workers: int = 32):
+  """Collects the completion manifests of all scene directories in job_dir into an index file.
+
+  Returns:
+    The path of the index file (by default job_dir / INDEX_FILENAME).
+  """
+  job_dir = file_io.as_path(job_dir)
+  index_path = job_dir / INDEX_FILENAME if index_path is None else file_io.as_path(index_path)
+  names = sorted(name.rstrip("/") for name in tf.io.gfile.listdir(str(job_dir))
+                 if name != INDEX_FILENAME)
+  with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+    manifests = pool.map(lambda name: file_io.read_completion_manifest(job_dir / name), names)
+    # incomplete scenes are kept (with manifest None), so that the splits do not change
+    scenes = dict(zip(names, manifests))
+  if names and all(manifest is None for manifest in scenes.values()):
+    logger.warning("None of the %d scenes in %s has a completion manifest (written by kb.done), "
+                   "so the builders have to check every scene directory.", len(names), job_dir)
+
+  tmp_path = str(index_path) + ".tmp"
+  with file_io.gopen(tmp_path, "w") as fp:
+    json.dump({"scenes": scenes}, fp, sort_keys=True)
+  tf.io.gfile.rename(tmp_path, str(index_path), overwrite=True)
+  return index_path
+
+
+def read_scene_index(job_dir: PathLike) -> Optional[Dict[str, Optional[Dict[str, Any]]]]:
+  """Returns a dict mapping the name of each scene directory to its completion manifest (None
+  for incomplete scenes), or None if job_dir has no index."""
+  try:
+    return file_io.read_json(file_io.as_path(job_dir) / INDEX_FILENAME)["scenes"]
+  except tf.errors.NotFoundError:
+    return None
+
+
+def list_scene_dirs(job_dir: PathLike) -> Tuple[List[str], Optional[Set[str]]]:
+  """Lists the scene directories of a job (using the index if it exists).
+
+  Returns:
+    All scene directories and the set of the ones with a completion manifest (None if the job has
+    no index). The completeness of all other directories has to be checked with is_complete_dir
+    (see utils.create_complete_scene_dirs).
+  """
+  job_dir = file_io.as_path(job_dir)
+  scenes = read_scene_index(job_dir)
+  if scenes is None:
+    return [str(d) for d in job_dir.iterdir()], None
+  return ([str(job_dir / name) for name in scenes],
+          {str(job_dir / name) for name, manifest in scenes.items() if manifest is not None})
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Build the scene index of a job directory.")
+  parser.add_argument("job_dir", type=str)
+  parser.add_argument("--index_path", type=str, default=None)
+  flags = parser.parse_args()
+  print("Wrote", build_scene_index(flags.job_dir, flags.index_path))
+
+
+if __name__ == "__main__":
+  main()
@@ -14,7 +14,10 @@
 
 # pylint: disable=line-too-long, unexpected-keyword-arg
 """TODO(klausg): description."""
+import concurrent.futures
+import hashlib
 import json
+import pickle
 
 import numpy as np
 import tensorflow as tf
@@ -25,13 +28,132 @@ from kubric import file_io
 DEFAULT_LAYERS = ("rgba", "segmentation", "forward_flow", "backward_flow",
                   "depth", "normal", "object_coordinates")
 
-def load_scene_directory(scene_dir, target_size, layers=DEFAULT_LAYERS):
+def read_frames(paths_and_read_fns, max_workers=16):
+  """Reads (and stacks) the frames of several layers concurrently using a pool of threads.
+
+  Args:
+    paths_and_read_fns: Dict mapping each layer name to a tuple of the list of frame paths and
+      the function used to read a single frame (e.g. file_io.read_png).
+    max_workers: Maximum number of threads used for reading.
+
+  Returns:
+    Dict mapping each layer name to an array of shape (num_frames, height, width, channels).
+  """
+  with concurrent.futures.ThreadPoolExecutor(max_workers) as pool:
+    # read the first frame of each layer to determine the shape and dtype of the stacked arrays
+    first_frames = {key: pool.submit(read_fn, paths[0])
+                    for key, (paths, read_fn) in paths_and_read_fns.items()}
+    frames = {}
+    for key, (paths, _) in paths_and_read_fns.items():
+      first_frame = first_frames[key].result()
+      frames[key] = np.empty((len(paths),) + first_frame.shape, dtype=first_frame.dtype)
+      frames[key][0] = first_frame
+
+    def read_into(key, i):
+      paths, read_fn = paths_and_read_fns[key]
+      frames[key][i] = read_fn(paths[i])
+
+    futures = [pool.submit(read_into, key, i)
+               for key, (paths, _) in paths_and_read_fns.items()
+               for i in range(1, len(paths))]
+    for future in futures:
+      future.result()  # re-raise errors from the threads
+  return frames
+
+
+def load_scene_directory(scene_dir, target_size, layers=DEFAULT_LAYERS, max_workers=16,
+                         format_instance=None, format_metadata=None, format_scene=None,
+                         staging_dir=None, staged_sizes=()):
+  """Loads a rendered scene directory (as written by the MOVi workers) as a TFDS example.
+
+  Args:
+    scene_dir: Directory containing the metadata.json, events.json, data_ranges.json and the
+      frames of all layers.
+    target_size: Resolution (height, width) of the example. Has to evenly divide the resolution
+      of the scene.
+    layers: The layers to load.
+    max_workers: Maximum number of threads used for reading the frames.
+    format_instance: Optional function `format_instance(instance_metadata) -> dict` that returns
+      additional (dataset specific) features for each instance (e.g. the shape or asset_id).
+    format_metadata: Optional function `format_metadata(metadata) -> dict` that returns
+      additional (dataset specific) entries of the example metadata (e.g. the motion blur).
+    format_scene: Optional function `format_scene(metadata) -> dict` that returns additional
+      (dataset specific) top-level features of the example (e.g. the background).
+    staging_dir: Optional directory used to share the decoded scene between the builds of
+      several resolutions. If the example was already staged at target_size it is loaded from
+      there (without decoding any frames) and the staged file is deleted. Otherwise the frames
+      are decoded once and the examples for all other staged_sizes are staged. Examples that are
+      never read (e.g. if builds run concurrently or are interrupted) stay in the directory, so
+      remove it once all builds have finished.
+    staged_sizes: The other resolutions (height, width) that are built from the same scenes.
+
+  Returns:
+    The example key (the name of the scene directory), the example and the loaded metadata.json.
+  """
+  target_size = tuple(target_size)
+  if staging_dir is not None:
+    staged_path = get_staged_path(staging_dir, scene_dir, target_size)
+    if tf.io.gfile.exists(staged_path):
+      with tf.io.gfile.GFile(staged_path, "rb") as fp:
+        staged_example = pickle.load(fp)
+      # every staged example is only read by the build of its resolution
+      try:
+        tf.io.gfile.remove(staged_path)
+      except tf.errors.NotFoundError:
+        pass  # already removed by a duplicate (e.g. retried) read
+      return staged_example
+
+  target_sizes = [target_size] + [tuple(size) for size in staged_sizes
+                                  if tuple(size) != target_size]
+  if staging_dir is None:
+    target_sizes = target_sizes[:1]
+  example_key, results, metadata = load_scene_directory_multi_resolution(
+      scene_dir, target_sizes, layers=layers, max_workers=max_workers,
+      format_instance=format_instance, format_metadata=format_metadata,
+      format_scene=format_scene)
+
+  if staging_dir is not None:
+    tf.io.gfile.makedirs(str(staging_dir))
+    for size, result in results.items():
+      if size == target_size:
+        continue  # the example for target_size is returned (and never read again)
+      # write to a temporary file first, so that no other build reads a partial example
+      staged_path = get_staged_path(staging_dir, scene_dir, size)
+      with tf.io.gfile.GFile(staged_path + ".tmp", "wb") as fp:
+        pickle.dump((example_key, result, metadata), fp)
+      tf.io.gfile.rename(staged_path + ".tmp", staged_path, overwrite=True)
+  return example_key, results[target_size], metadata
+
+
+def get_staged_sizes(builder_config, builder_configs):
+  """Returns the resolutions (height, width) of all builder_configs that are built from the same
+  scenes (train_val_path) as builder_config (see the staged_sizes of load_scene_directory)."""
+  return [(config.height, config.width) for config in builder_configs
+          if config.train_val_path == builder_config.train_val_path]
+
+
+def get_staged_path(staging_dir, scene_dir, target_size) -> str:
+  # scene directories of different splits can have the same name, so use the full path
+  scene_hash = hashlib.sha256(str(scene_dir).encode("utf-8")).hexdigest()[:16]
+  height, width = target_size
+  return str(file_io.as_path(staging_dir) /
+             f"{file_io.as_path(scene_dir).name}_{scene_hash}_{height}x{width}.pkl")
+
+
+def load_scene_directory_multi_resolution(scene_dir, target_sizes, layers=DEFAULT_LAYERS,
+                                          max_workers=16, format_instance=None,
+                                          format_metadata=None, format_scene=None):
+  """Decodes a scene directory once and returns its examples at several resolutions.
+
+  See load_scene_directory for the arguments.
+
+  Returns:
+    The example key, a dict mapping each of the target_sizes to the example at that resolution,
+    and the loaded metadata.json.
+  """
   scene_dir = file_io.as_path(scene_dir)
   example_key = f"{scene_dir.name}"
 
-  with tf.io.gfile.GFile(str(scene_dir / "data_ranges.json"), "r") as fp:
-    data_ranges = json.load(fp)
-
   with tf.io.gfile.GFile(str(scene_dir / "metadata.json"), "r") as fp:
     metadata = json.load(fp)
 
@@ -40,36 +162,65 @@ def load_scene_directory(scene_dir, target_size, layers=DEFAULT_LAYERS):
 
   num_frames = metadata["metadata"]["num_frames"]
 
-  result = {
-      "metadata": {
-          "video_name": example_key,
-          "width": target_size[1],
-          "height": target_size[0],
-          "num_frames": num_frames,
-          "num_instances": metadata["metadata"]["num_instances"],
-      },
-      "instances": [format_instance_information(obj)
-                    for obj in metadata["instances"]],
-      "camera": format_camera_information(metadata),
-      "events": format_events_information(events),
-  }
-
-  resolution = metadata["metadata"]["resolution"]
+  container_path = scene_dir / file_io.SCENE_CONTAINER
+  if tf.io.gfile.exists(str(container_path)):
+    # all layers are packed into a single file (see file_io.write_scene_container)
+    container = file_io.SceneContainer(container_path)
+    data_ranges = container.data_ranges
+    frames = {key: container[key] for key in layers}
+  else:
+    with tf.io.gfile.GFile(str(scene_dir / "data_ranges.json"), "r") as fp:
+      data_ranges = json.load(fp)
+
+    # decode all frames of all layers concurrently into one (T, H, W, C) array per layer
+    frames = read_frames({
+        key: ([scene_dir / f"{key}_{f:05d}.{'tiff' if key == 'depth' else 'png'}"
+               for f in range(num_frames)],
+              file_io.read_tiff if key == "depth" else file_io.read_png)
+        for key in layers
+    }, max_workers=max_workers)
+
+  results = {}
+  for target_size in target_sizes:
+    result = {
+        "metadata": {
+            "video_name": example_key,
+            "width": target_size[1],
+            "height": target_size[0],
+            "num_frames": num_frames,
+            "num_instances": metadata["metadata"]["num_instances"],
+        },
+        "instances": [format_instance_information(obj)
+                      for obj in metadata["instances"]],
+        "camera": format_camera_information(metadata),
+        "events": format_events_information(events),
+    }
+    if format_metadata is not None:
+      result["metadata"].update(format_metadata(metadata))
+    if format_scene is not None:
+      result.update(format_scene(metadata))
+    if format_instance is not None:
+      for obj, obj_metadata in zip(result["instances"], metadata["instances"]):
+        obj.update(format_instance(obj_metadata))
+    results[tuple(target_size)] = subsample_frames(frames, result, target_size, layers,
+                                                   metadata, data_ranges)
+
+  return example_key, results, metadata
+
+
+def subsample_frames(frames, result, target_size, layers, metadata, data_ranges):
+  """Adds the frames of all layers (subsampled to target_size) to the result."""
+  if "resolution" in metadata["metadata"]:
+    resolution = metadata["metadata"]["resolution"]
+  else:  # older scenes store the height and width instead
+    resolution = metadata["metadata"]["height"], metadata["metadata"]["width"]
 
   assert resolution[1] / target_size[0] == resolution[0] / target_size[1]
   scale = resolution[1] / target_size[0]
   assert scale == resolution[1] // target_size[0]
 
-  paths = {
-      key: [scene_dir / f"{key}_{f:05d}.png" for f in range(num_frames)]
-      for key in layers if key != "depth"
-  }
-
   if "depth" in layers:
-    depth_paths = [scene_dir / f"depth_{f:05d}.tiff" for f in range(num_frames)]
-    depth_frames = np.array([
-      subsample_nearest_neighbor(file_io.read_tiff(frame_path), target_size)
-      for frame_path in depth_paths])
+    depth_frames = subsample_nearest_neighbor(frames["depth"], target_size)
     depth_min, depth_max = np.min(depth_frames), np.max(depth_frames)
     result["depth"] = convert_float_to_uint16(depth_frames, depth_min, depth_max)
     result["metadata"]["depth_range"] = [depth_min, depth_max]
@@ -78,41 +229,29 @@ def load_scene_directory(scene_dir, target_size, layers=DEFAULT_LAYERS):
     result["metadata"]["forward_flow_range"] = [
         data_ranges["forward_flow"]["min"] / scale,
         data_ranges["forward_flow"]["max"] / scale]
-    result["forward_flow"] = [
-        subsample_nearest_neighbor(file_io.read_png(frame_path)[..., :2],
-                                   target_size)
-        for frame_path in paths["forward_flow"]]
+    result["forward_flow"] = subsample_nearest_neighbor(frames["forward_flow"][..., :2],
+                                                        target_size)
 
   if "backward_flow" in layers:
     result["metadata"]["backward_flow_range"] = [
         data_ranges["backward_flow"]["min"] / scale,
         data_ranges["backward_flow"]["max"] / scale]
-    result["backward_flow"] = [
-        subsample_nearest_neighbor(file_io.read_png(frame_path)[..., :2],
-                                   target_size)
-        for frame_path in paths["backward_flow"]]
+    result["backward_flow"] = subsample_nearest_neighbor(frames["backward_flow"][..., :2],
+                                                         target_size)
 
   for key in ["normal", "object_coordinates", "uv"]:
     if key in layers:
-      result[key] = [
-          subsample_nearest_neighbor(file_io.read_png(frame_path),
-                                     target_size)
-        for frame_path in paths[key]]
+      result[key] = subsample_nearest_neighbor(frames[key], target_size)
 
   if "segmentation" in layers:
     # somehow we ended up calling this "segmentations" in TFDS and
     # "segmentation" in kubric. So we have to treat it separately.
-    result["segmentations"] = [
-        subsample_nearest_neighbor(file_io.read_png(frame_path),
-                                   target_size)
-        for frame_path in paths["segmentation"]]
+    result["segmentations"] = subsample_nearest_neighbor(frames["segmentation"], target_size)
 
   if "rgba" in layers:
-    result["video"] = [
-        subsample_avg(file_io.read_png(frame_path), target_size)[..., :3]
-        for frame_path in paths["rgba"]]
+    result["video"] = subsample_avg(frames["rgba"], target_size)[..., :3]
 
-  return example_key, result, metadata
+  return result
 
 
 def get_camera_features(seq_length):
@@ -208,7 +347,8 @@ def format_instance_information(obj):
 
 
 def subsample_nearest_neighbor(arr, size):
-  src_height, src_width, _ = arr.shape
+  """Subsamples an image of shape (H, W, C) (or a stack of images of shape (..., H, W, C))."""
+  src_height, src_width, _ = arr.shape[-3:]
   dst_height, dst_width = size
   height_step = src_height // dst_height
   width_step = src_width // dst_width
@@ -217,7 +357,7 @@ def subsample_nearest_neighbor(arr, size):
 
   height_offset = int(np.floor((height_step-1)/2))
   width_offset = int(np.floor((width_step-1)/2))
-  subsampled = arr[height_offset::height_step, width_offset::width_step, :]
+  subsampled = arr[..., height_offset::height_step, width_offset::width_step, :]
   return subsampled
 
 
@@ -227,18 +367,46 @@ def convert_float_to_uint16(array, min_val, max_val):
 
 
 def subsample_avg(arr, size):
-  src_height, src_width, channels = arr.shape
+  """Average pools an image of shape (H, W, C) (or a stack of images of shape (..., H, W, C))."""
+  src_height, src_width, channels = arr.shape[-3:]
   dst_height, dst_width = size
   height_bin = src_height // dst_height
   width_bin = src_width // dst_width
-  return np.round(arr.reshape((dst_height, height_bin,
-                               dst_width, width_bin,
-                               channels)).mean(axis=(1, 3))).astype(np.uint8)
+  batch_shape = arr.shape[:-3]
+  if not np.issubdtype(arr.dtype, np.integer):
+    return np.round(arr.reshape(batch_shape + (dst_height, height_bin,
+                                               dst_width, width_bin,
+                                               channels)).mean(axis=(-4, -2))).astype(np.uint8)
+  # Sum over the rows of each bin first (contiguous in memory) and then over the columns.
+  # Integer sums are exact, so dividing by the bin size gives exactly the same result as mean().
+  summed = arr.reshape(batch_shape + (dst_height, height_bin, dst_width, width_bin * channels))
+  summed = summed.sum(axis=-3, dtype=np.int64)
+  summed = summed.reshape(batch_shape + (dst_height, dst_width, width_bin, channels)).sum(axis=-2)
+  return np.round(summed / (height_bin * width_bin)).astype(np.uint8)
+
+
+def create_complete_scene_dirs(directories, complete_dirs=None):
+  """Beam transform that creates a PCollection of the complete directories among directories.
+
+  Args:
+    directories: The scene directories (e.g. of a split).
+    complete_dirs: Optional set of the directories that are known to be complete (with a
+      completion manifest, see scene_index.list_scene_dirs). These are used without checking,
+      all other directories (e.g. of jobs written before completion manifests existed) are
+      checked with is_complete_dir.
+  """
+  beam = tfds.core.lazy_imports.apache_beam
+  complete_dirs = frozenset(complete_dirs or ())
+  return (beam.Create(directories) |
+          beam.Filter(lambda d: d in complete_dirs or is_complete_dir(d)))
 
 
 def is_complete_dir(video_dir, layers=DEFAULT_LAYERS):
   video_dir = file_io.as_path(video_dir)
   filenames = [d.name for d in video_dir.iterdir()]
+  if file_io.SCENE_CONTAINER in filenames:
+    # the container (with all layers) is written at once
+    return "metadata.json" in filenames and "events.json" in filenames
   if not ("data_ranges.json" in filenames and
           "metadata.json" in filenames and
           "events.json" in filenames):
@@ -12,17 +12,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
 import contextlib
 import functools
+import hashlib
+import io
 import logging
 import json
-import multiprocessing
+from multiprocessing import shared_memory
+import os
 import pickle
-from typing import Any, Dict
+import struct
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+import zipfile
+import zlib
 
 from etils import epath
 import imageio
 import numpy as np
+import PIL.Image
 import png
 import tensorflow as tf
 
@@ -69,6 +79,47 @@ def read_json(filename: PathLike) -> Any:
     return json.load(fp, )
 
 
+COMPLETION_MANIFEST = "completion_manifest.json"
+
+
+def write_completion_manifest(directory: PathLike, compute_checksum: bool = True
+                              ) -> Dict[str, Any]:
+  """Marks the output directory as complete by writing a manifest of all files in it.
+
+  Should be the last step of a worker. The manifest contains the name and size of every file and
+  (optionally) a sha256 checksum of their contents. It is first written to a temporary file and
+  then renamed, so that readers never see a partial manifest.
+  """
+  directory = as_path(directory)
+  filenames = sorted(name for name in tf.io.gfile.listdir(str(directory))
+                     if name != COMPLETION_MANIFEST)
+  sha256 = hashlib.sha256()
+  files = {}
+  for name in filenames:
+    stat = tf.io.gfile.stat(str(directory / name))
+    if stat.is_directory:
+      continue
+    files[name] = stat.length
+    if compute_checksum:
+      sha256.update(name.encode("utf-8"))
+      sha256.update((directory / name).read_bytes())
+  manifest = {"files": files, "checksum": sha256.hexdigest() if compute_checksum else None}
+
+  tmp_path = str(directory / (COMPLETION_MANIFEST + ".tmp"))
+  with gopen(tmp_path, "w") as fp:
+    json.dump(manifest, fp, sort_keys=True)
+  tf.io.gfile.rename(tmp_path, str(directory / COMPLETION_MANIFEST), overwrite=True)
+  return manifest
+
+
+def read_completion_manifest(directory: PathLike) -> Optional[Dict[str, Any]]:
+  """Returns the completion manifest of the directory (or None if it is incomplete)."""
+  try:
+    return read_json(as_path(directory) / COMPLETION_MANIFEST)
+  except tf.errors.NotFoundError:
+    return None
+
+
 class _NumpyEncoder(json.JSONEncoder):
   def default(self, o):
     if isinstance(o, np.ndarray):
@@ -76,9 +127,149 @@ class _NumpyEncoder(json.JSONEncoder):
     return json.JSONEncoder.default(self, o)
 
 
-def write_png(data: np.array, filename: PathLike) -> None:
-  """Writes data as a png file (and convert datatypes if necessary)."""
+class PngCodec:
+  """Interface of the PNG encoders/decoders used by read_png, write_png and write_palette_png."""
 
+  def encode(self, data: np.ndarray, palette: Optional[np.ndarray] = None,
+             compression: Optional[int] = None) -> bytes:
+    """Encodes uint8/uint16 data of shape (H, W, C) with C in {1, 3, 4} as PNG.
+
+    Args:
+      data: the image data. Must have a single channel (and dtype uint8) if a palette is given.
+      palette: optional palette with one (R, G, B) entry per value of data.
+      compression: zlib compression level (0-9). Defaults to the zlib default (6).
+    """
+    raise NotImplementedError
+
+  def decode(self, png_bytes: bytes) -> np.ndarray:
+    """Decodes PNG data into an array of shape (H, W, C) and dtype uint8 or uint16."""
+    raise NotImplementedError
+
+
+def _get_png_writer(data: np.ndarray, palette=None, compression=None) -> png.Writer:
+  height, width, channels = data.shape
+  if palette is not None:
+    return png.Writer(width=width, height=height, palette=palette, bitdepth=8,
+                      compression=compression)
+  bitdepth = 8 if data.dtype == np.uint8 else 16
+  return png.Writer(width=width, height=height, greyscale=(channels == 1), bitdepth=bitdepth,
+                    alpha=(channels == 4), compression=compression)
+
+
+class PyPngCodec(PngCodec):
+  """Pure python PNG codec based on pypng (slow but the reference implementation)."""
+
+  def encode(self, data, palette=None, compression=None):
+    w = _get_png_writer(data, palette, compression)
+    height = data.shape[0]
+    with io.BytesIO() as fp:
+      # pypng expects 2d arrays
+      # see https://pypng.readthedocs.io/en/latest/ex.html#reshaping
+      w.write(fp, data.reshape(height, -1))
+      return fp.getvalue()
+
+  def decode(self, png_bytes):
+    png_reader = png.Reader(bytes=png_bytes)
+    width, height, pngdata, info = png_reader.read()
+    del png_reader
+
+    bitdepth = info["bitdepth"]
+    if bitdepth == 8:
+      dtype = np.uint8
+    elif bitdepth == 16:
+      dtype = np.uint16
+    else:
+      raise NotImplementedError(f"Unsupported bitdepth: {bitdepth}")
+
+    plane_count = info["planes"]
+    pngdata = np.vstack(list(map(dtype, pngdata)))
+    return pngdata.reshape((height, width, plane_count))
+
+
+class ZlibPngCodec(PngCodec):
+  """PNG codec that (de)compresses whole images at once using numpy and zlib.
+
+  Produces byte-identical files to PyPngCodec: same chunks, "None" filter for every scanline and
+  the compressor is fed the same batches of scanlines as pypng (so the IDAT chunks match).
+  Decoding is fast for unfiltered images (such as the ones written by this codec). Filtered 8-bit
+  images (e.g. PNGs written by Blender) are decoded with PIL, all others fall back to pypng.
+  """
+  _PLANES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # color type -> number of channels
+
+  def encode(self, data, palette=None, compression=None):
+    w = _get_png_writer(data, palette, compression)
+    height = data.shape[0]
+    rows = data.reshape(height, -1).astype(">u2" if w.bitdepth == 16 else np.uint8)
+    scanlines = np.zeros((height, 1 + rows.nbytes // height), dtype=np.uint8)
+    scanlines[:, 1:] = rows.view(np.uint8).reshape(height, -1)
+
+    compressor = zlib.compressobj(-1 if compression is None else compression)
+    # pypng compresses (and emits an IDAT chunk) as soon as more than chunk_limit bytes are queued
+    rows_per_chunk = w.chunk_limit // scanlines.shape[1] + 1
+    nr_chunks = height // rows_per_chunk
+    with io.BytesIO() as fp:
+      w.write_preamble(fp)
+      for i in range(nr_chunks):
+        compressed = compressor.compress(
+            scanlines[i * rows_per_chunk:(i + 1) * rows_per_chunk].tobytes())
+        if compressed:
+          png.write_chunk(fp, b"IDAT", compressed)
+      compressed = compressor.compress(scanlines[nr_chunks * rows_per_chunk:].tobytes())
+      compressed += compressor.flush()
+      if compressed:
+        png.write_chunk(fp, b"IDAT", compressed)
+      png.write_chunk(fp, b"IEND")
+      return fp.getvalue()
+
+  def decode(self, png_bytes):
+    header, idat = None, []
+    pos = len(png.signature)
+    while pos < len(png_bytes):
+      length, tag = struct.unpack(">I4s", png_bytes[pos:pos + 8])
+      if tag == b"IHDR":
+        header = struct.unpack(">2I5B", png_bytes[pos + 8:pos + 8 + length])
+      elif tag == b"IDAT":
+        idat.append(png_bytes[pos + 8:pos + 8 + length])
+      elif tag == b"IEND":
+        break
+      pos += length + 12
+
+    width, height, bitdepth, color_type, _, _, interlace = header
+    if interlace or bitdepth not in (8, 16) or color_type not in self._PLANES:
+      return PNG_CODECS["pypng"].decode(png_bytes)
+    planes = self._PLANES[color_type]
+    scanlines = np.frombuffer(zlib.decompress(b"".join(idat)), dtype=np.uint8)
+    scanlines = scanlines.reshape(height, 1 + width * planes * bitdepth // 8)
+
+    if np.any(scanlines[:, 0]):  # at least one scanline uses a filter
+      if bitdepth == 8:
+        with PIL.Image.open(io.BytesIO(png_bytes)) as img:
+          return np.asarray(img).reshape((height, width, planes))
+      return PNG_CODECS["pypng"].decode(png_bytes)
+
+    if bitdepth == 8:
+      return np.ascontiguousarray(scanlines[:, 1:]).reshape((height, width, planes))
+    pngdata = np.ascontiguousarray(scanlines[:, 1:]).view(">u2").astype(np.uint16)
+    return pngdata.reshape((height, width, planes))
+
+
+PNG_CODECS = {
+    "pypng": PyPngCodec(),
+    "zlib": ZlibPngCodec(),
+}
+DEFAULT_PNG_CODEC = "zlib"
+
+
+def _write_png_bytes(data: np.ndarray, filename: PathLike, palette=None, codec=None,
+                     compression=None):
+  png_bytes = PNG_CODECS[codec or DEFAULT_PNG_CODEC].encode(data, palette=palette,
+                                                            compression=compression)
+  with gopen(filename, "wb") as fp:
+    fp.write(png_bytes)
+
+
+def _convert_to_png_dtype(data: np.ndarray, filename: PathLike) -> np.ndarray:
+  """Converts data to uint8 or uint16 (floats in [0, 1] are scaled to the uint16 range)."""
   if data.dtype in [np.uint32, np.uint64]:
     max_value = np.amax(data)
     if max_value > 65535:
@@ -97,50 +288,58 @@ def write_png(data: np.array, filename: PathLike) -> None:
     pass
   else:
     raise NotImplementedError(f"Cannot handle {data.dtype}.")
+  return data
 
-  bitdepth = 8 if data.dtype == np.uint8 else 16
 
-  assert data.ndim == 3, data.shape
-  height, width, channels = data.shape
-  greyscale = (channels == 1)
-  alpha = (channels == 4)
-  w = png.Writer(width=width, height=height, greyscale=greyscale, bitdepth=bitdepth, alpha=alpha)
+def _convert_to_palette_dtype(data: np.ndarray, filename: PathLike) -> np.ndarray:
+  if data.dtype in [np.uint16, np.uint32, np.uint64]:
+    max_value = np.amax(data)
+    if max_value > 255:
+      logger.warning("max_value %d exceeds uint bounds for %s.",
+                     max_value, filename)
+    data = data.astype(np.uint8)
+  elif data.dtype == np.uint8:
+    pass
+  else:
+    raise NotImplementedError(f"Cannot handle {data.dtype}.")
+  return data
+
+
+def write_png(data: np.array, filename: PathLike, codec: Optional[str] = None,
+              compression: Optional[int] = None) -> None:
+  """Writes data as a png file (and convert datatypes if necessary).
 
-  if channels == 2:
+  Args:
+    data: the image (H, W, C) to be written.
+    filename: the filename to write to (can be a GCS path).
+    codec: name of the PNG codec in PNG_CODECS to use (defaults to DEFAULT_PNG_CODEC).
+    compression: zlib compression level (0-9). Defaults to the zlib default (6).
+  """
+
+  data = _convert_to_png_dtype(data, filename)
+
+  assert data.ndim == 3, data.shape
+  if data.shape[2] == 2:
     # Pad two-channel images with a zero channel.
     data = np.concatenate([data, np.zeros_like(data[:, :, :1])], axis=-1)
 
-  # pypng expects 2d arrays
-  # see https://pypng.readthedocs.io/en/latest/ex.html#reshaping
-  data = data.reshape(height, -1)
-  with gopen(filename, "wb") as fp:
-    w.write(fp, data)
+  _write_png_bytes(data, filename, codec=codec, compression=compression)
 
 
 def write_palette_png(data: np.array, filename: PathLike,
-                      palette: np.ndarray = None):
+                      palette: np.ndarray = None, codec: Optional[str] = None,
+                      compression: Optional[int] = None):
   """Writes grayscale data as pngs to path using a fixed palette (e.g. for segmentations)."""
   assert data.ndim == 3, data.shape
   height, width, channels = data.shape
   assert channels == 1, "Must be grayscale"
 
-  if data.dtype in [np.uint16, np.uint32, np.uint64]:
-    max_value = np.amax(data)
-    if max_value > 255:
-      logger.warning("max_value %d exceeds uint bounds for %s.",
-                     max_value, filename)
-    data = data.astype(np.uint8)
-  elif data.dtype == np.uint8:
-    pass
-  else:
-    raise NotImplementedError(f"Cannot handle {data.dtype}.")
+  data = _convert_to_palette_dtype(data, filename)
 
   if palette is None:
     palette = plotting.hls_palette(np.max(data) + 1)
 
-  w = png.Writer(width=width, height=height, palette=palette, bitdepth=8)
-  with gopen(filename, "wb") as fp:
-    w.write(fp, data[:, :, 0])
+  _write_png_bytes(data, filename, palette=palette, codec=codec, compression=compression)
 
 
 def write_scaled_png(data: np.array, filename: PathLike) -> Dict[str, float]:
@@ -163,27 +362,15 @@ def write_scaled_png(data: np.array, filename: PathLike) -> Dict[str, float]:
   return scaling
 
 
-def read_png(filename: PathLike, rescale_range=None) -> np.ndarray:
+def read_png(filename: PathLike, rescale_range=None, codec: Optional[str] = None) -> np.ndarray:
   filename = as_path(filename)
-  png_reader = png.Reader(bytes=filename.read_bytes())
-  width, height, pngdata, info = png_reader.read()
-  del png_reader
-
-  bitdepth = info["bitdepth"]
-  if bitdepth == 8:
-    dtype = np.uint8
-  elif bitdepth == 16:
-    dtype = np.uint16
-  else:
-    raise NotImplementedError(f"Unsupported bitdepth: {bitdepth}")
-
-  plane_count = info["planes"]
-  pngdata = np.vstack(list(map(dtype, pngdata)))
+  pngdata = PNG_CODECS[codec or DEFAULT_PNG_CODEC].decode(filename.read_bytes())
   if rescale_range is not None:
+    bitdepth = 8 if pngdata.dtype == np.uint8 else 16
     minv, maxv = rescale_range
     pngdata = pngdata / 2**bitdepth * (maxv - minv) + minv
 
-  return pngdata.reshape((height, width, plane_count))
+  return pngdata
 
 
 def write_tiff(data: np.ndarray, filename: PathLike):
@@ -204,9 +391,22 @@ def read_tiff(filename: PathLike) -> np.ndarray:
   return img
 
 
+def _write_shared_image(shm_name: str, shape, dtype, index: int, filename: str, write_fn,
+                        kwargs):
+  """Writes a single frame of a batch stored in shared memory (runs in a worker process)."""
+  shm = shared_memory.SharedMemory(name=shm_name)
+  try:
+    frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    write_fn(frames[index], filename, **kwargs)
+    del frames  # release the buffer before closing the shared memory
+  finally:
+    shm.close()
+
+
 def multi_write_image(data: np.ndarray, path_template: str, write_fn=write_png,
-                      max_write_threads=16, **kwargs):
-  """Write a batch of images to a series of files using a ThreadPool.
+                      max_write_threads=16, executor: str = "thread", **kwargs):
+  """Write a batch of images to a series of files using a pool of threads or processes.
+
   Args:
     data: Batch of images to write. Shape = (batch_size, height, width, channels)
     path_template: a template for the filenames (e.g. "rgb_frame_{:05d}.png").
@@ -214,92 +414,129 @@ def multi_write_image(data: np.ndarray, path_template: str, write_fn=write_png,
     write_fn: the function used for writing the image to disk.
       Must take an image array as its first and a filename as its second argument.
       May take other keyword arguments. (Defaults to the write_png function)
-    max_write_threads: number of threads to use for writing images. (default = 16)
+    max_write_threads: number of threads (or processes) to use for writing images.
+      (default = 16)
+    executor: "thread" to write with a thread pool (best for I/O-bound writes, e.g. to GCS), or
+      "process" to encode the images in a process pool that reads the frames from shared memory
+      (best for CPU-bound encoding). For "process", write_fn and kwargs have to be picklable.
     **kwargs: additional kwargs to pass to the write_fn.
-  """
-  num_threads = min(data.shape[0], max_write_threads)
-  with multiprocessing.pool.ThreadPool(num_threads) as pool:
-    args = [(img, path_template.format(i)) for i, img in enumerate(data)]
 
-    def write_single_image_fn(arg):
-      write_fn(*arg, **kwargs)
-
-    for result in pool.imap_unordered(write_single_image_fn, args):
-      if isinstance(result,  Exception):
-        logger.warning("Exception while writing image %s", result)
+  Raises:
+    Any exception raised by write_fn (after all other images have been written).
+  """
+  num_workers = max(min(data.shape[0], max_write_threads), 1)
+  filenames = [path_template.format(i) for i in range(data.shape[0])]
+  if executor == "thread":
+    with concurrent.futures.ThreadPoolExecutor(num_workers) as pool:
+      futures = [pool.submit(write_fn, img, filename, **kwargs)
+                 for img, filename in zip(data, filenames)]
+  elif executor == "process":
+    data = np.asarray(data)
+    shm = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+    try:
+      np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+      with concurrent.futures.ProcessPoolExecutor(num_workers) as pool:
+        futures = [pool.submit(_write_shared_image, shm.name, data.shape, data.dtype, i,
+                               filename, write_fn, kwargs)
+                   for i, filename in enumerate(filenames)]
+    finally:
+      shm.close()
+      shm.unlink()
+  else:
+    raise ValueError(f"Unknown executor '{executor}' (expected 'thread' or 'process').")
 
-    pool.close()
-    pool.join()
+  for future in futures:
+    future.result()  # re-raise the first exception (if any)
 
 
-def write_rgb_batch(data, directory, file_template="rgb_{:05d}.png", max_write_threads=16):
+def write_rgb_batch(data, directory, file_template="rgb_{:05d}.png",
+                    max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 3, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
-def write_rgba_batch(data, directory, file_template="rgba_{:05d}.png", max_write_threads=16):
+def write_rgba_batch(data, directory, file_template="rgba_{:05d}.png",
+                     max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 4, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
-def write_uv_batch(data, directory, file_template="uv_{:05d}.png", max_write_threads=16):
+def write_uv_batch(data, directory, file_template="uv_{:05d}.png",
+                   max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 3, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
-def write_normal_batch(data, directory, file_template="normal_{:05d}.png", max_write_threads=16):
+def write_normal_batch(data, directory, file_template="normal_{:05d}.png",
+                       max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 3, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
 def write_coordinates_batch(data, directory, file_template="object_coordinates_{:05d}.png",
-                            max_write_threads=16):
+                            max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 3, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_png, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
-def write_depth_batch(data, directory, file_template="depth_{:05d}.tiff", max_write_threads=16):
+def write_depth_batch(data, directory, file_template="depth_{:05d}.tiff",
+                      max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 1, data.shape
   path_template = str(as_path(directory) / file_template)
-  multi_write_image(data, path_template, write_fn=write_tiff, max_write_threads=max_write_threads)
+  multi_write_image(data, path_template, write_fn=write_tiff, max_write_threads=max_write_threads,
+                    executor=executor)
 
 
 def write_segmentation_batch(data, directory, file_template="segmentation_{:05d}.png",
-                             max_write_threads=16):
+                             max_write_threads=16, executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 1, data.shape
   assert data.dtype in [np.uint8, np.uint16, np.uint32, np.uint64], data.dtype
   path_template = str(as_path(directory) / file_template)
   palette = plotting.hls_palette(np.max(data) + 1)
   multi_write_image(data, path_template, write_fn=write_palette_png,
-                    max_write_threads=max_write_threads, palette=palette)
+                    max_write_threads=max_write_threads, executor=executor, palette=palette)
+
+
+_range_file_lock = threading.Lock()
+
+
+def _quantize_flow(data: np.ndarray):
+  """Scales data to the uint16 range and returns it with the scaling {"min": .., "max": ..}."""
+  min_value = np.min(data)
+  max_value = np.max(data)
+  scaling = {"min": min_value.item(), "max": max_value.item()}
+  data = (data - min_value) * 65535 / (max_value - min_value)
+  return data.astype(np.uint16), scaling
 
 
 def write_flow_batch(data, directory, file_template="flow_{:05d}.png", name="flow",
-                     max_write_threads=16, range_file="data_ranges.json"):
+                     max_write_threads=16, range_file="data_ranges.json", executor="thread"):
   assert data.ndim == 4 and data.shape[-1] == 2, data.shape
   assert data.dtype in [np.float32, np.float64], data.dtype
   directory = as_path(directory)
   path_template = str(directory / file_template)
   range_file_path = directory / range_file
-  min_value = np.min(data)
-  max_value = np.max(data)
-  scaling = {"min": min_value.item(), "max": max_value.item()}
-  data = (data - min_value) * 65535 / (max_value - min_value)
-  data = data.astype(np.uint16)
+  data, scaling = _quantize_flow(data)
   multi_write_image(data, path_template, write_fn=write_png,
-                    max_write_threads=max_write_threads)
+                    max_write_threads=max_write_threads, executor=executor)
 
-  if range_file_path.exists():
-    ranges = read_json(range_file_path)
-  else:
-    ranges = {}
-  ranges[name] = scaling
-  write_json(ranges, range_file_path)
+  with _range_file_lock:  # forward and backward flow might be written concurrently
+    if range_file_path.exists():
+      ranges = read_json(range_file_path)
+    else:
+      ranges = {}
+    ranges[name] = scaling
+    write_json(ranges, range_file_path)
 
 
 write_forward_flow_batch = functools.partial(write_flow_batch, name="forward_flow",
@@ -322,10 +559,151 @@ DEFAULT_WRITERS = {
 
 
 def write_image_dict(data_dict: Dict[str, np.ndarray], directory: PathLike,
-                     file_templates: Dict[str, str] = (), max_write_threads=16):
-  for key, data in data_dict.items():
+                     file_templates: Dict[str, str] = (), max_write_threads=16,
+                     executor: str = "thread", concurrent_layers: bool = False):
+  """Writes all layers in data_dict to image files using the DEFAULT_WRITERS.
+
+  Args:
+    data_dict: dict of layer name (e.g. "rgba") to a batch of images (frames).
+    directory: the directory to write the image files to.
+    file_templates: optional dict of filename templates for (some of) the layers.
+    max_write_threads: number of threads (or processes) used for writing the frames of a layer.
+    executor: "thread" or "process" (see multi_write_image).
+    concurrent_layers: write all layers concurrently instead of one layer after another.
+  """
+  def write_layer(key):
+    kwargs = {"max_write_threads": max_write_threads, "executor": executor}
     if key in file_templates:
-      DEFAULT_WRITERS[key](data, directory, file_template=file_templates[key],
-                           max_write_threads=max_write_threads)
+      kwargs["file_template"] = file_templates[key]
+    DEFAULT_WRITERS[key](data_dict[key], directory, **kwargs)
+
+  if not concurrent_layers:
+    for key in data_dict:
+      write_layer(key)
+    return
+
+  with concurrent.futures.ThreadPoolExecutor(max(len(data_dict), 1)) as pool:
+    futures = [pool.submit(write_layer, key) for key in data_dict]
+  for future in futures:
+    future.result()  # re-raise the first exception (if any)
+
+
+SCENE_CONTAINER = "scene.npz"
+_DATA_RANGES_KEY = "data_ranges.json"
+
+
+def write_scene_container(data_dict: Dict[str, np.ndarray], directory: PathLike,
+                          filename: str = SCENE_CONTAINER) -> Dict[str, Dict[str, float]]:
+  """Writes all layers in data_dict into a single (uncompressed) .npz file.
+
+  An alternative to write_image_dict that writes one file per scene instead of one file per layer
+  and frame (see SceneContainer for reading it). The layers are converted like by the
+  DEFAULT_WRITERS (e.g. flow is quantized to uint16 and its range is stored in the container),
+  so every layer holds the same values as its frames read with read_png or read_tiff (except
+  that flow keeps two channels).
+
+  Args:
+    data_dict: dict of layer name (e.g. "rgba") to a batch of images (frames).
+    directory: the directory to write the container to.
+    filename: the filename of the container.
+
+  Returns:
+    The data ranges {"min": .., "max": ..} of the quantized layers.
+  """
+  arrays = {}
+  data_ranges = {}
+  for key, data in data_dict.items():
+    assert data.ndim == 4, (key, data.shape)
+    if key in ["flow", "forward_flow", "backward_flow"]:
+      assert data.dtype in [np.float32, np.float64], data.dtype
+      arrays[key], data_ranges[key] = _quantize_flow(data)
+    elif key == "depth":
+      arrays[key] = data
+    elif key == "segmentation":
+      arrays[key] = _convert_to_palette_dtype(data, key)
     else:
-      DEFAULT_WRITERS[key](data, directory, max_write_threads=max_write_threads)
+      arrays[key] = _convert_to_png_dtype(data, key)
+  arrays[_DATA_RANGES_KEY] = np.frombuffer(json.dumps(data_ranges).encode("utf-8"), np.uint8)
+
+  # zip files cannot be written to GCS directly, so write to a temporary file first
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    tmp_path = os.path.join(tmp_dir, filename)
+    with open(tmp_path, "wb") as fp:
+      np.savez(fp, **arrays)
+    as_path(directory).mkdir(parents=True, exist_ok=True)
+    tf.io.gfile.copy(tmp_path, str(as_path(directory) / filename), overwrite=True)
+  return data_ranges
+
+
+class SceneContainer:
+  """Lazy read access to the layers of a scene container (see write_scene_container).
+
+  Local containers are memory mapped, so only the frames that are actually used are read from
+  disk. For remote containers (e.g. on GCS) each layer or frame is read with a single request.
+
+  Usage:
+    container = SceneContainer(scene_dir / SCENE_CONTAINER)
+    rgba = container["rgba"]  # (num_frames, height, width, 4)
+    depth = container.read_frame("depth", 0)  # (height, width, 1)
+  """
+
+  def __init__(self, filename: PathLike):
+    self.filename = str(filename)
+    self.is_local = os.path.exists(self.filename)
+    self._layers = {}  # name -> (offset, shape, dtype)
+    self._memmaps = {}
+    with tf.io.gfile.GFile(self.filename, "rb") as fp:
+      with zipfile.ZipFile(fp) as zip_file:
+        for info in zip_file.infolist():
+          if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{info.filename} in {self.filename} is compressed.")
+          # skip the local file header (30 bytes + filename + extra field) of the .npy file
+          fp.seek(info.header_offset + 26)
+          name_length, extra_length = struct.unpack("<2H", fp.read(4))
+          fp.seek(info.header_offset + 30 + name_length + extra_length)
+          version = np.lib.format.read_magic(fp)
+          if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+          else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+          assert not fortran_order, info.filename
+          self._layers[info.filename[:-len(".npy")]] = (fp.tell(), shape, dtype)
+    self.data_ranges = json.loads(self._read(_DATA_RANGES_KEY).tobytes())
+
+  @property
+  def layers(self):
+    return [name for name in self._layers if name != _DATA_RANGES_KEY]
+
+  def __contains__(self, key: str) -> bool:
+    return key in self.layers
+
+  def __getitem__(self, key: str) -> np.ndarray:
+    """Returns all frames of a layer (memory mapped for local containers)."""
+    if key not in self:
+      raise KeyError(key)
+    return self._read(key)
+
+  def read_frame(self, key: str, index: int) -> np.ndarray:
+    """Returns a single frame of a layer (without reading any other frames)."""
+    if key not in self:
+      raise KeyError(key)
+    offset, shape, dtype = self._layers[key]
+    if self.is_local:
+      return self._read(key)[index]
+    frame_shape = shape[1:]
+    nbytes = int(np.prod(frame_shape)) * dtype.itemsize
+    with tf.io.gfile.GFile(self.filename, "rb") as fp:
+      fp.seek(offset + index * nbytes)
+      return np.frombuffer(fp.read(nbytes), dtype=dtype).reshape(frame_shape)
+
+  def _read(self, key: str) -> np.ndarray:
+    offset, shape, dtype = self._layers[key]
+    if self.is_local:
+      if key not in self._memmaps:
+        self._memmaps[key] = np.asarray(np.memmap(self.filename, dtype=dtype, mode="r",
+                                                  offset=offset, shape=shape))
+      return self._memmaps[key]
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    with tf.io.gfile.GFile(self.filename, "rb") as fp:
+      fp.seek(offset)
+      return np.frombuffer(fp.read(nbytes), dtype=dtype).reshape(shape)
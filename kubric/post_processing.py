@@ -13,57 +13,173 @@
 # limitations under the License.
 
 import numpy as np
-from typing import Sequence
+from typing import Dict, Optional, Sequence
 from kubric import core
 from kubric.kubric_typing import ArrayLike
 
 
-def compute_visibility(segmentation: np.ndarray, assets: Sequence[core.Asset]):
+def segmentation_statistics(segmentation: ArrayLike,
+                            num_ids: Optional[int] = None) -> Dict[str, np.ndarray]:
+  """Computes the visibility and bounding box of every segmentation id in a single pass.
+
+  For every frame the pixel counts are obtained with a single np.bincount, and the bounding boxes
+  from one scatter of all pixels into (id x row) and (id x column) occupancy tables.
+
+  Args:
+    segmentation: An integer array of shape (T, H, W, 1) (or (T, H, W)) of segmentation indices.
+    num_ids: The number of ids to compute statistics for (defaults to segmentation.max() + 1).
+
+  Returns:
+    A dict with
+      "visibility": (num_ids, T) number of pixels of each id in each frame.
+      "bboxes": (num_ids, T, 4) bounding boxes (y_min, x_min, y_max, x_max) in relative
+        image coordinates (see compute_bboxes) or NaN if the id is not visible in that frame.
+  """
+  segmentation = np.asarray(segmentation)
+  num_frames, height, width = segmentation.shape[:3]
+  segmentation = segmentation.reshape((num_frames, height, width))
+  max_id = int(segmentation.max()) if segmentation.size else 0
+  num_ids = max_id + 1 if num_ids is None else num_ids
+  if max_id >= num_ids:
+    raise ValueError(f"Segmentation contains id {max_id}, but num_ids is only {num_ids}.")
+
+  visibility = np.zeros((num_ids, num_frames), dtype=np.int64)
+  bboxes = np.full((num_ids, num_frames, 4), np.nan, dtype=np.float64)
+  row_idxs = np.arange(height)[:, np.newaxis]
+  col_idxs = np.arange(width)[np.newaxis, :]
+  for t in range(num_frames):
+    ids = segmentation[t].astype(np.intp)
+    visibility[:, t] = np.bincount(ids.ravel(), minlength=num_ids)
+    rows_occupied = np.zeros((num_ids, height), dtype=bool)
+    rows_occupied[ids, row_idxs] = True
+    cols_occupied = np.zeros((num_ids, width), dtype=bool)
+    cols_occupied[ids, col_idxs] = True
+
+    visible = visibility[:, t] > 0
+    rows_occupied, cols_occupied = rows_occupied[visible], cols_occupied[visible]
+    y_min = np.argmax(rows_occupied, axis=1)
+    y_max = height - np.argmax(rows_occupied[:, ::-1], axis=1)
+    x_min = np.argmax(cols_occupied, axis=1)
+    x_max = width - np.argmax(cols_occupied[:, ::-1], axis=1)
+    size = np.array([height, width, height, width], dtype=np.float64)
+    bboxes[visible, t] = np.stack([y_min, x_min, y_max, x_max], axis=-1) / size
+  return {"visibility": visibility, "bboxes": bboxes}
+
+
+def segmentation_remap_lut(
+    old_assets_list: Sequence[core.Asset],
+    new_assets_list: Sequence[core.Asset],
+    ignored_label: int = 0,
+    num_ids: Optional[int] = None) -> np.ndarray:
+  """Lookup table that maps old segmentation ids to new ones (see adjust_segmentation_idxs).
+
+  Args:
+    old_assets_list: The assets corresponding to the old segmentation ids (starting with id=1).
+    new_assets_list: The assets corresponding to the new segmentation ids (starting with id=1).
+    ignored_label: The new id for assets that are not part of new_assets_list.
+    num_ids: Minimum size of the lookup table (ids without an asset are mapped to 0).
+
+  Returns:
+    An int64 array lut such that new_segmentation = lut[old_segmentation].
+  """
+  new_asset_idxs = {asset: i for i, asset in reversed(list(enumerate(new_assets_list, start=1)))}
+  lut = np.zeros(max(num_ids or 0, len(old_assets_list) + 1), dtype=np.int64)
+  for i, asset in enumerate(old_assets_list, start=1):
+    if isinstance(asset, core.PhysicalObject) and asset.segmentation_id is not None:
+      lut[i] = asset.segmentation_id
+    else:
+      lut[i] = new_asset_idxs.get(asset, ignored_label)
+  return lut
+
+
+def remap_segmentation_statistics(statistics: Dict[str, np.ndarray],
+                                  lut: ArrayLike) -> Dict[str, np.ndarray]:
+  """Transforms segmentation_statistics(seg) into segmentation_statistics(lut[seg]).
+
+  Only the (small) statistics arrays are touched, so the segmentation is not scanned again.
+  Statistics of old ids that map to the same new id are merged.
+  """
+  visibility, bboxes = statistics["visibility"], statistics["bboxes"]
+  old_num_ids = visibility.shape[0]
+  lut = np.asarray(lut, dtype=np.int64)[:old_num_ids]
+  lut = np.pad(lut, (0, old_num_ids - len(lut)))  # ids not covered by the lut are mapped to 0
+  num_ids = int(lut.max()) + 1
+
+  new_visibility = np.zeros((num_ids,) + visibility.shape[1:], dtype=visibility.dtype)
+  np.add.at(new_visibility, lut, visibility)
+  new_bboxes = np.full((num_ids,) + bboxes.shape[1:], np.nan, dtype=bboxes.dtype)
+  np.fmin.at(new_bboxes[..., :2], lut, bboxes[..., :2])
+  np.fmax.at(new_bboxes[..., 2:], lut, bboxes[..., 2:])
+  return {"visibility": new_visibility, "bboxes": new_bboxes}
+
+
+def compute_visibility(segmentation: np.ndarray, assets: Sequence[core.Asset],
+                       statistics: Optional[Dict[str, np.ndarray]] = None):
   """Compute how many pixels are visible for each instance at each frame.
 
   Args:
     segmentation: An integer array that contains segmentation indices.
     assets: The list of assets in the scene (whose ordering corresponds to the segmentation indices)
+    statistics: Optional result of segmentation_statistics(segmentation) to avoid recomputing it.
 
   """
+  if statistics is None:
+    statistics = segmentation_statistics(segmentation)
+  visibility = statistics["visibility"]
   for i, asset in enumerate(assets, start=1):
-    asset.metadata["visibility"] = [int(np.sum(segmentation[t] == i))
-                                    for t in range(segmentation.shape[0])]
+    if i < visibility.shape[0]:
+      asset.metadata["visibility"] = visibility[i].tolist()
+    else:
+      asset.metadata["visibility"] = [0] * visibility.shape[1]
 
 
 def adjust_segmentation_idxs(
     segmentation: ArrayLike,
     old_assets_list: Sequence[core.Asset],
     new_assets_list: Sequence[core.Asset],
-    ignored_label: int = 0):
+    ignored_label: int = 0,
+    lut: Optional[ArrayLike] = None):
   """Replaces segmentation ids with either asset.segmentation_id or the index in new_assets_list.
 
   Note that this starts with index=1 for the first asset in new_assets_list, to leave id=0 for
   background assets.
+
+  Args:
+    segmentation: An integer array that contains segmentation indices.
+    old_assets_list: The assets corresponding to the current segmentation ids.
+    new_assets_list: The assets corresponding to the new segmentation ids.
+    ignored_label: The new id for assets that are not part of new_assets_list.
+    lut: Optional result of segmentation_remap_lut(old_assets_list, new_assets_list,
+      ignored_label) to avoid recomputing it (e.g. when it is also used for
+      remap_segmentation_statistics).
   """
-  new_segmentation = np.zeros_like(segmentation)
-  for i, asset in enumerate(old_assets_list, start=1):
-    if isinstance(asset, core.PhysicalObject) and asset.segmentation_id is not None:
-      new_segmentation[segmentation == i] = asset.segmentation_id
-    elif asset in new_assets_list:
-      new_segmentation[segmentation == i] = new_assets_list.index(asset) + 1
-    else:
-      new_segmentation[segmentation == i] = ignored_label
-  return new_segmentation
+  segmentation = np.asarray(segmentation)
+  num_ids = int(segmentation.max()) + 1 if segmentation.size else 0
+  if lut is None:
+    lut = segmentation_remap_lut(old_assets_list, new_assets_list, ignored_label, num_ids=num_ids)
+  else:
+    lut = np.asarray(lut, dtype=np.int64)
+    lut = np.pad(lut, (0, max(num_ids - len(lut), 0)))  # ids without an asset are mapped to 0
+  return lut.astype(segmentation.dtype)[segmentation]
+
 
+def compute_bboxes(segmentation: ArrayLike, asset_list: Sequence[core.Asset],
+                   statistics: Optional[Dict[str, np.ndarray]] = None):
+  """Stores the per-frame 2D bounding boxes of each asset in its metadata.
 
-def compute_bboxes(segmentation: ArrayLike, asset_list: Sequence[core.Asset]):
+  Args:
+    segmentation: An integer array that contains segmentation indices.
+    asset_list: The assets (whose ordering corresponds to the segmentation indices).
+    statistics: Optional result of segmentation_statistics(segmentation) to avoid recomputing it.
+  """
+  if statistics is None:
+    statistics = segmentation_statistics(segmentation)
+  visibility, bboxes = statistics["visibility"], statistics["bboxes"]
   for k, asset in enumerate(asset_list, start=1):
     asset.metadata["bboxes"] = []
     asset.metadata["bbox_frames"] = []
-    for t in range(segmentation.shape[0]):
-      seg = segmentation[t, ..., 0]
-      idxs = np.array(np.where(seg == k), dtype=np.float32)
-      if idxs.size > 0:
-        y_min = float(idxs[0].min() / seg.shape[0])
-        x_min = float(idxs[1].min() / seg.shape[1])
-        y_max = float((idxs[0].max() + 1) / seg.shape[0])
-        x_max = float((idxs[1].max() + 1) / seg.shape[1])
-        asset.metadata["bboxes"].append((y_min, x_min, y_max, x_max))
-        asset.metadata["bbox_frames"].append(t)
-
+    if k >= visibility.shape[0]:
+      continue
+    for t in np.flatnonzero(visibility[k]):
+      asset.metadata["bboxes"].append(tuple(bboxes[k, t].tolist()))
+      asset.metadata["bbox_frames"].append(int(t))
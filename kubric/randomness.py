@@ -125,6 +125,76 @@ def move_until_no_overlap(asset, simulator, spawn_region=((-1, -1, -1), (1, 1, 1
                         rng=rng)
 
 
+def move_objects_until_no_overlap(assets, simulator, spawn_region=((-1, -1, -1), (1, 1, 1)),
+                                  max_trials=100, margin=0.01, rng=default_rng()):
+  """Place several objects (one after the other) such that none of them overlap.
+
+  Consumes the random numbers in the same order as calling move_until_no_overlap for each asset,
+  but only checks for overlaps (using the simulator) against bodies whose axis aligned bounding
+  boxes (`PhysicalObject.aabbox`, padded by `margin`) intersect the one of the sampled asset.
+  Assets of the list that have not been placed yet are ignored.
+  Bodies with empty bounds (unknown extent) are always checked.
+
+  Args:
+    assets: The objects to place. They need to be linked to the simulator (i.e. added to the scene).
+    simulator: The simulator used for the (narrow phase) overlap checks.
+    spawn_region: Region (min and max corner) in which to place the objects.
+    max_trials: Maximum number of samples per object before giving up with a RuntimeError.
+    margin: Padding added to all bounding boxes before testing them for intersection.
+    rng: The random number generator.
+
+  Returns:
+    A dict of placement statistics with the total number of "trials" and "rejections", the number
+    of "narrow_phase_checks" (pairs of bodies checked by the simulator), and "trials_per_asset".
+  """
+  samplers = [rotation_sampler(), position_sampler(spawn_region)]
+  assets = list(assets)
+  placing = set(assets)
+  obstacles = [a for a in simulator.scene.assets
+               if isinstance(a, objects.PhysicalObject) and simulator in a.linked_objects
+               and a not in placing]
+
+  def get_aabbox(obj):
+    aabbox = obj.aabbox
+    return aabbox[0] - margin, aabbox[1] + margin
+
+  def has_bounds(obj):
+    lower, upper = obj.bounds
+    return np.any(np.asarray(lower) != np.asarray(upper))
+
+  bounded = [o for o in obstacles if has_bounds(o)]
+  unbounded = [o for o in obstacles if not has_bounds(o)]
+  boxes = [get_aabbox(o) for o in bounded]
+  box_min = np.array([b[0] for b in boxes]).reshape(-1, 3)
+  box_max = np.array([b[1] for b in boxes]).reshape(-1, 3)
+
+  statistics = {"trials": 0, "rejections": 0, "narrow_phase_checks": 0, "trials_per_asset": []}
+  for asset in assets:
+    for trial in range(1, max_trials + 1):
+      for sampler in samplers:
+        sampler(asset, rng)
+      asset_min, asset_max = get_aabbox(asset)
+      hits = np.all((box_min <= asset_max) & (box_max >= asset_min), axis=1)
+      candidates = unbounded + [bounded[i] for i in np.flatnonzero(hits)]
+      statistics["narrow_phase_checks"] += len(candidates)
+      if not candidates or not simulator.check_overlap(asset, candidates):
+        break
+      statistics["rejections"] += 1
+    else:
+      raise RuntimeError("Failed to place", asset)
+
+    statistics["trials"] += trial
+    statistics["trials_per_asset"].append(trial)
+    # the placed asset is an obstacle for all the following ones
+    if has_bounds(asset):
+      bounded.append(asset)
+      box_min = np.concatenate([box_min, asset_min[np.newaxis]])
+      box_max = np.concatenate([box_max, asset_max[np.newaxis]])
+    else:
+      unbounded.append(asset)
+  return statistics
+
+
 def sample_color(
     strategy: str,
     rng: np.random.RandomState = default_rng()
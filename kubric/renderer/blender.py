@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import collections
+import concurrent.futures
 from contextlib import redirect_stdout
 import functools
 import io
@@ -20,6 +21,7 @@ import logging
 import os
 import sys
 import tempfile
+import time
 from typing import Any, Dict, Optional, Sequence, Union
 
 import kubric as kb
@@ -98,6 +100,7 @@ class Blender(core.View):
     self.background_transparency = background_transparency
 
     self.exr_output_node = blender_utils.set_up_exr_output_node(motion_blur=motion_blur)
+    self._reset_postprocessing_timings()
 
     self.post_processors = {
         "backward_flow": blender_utils.process_backward_flow,
@@ -238,6 +241,7 @@ class Blender(core.View):
                                              "forward_flow", "depth",
                                              "normal", "object_coordinates",
                                              "segmentation"),
+             streaming: bool = False,
              ) -> Dict[str, np.ndarray]:
     """Renders all frames (or a subset) of the animation and returns images as a dict of arrays.
 
@@ -248,6 +252,10 @@ class Blender(core.View):
       return_layers: list of layers to return. For possible values refer to
         the Blender.post_processors dict. Defaults to ("backward_flow",
         "forward_flow", "depth", "normal", "object_coordinates", "segmentation").
+      streaming: if True then each frame is post-processed (in a background thread) as soon as
+        it has been rendered, while the next frame is rendering. Its EXR and PNG files are
+        deleted afterwards. This keeps the memory usage at the size of the output plus a
+        single frame, instead of decoding all frames at the end.
 
     Returns:
       A dictionary with one entry for each return layer. By default:
@@ -266,19 +274,46 @@ class Blender(core.View):
     # --- starts rendering
     if frames is None:
       frames = range(self.scene.frame_start, self.scene.frame_end + 1)
-    with RedirectStream(stream=sys.stdout, disabled=self.verbose):
-      for frame_nr in frames:
+    frames = list(frames)
+    self._reset_postprocessing_timings()
+    output = {}
+    with RedirectStream(stream=sys.stdout, disabled=self.verbose), \
+        concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+      pending = []
+      for frame_idx, frame_nr in enumerate(frames):
+        # raise errors of already post-processed frames before rendering any further frames
+        for future in [future for future in pending if future.done()]:
+          future.result()
+          pending.remove(future)
         bpy.context.scene.frame_set(frame_nr)
         # When writing still images Blender doesn't append the frame number to the png path.
         # (but for exr it does, so we only adjust the png path)
-        bpy.context.scene.render.filepath = str(
-            self.scratch_dir / "images" / f"frame_{frame_nr:04d}.png")
+        png_filename = self.scratch_dir / "images" / f"frame_{frame_nr:04d}.png"
+        bpy.context.scene.render.filepath = str(png_filename)
         bpy.ops.render.render(animation=False, write_still=True)
         logger.info("Rendered frame '%s'", bpy.context.scene.render.filepath)
 
+        if streaming:
+          exr_filename = self.scratch_dir / "exr" / f"frame_{frame_nr:04d}.exr"
+          pending.append(executor.submit(self._postprocess_streamed_frame, output, frame_idx,
+                                         len(frames), exr_filename, png_filename,
+                                         return_layers))
+      for future in pending:
+        future.result()  # re-raises exceptions from the background thread
+
+    if streaming:
+      self._log_postprocessing_timings()
+      return output
     # --- post process the rendered frames
     return self.postprocess(self.scratch_dir, return_layers=return_layers)
 
+  def _postprocess_streamed_frame(self, output, frame_idx, nr_frames, exr_filename, png_filename,
+                                  return_layers):
+    frame_layers = self.postprocess_frame(exr_filename, png_filename, return_layers)
+    _insert_frame(output, frame_idx, nr_frames, frame_layers)
+    exr_filename.unlink()
+    png_filename.unlink()
+
   def _check_missing_textures(self):
     missing_textures = sorted({img.filepath for img in bpy.data.images
             if tuple(img.size) == (0, 0) and img.filepath})
@@ -325,23 +360,60 @@ class Blender(core.View):
       return_layers: Sequence[str]):
 
     from_dir = kb.as_path(from_dir)
+    self._reset_postprocessing_timings()
     # --- collect all layers for all frames
-    data_stack = collections.defaultdict(list)
+    output = {}
     exr_frames = sorted((from_dir / "exr").glob("*.exr"))
     png_frames = [from_dir / "images" / (exr_filename.stem + ".png")
                   for exr_filename in exr_frames]
 
-    for exr_filename, png_filename in zip(exr_frames, png_frames):
-      source_layers = blender_utils.get_render_layers_from_exr(exr_filename)
+    for frame_idx, (exr_filename, png_filename) in enumerate(zip(exr_frames, png_frames)):
+      frame_layers = self.postprocess_frame(exr_filename, png_filename, return_layers)
+      _insert_frame(output, frame_idx, len(exr_frames), frame_layers)
+    self._log_postprocessing_timings()
+    return output
+
+  def postprocess_frame(
+      self,
+      exr_filename: PathLike,
+      png_filename: PathLike,
+      return_layers: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Read the EXR and PNG output of a single frame and apply the post_processors to it.
+
+    Only the source layers that the requested post_processors depend on are decoded.
+    The time spent per layer is accumulated in self.postprocessing_timings.
+    """
+    needed_layers = set()
+    for key in return_layers:
+      post_processor_layers = getattr(self.post_processors[key], "render_layers", None)
+      if post_processor_layers is None:  # unknown dependencies: decode everything
+        needed_layers = None
+        break
+      needed_layers |= post_processor_layers
+
+    source_layers = blender_utils.get_render_layers_from_exr(
+        exr_filename, layers=needed_layers, timings=self.postprocessing_timings["decode"])
+    if needed_layers is None or "rgba" in needed_layers:
+      start = time.perf_counter()
       # Use the contrast-normalized PNG instead of the EXR for RGBA.
       source_layers["rgba"] = file_io.read_png(png_filename)
+      self.postprocessing_timings["decode"]["PNG"] += time.perf_counter() - start
+
+    output = {}
+    for key in return_layers:
+      start = time.perf_counter()
+      output[key] = self.post_processors[key](source_layers, self.scene)
+      self.postprocessing_timings["process"][key] += time.perf_counter() - start
+    return output
 
-      for key in return_layers:
-        post_processor = self.post_processors[key]
-        data_stack[key].append(post_processor(source_layers, self.scene))
+  def _reset_postprocessing_timings(self):
+    self.postprocessing_timings = {"decode": collections.defaultdict(float),
+                                   "process": collections.defaultdict(float)}
 
-    return {key: np.stack(data_stack[key], axis=0)
-            for key in data_stack}
+  def _log_postprocessing_timings(self):
+    for stage, timings in self.postprocessing_timings.items():
+      logger.info("Postprocessing (%s) time per layer: %s", stage,
+                  ", ".join(f"{k}={v:.3f}s" for k, v in sorted(timings.items())))
 
   @staticmethod
   def clear_and_reset_blender_scene(verbose: bool = False, custom_scene: str = None):
@@ -751,6 +823,16 @@ class Blender(core.View):
     return asset.linked_objects[self]
 
 
+def _insert_frame(output: Dict[str, np.ndarray], frame_idx: int, nr_frames: int,
+                  frame_layers: Dict[str, np.ndarray]):
+  """Write the layers of a single frame into (lazily allocated) arrays for all frames."""
+  for key, value in frame_layers.items():
+    value = np.asarray(value)
+    if key not in output:
+      output[key] = np.empty((nr_frames,) + value.shape, dtype=value.dtype)
+    output[key][frame_idx] = value
+
+
 class AttributeSetter:
   """TODO(klausg): provide high-level description of observer implementation."""
 
@@ -779,7 +861,37 @@ class KeyframeSetter:
     self.blender_obj = blender_obj
 
   def __call__(self, change):
-    self.blender_obj.keyframe_insert(self.attribute_path, frame=change.frame)
+    if "frames" in change:  # batch of keyframes from Asset.set_keyframes
+      self.insert_keyframes(change.frames, change.new)
+    else:
+      self.blender_obj.keyframe_insert(self.attribute_path, frame=change.frame)
+
+  def insert_keyframes(self, frames, values):
+    """Write many keyframes at once by filling the fcurves directly (instead of one at a time)."""
+    if not frames:
+      return
+    values = np.array([np.asarray(v, dtype=np.float32) for v in values], dtype=np.float32)
+    values = values.reshape(len(frames), -1)
+
+    # insert a single keyframe the regular way to create the action and the fcurve(s)
+    self.blender_obj.keyframe_insert(self.attribute_path, frame=frames[0])
+    action = self.blender_obj.id_data.animation_data.action
+    data_path = self.blender_obj.path_from_id(self.attribute_path)
+
+    for index in range(values.shape[1]):
+      fcurve = action.fcurves.find(data_path, index=index)
+      if fcurve is None:  # e.g. alpha channel of an RGBA trait mapped to an RGB property
+        continue
+      points = fcurve.keyframe_points
+      old_co = np.empty(2 * len(points), dtype=np.float32)
+      points.foreach_get("co", old_co)
+      keyframes = dict(zip(old_co[0::2].tolist(), old_co[1::2].tolist()))
+      keyframes.update(zip(frames, values[:, index].tolist()))
+
+      new_co = np.array(sorted(keyframes.items()), dtype=np.float32).ravel()
+      points.add(len(keyframes) - len(points))
+      points.foreach_set("co", new_co)
+      fcurve.update()
 
 
 def register_object3d_setters(obj, blender_obj):
@@ -16,7 +16,8 @@ import contextlib
 import copy
 import functools
 import sys
-from typing import Dict, Sequence, Tuple, Union
+import time
+from typing import Collection, Dict, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import OpenEXR
@@ -199,8 +200,9 @@ def activate_render_passes(
 
 def read_channels_from_exr(exr: OpenEXR.InputFile, channel_names: Sequence[str]) -> np.ndarray:
   """Reads a single channel from an EXR file and returns it as a numpy array."""
-  channels_header = exr.header()["channels"]
-  window = exr.header()["dataWindow"]
+  header = exr.header()
+  channels_header = header["channels"]
+  window = header["dataWindow"]
   width = window.max.x - window.min.x + 1
   height = window.max.y - window.min.y + 1
   outputs = []
@@ -217,42 +219,72 @@ def read_channels_from_exr(exr: OpenEXR.InputFile, channel_names: Sequence[str])
   return np.stack(outputs, axis=-1)
 
 
-def get_render_layers_from_exr(filename) -> Dict[str, np.ndarray]:
+def get_render_layers_from_exr(
+    filename,
+    layers: Optional[Collection[str]] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, np.ndarray]:
+  """Decode the render layers from a multilayer EXR file written by the output node.
+
+  Args:
+    filename: Path to the EXR file.
+    layers: Names of the outputs to decode (e.g. {"depth", "forward_flow"}).
+      Defaults to None which decodes all available layers.
+    timings: If given, the seconds spent decoding each EXR layer are added to this dict.
+
+  Returns:
+    A dict with (a subset of) the following entries: "linear_rgba", "depth", "backward_flow",
+    "forward_flow", "normal", "uv", "segmentation_indices", "segmentation_alphas" and
+    "object_coordinates".
+  """
   exr = OpenEXR.InputFile(str(filename))
   layer_names = set()
   for n, _ in exr.header()["channels"].items():
     layer_name, _, _ = n.partition(".")
     layer_names.add(layer_name)
 
+  def is_requested(*output_names):
+    return layers is None or any(name in layers for name in output_names)
+
+  @contextlib.contextmanager
+  def timed(exr_layer_name):
+    start = time.perf_counter()
+    yield
+    if timings is not None:
+      timings[exr_layer_name] = timings.get(exr_layer_name, 0.) + time.perf_counter() - start
+
   output = {}
-  if "Image" in layer_names:
-    # Image is in RGBA format with range [0, inf]
-    output["linear_rgba"] = read_channels_from_exr(exr, ["Image.R", "Image.G",
-                                                         "Image.B", "Image.A"])
-  if "Depth" in layer_names:
-    # range [0, 10000000000.0]  # the value 1e10 is used for background / infinity
-    output["depth"] = read_channels_from_exr(exr, ["Depth.V"])
-  if "Vector" in layer_names:
-    flow = read_channels_from_exr(exr, ["Vector.R", "Vector.G", "Vector.B", "Vector.A"])
-    # Blender exports forward and backward flow in a single image,
-    # and uses (-delta_col, delta_row) format, but we prefer (delta_row, delta_col)
-    output["backward_flow"] = np.zeros_like(flow[..., :2])
-    output["backward_flow"][..., 0] = flow[..., 1]
-    output["backward_flow"][..., 1] = -flow[..., 0]
-
-    output["forward_flow"] = np.zeros_like(flow[..., 2:])
-    output["forward_flow"][..., 0] = flow[..., 3]
-    output["forward_flow"][..., 1] = -flow[..., 2]
-
-  if "Normal" in layer_names:
-    # range: [-1, 1]
-    output["normal"] = read_channels_from_exr(exr, ["Normal.X", "Normal.Y", "Normal.Z"])
-
-  if "UV" in layer_names:
-    # range [0, 1]
-    output["uv"] = read_channels_from_exr(exr, ["UV.X", "UV.Y", "UV.Z"])
-
-  if "CryptoObject00" in layer_names:
+  if "Image" in layer_names and is_requested("linear_rgba"):
+    with timed("Image"):
+      # Image is in RGBA format with range [0, inf]
+      output["linear_rgba"] = read_channels_from_exr(exr, ["Image.R", "Image.G",
+                                                           "Image.B", "Image.A"])
+  if "Depth" in layer_names and is_requested("depth"):
+    with timed("Depth"):
+      # range [0, 10000000000.0]  # the value 1e10 is used for background / infinity
+      output["depth"] = read_channels_from_exr(exr, ["Depth.V"])
+  if "Vector" in layer_names and is_requested("backward_flow", "forward_flow"):
+    with timed("Vector"):
+      # Blender exports forward and backward flow in a single image,
+      # and uses (-delta_col, delta_row) format, but we prefer (delta_row, delta_col).
+      # So we read the channels in swapped order and flip the sign of the column deltas.
+      flow = read_channels_from_exr(exr, ["Vector.G", "Vector.R", "Vector.A", "Vector.B"])
+      flow[..., 1::2] *= -1
+      output["backward_flow"] = flow[..., :2]
+      output["forward_flow"] = flow[..., 2:]
+
+  if "Normal" in layer_names and is_requested("normal"):
+    with timed("Normal"):
+      # range: [-1, 1]
+      output["normal"] = read_channels_from_exr(exr, ["Normal.X", "Normal.Y", "Normal.Z"])
+
+  if "UV" in layer_names and is_requested("uv"):
+    with timed("UV"):
+      # range [0, 1]
+      output["uv"] = read_channels_from_exr(exr, ["UV.X", "UV.Y", "UV.Z"])
+
+  if "CryptoObject00" in layer_names and is_requested("segmentation_indices",
+                                                      "segmentation_alphas"):
     # CryptoMatte stores the segmentation of Objects using two kinds of channels:
     #  - index channels (uint32) specify the object index for a pixel
     #  - alpha channels (float32) specify the corresponding mask value
@@ -262,37 +294,98 @@ def get_render_layers_from_exr(filename) -> Dict[str, np.ndarray]:
     # with RG being the first layer and BA being the second
     # So the R and B channels are uint32 and the G and A channels are float32.
     crypto_layers = [n for n in layer_names if n.startswith("CryptoObject")]
-    index_channels = [n + "." + c for n in crypto_layers for c in "RB"]
-    idxs = read_channels_from_exr(exr, index_channels)
-    idxs.dtype = np.uint32
-    output["segmentation_indices"] = idxs
-    alpha_channels = [n + "." + c for n in crypto_layers for c in "GA"]
-    alphas = read_channels_from_exr(exr, alpha_channels)
-    output["segmentation_alphas"] = alphas
-  if "ObjectCoordinates" in layer_names:
-    output["object_coordinates"] = read_channels_from_exr(exr,
-      ["ObjectCoordinates.R", "ObjectCoordinates.G", "ObjectCoordinates.B"])
+    with timed("CryptoObject"):
+      if is_requested("segmentation_indices"):
+        index_channels = [n + "." + c for n in crypto_layers for c in "RB"]
+        idxs = read_channels_from_exr(exr, index_channels)
+        idxs.dtype = np.uint32
+        output["segmentation_indices"] = idxs
+      if is_requested("segmentation_alphas"):
+        alpha_channels = [n + "." + c for n in crypto_layers for c in "GA"]
+        alphas = read_channels_from_exr(exr, alpha_channels)
+        output["segmentation_alphas"] = alphas
+  if "ObjectCoordinates" in layer_names and is_requested("object_coordinates"):
+    with timed("ObjectCoordinates"):
+      output["object_coordinates"] = read_channels_from_exr(exr,
+        ["ObjectCoordinates.R", "ObjectCoordinates.G", "ObjectCoordinates.B"])
   return output
 
 
 def replace_cryptomatte_hashes_by_asset_index(
     segmentation_ids: ArrayLike,
-    assets: Sequence[core.assets.Asset]):
+    assets: Sequence[core.assets.Asset],
+    method: str = "lookup"):
   """Replace (inplace) the cryptomatte hash (from Blender) by the index of each asset + 1.
   (the +1 is to ensure that the 0 for background does not interfere with asset index 0)
 
   Args:
     segmentation_ids: Segmentation array of cryptomatte hashes as returned by Blender.
     assets: List of assets to use for replacement.
+    method: How to perform the replacement. One of
+      * "lookup": remap the whole array in a single pass using a lookup table of the asset
+        hashes (default). Cost is nearly independent of the number of assets.
+      * "mask": compare the array against the hash of each asset in turn.
+        Cost grows linearly with the number of assets.
+  """
+  segmentation_ids = np.asarray(segmentation_ids)
+  if method == "mask":
+    # replace crypto-ids with asset index
+    new_segmentation_ids = np.zeros_like(segmentation_ids)
+    for idx, asset in enumerate(assets, start=1):
+      asset_hash = mm3hash(asset.uid)
+      new_segmentation_ids[segmentation_ids == asset_hash] = idx
+    return new_segmentation_ids
+  elif method != "lookup":
+    raise ValueError(f"Unknown method {method!r}. Available methods: ['lookup', 'mask']")
+
+  if not assets:
+    return np.zeros_like(segmentation_ids)
+  asset_hashes = np.array([mm3hash(asset.uid) for asset in assets], dtype=np.uint32)
+  asset_idxs = np.arange(1, len(assets) + 1, dtype=segmentation_ids.dtype)
+  # sort the table by hash. If two assets share a hash, the later one wins (as with "mask")
+  order = np.argsort(asset_hashes, kind="stable")
+  asset_hashes, asset_idxs = asset_hashes[order], asset_idxs[order]
+  is_last = np.append(asset_hashes[1:] != asset_hashes[:-1], True)
+  asset_hashes, asset_idxs = asset_hashes[is_last], asset_idxs[is_last]
+
+  hash_window = _find_unique_hash_window(asset_hashes)
+  if hash_window is None:
+    # binary search in the sorted table of hashes
+    table_pos = np.searchsorted(asset_hashes, segmentation_ids)
+    np.minimum(table_pos, len(asset_hashes) - 1, out=table_pos)
+    is_asset = asset_hashes[table_pos] == segmentation_ids
+    return np.where(is_asset, asset_idxs[table_pos], 0).astype(segmentation_ids.dtype)
+
+  # direct lookup: a window of bits of the hash serves as collision-free key into a small table
+  # (empty slots map to index 0, so they can never produce a false match)
+  shift, bits = hash_window
+  table_hashes = np.zeros(1 << bits, dtype=np.uint32)
+  table_idxs = np.zeros(1 << bits, dtype=segmentation_ids.dtype)
+  asset_keys = (asset_hashes >> shift) & ((1 << bits) - 1)
+  table_hashes[asset_keys] = asset_hashes
+  table_idxs[asset_keys] = asset_idxs
+
+  keys = (segmentation_ids.astype(np.uint32, copy=False) >> shift) & ((1 << bits) - 1)
+  is_asset = table_hashes[keys] == segmentation_ids
+  return np.where(is_asset, table_idxs[keys], 0).astype(segmentation_ids.dtype)
+
+
+def _find_unique_hash_window(hashes: np.ndarray,
+                             max_bits: int = 16) -> Union[Tuple[int, int], None]:
+  """Find (shift, bits) such that `(hashes >> shift) & (2**bits - 1)` is unique for all hashes.
+
+  Returns None if no such window of at most max_bits bits exists.
   """
-  # replace crypto-ids with asset index
-  new_segmentation_ids = np.zeros_like(segmentation_ids)
-  for idx, asset in enumerate(assets, start=1):
-    asset_hash = mm3hash(asset.uid)
-    new_segmentation_ids[segmentation_ids == asset_hash] = idx
-  return new_segmentation_ids
+  min_bits = int(np.ceil(np.log2(len(hashes)))) + 2
+  for bits in range(min_bits, max_bits + 1):
+    for shift in range(32 - bits + 1):
+      keys = (hashes >> shift) & ((1 << bits) - 1)
+      if len(np.unique(keys)) == len(keys):
+        return shift, bits
+  return None
 
 
+@functools.lru_cache(maxsize=None)
 def mm3hash(name):
   """ Compute the uint32 hash that Blenders Cryptomatte uses.
   https://github.com/Psyop/Cryptomatte/blob/master/specification/cryptomatte_specification.pdf
@@ -422,36 +515,56 @@ def center_mesh_around_center_of_mass(obj):
     vert.co[2] -= tmesh.center_mass[2]
 
 
+def uses_render_layers(*layer_names: str):
+  """Decorator that records which (source) render layers a post-processor reads.
+
+  The names refer to the outputs of `get_render_layers_from_exr` (plus "rgba" for the PNG).
+  It allows Blender.postprocess to skip decoding layers that no requested output depends on.
+  Post-processors without this annotation are assumed to need all layers.
+  """
+  def decorator(func):
+    func.render_layers = frozenset(layer_names)
+    return func
+  return decorator
+
+
+@uses_render_layers("depth")
 def process_depth(exr_layers, scene):
   # blender returns z values (distance to camera plane)
   # convert them into depth (distance to camera center)
   return scene.camera.z_to_depth(exr_layers["depth"])
 
 
+@uses_render_layers("depth")
 def process_z(exr_layers, scene):  # pylint: disable=unused-argument
   # blender returns z values (distance to camera plane)
   return exr_layers["depth"]
 
 
+@uses_render_layers("backward_flow")
 def process_backward_flow(exr_layers, scene):  # pylint: disable=unused-argument
   return exr_layers["backward_flow"]
 
 
+@uses_render_layers("forward_flow")
 def process_forward_flow(exr_layers, scene):  # pylint: disable=unused-argument
   return exr_layers["forward_flow"]
 
 
+@uses_render_layers("uv")
 def process_uv(exr_layers, scene):  # pylint: disable=unused-argument
   # convert range [0, 1] to uint16
   return (exr_layers["uv"].clip(0.0, 1.0) * 65535).astype(np.uint16)
 
 
+@uses_render_layers("normal")
 def process_normal(exr_layers, scene):  # pylint: disable=unused-argument
   # convert range [-1, 1] to uint16
   return ((exr_layers["normal"].clip(-1.0, 1.0) + 1) * 65535 / 2
           ).astype(np.uint16)
 
 
+@uses_render_layers("object_coordinates")
 def process_object_coordinates(exr_layers, scene):  # pylint: disable=unused-argument
   # sometimes these values can become ever so slightly negative (e.g. 1e-10)
   # we clip them to [0, 1] to guarantee this range for further processing.
@@ -459,17 +572,20 @@ def process_object_coordinates(exr_layers, scene):  # pylint: disable=unused-arg
           ).astype(np.uint16)
 
 
+@uses_render_layers("segmentation_indices")
 def process_segementation(exr_layers, scene):  # pylint: disable=unused-argument
   # map the Blender cryptomatte hashes to asset indices
   return replace_cryptomatte_hashes_by_asset_index(
       exr_layers["segmentation_indices"][:, :, :1], scene.assets)
 
 
+@uses_render_layers("rgba")
 def process_rgba(exr_layers, scene):  # pylint: disable=unused-argument
   # map the Blender cryptomatte hashes to asset indices
   return exr_layers["rgba"]
 
 
+@uses_render_layers("rgba")
 def process_rgb(exr_layers, scene):  # pylint: disable=unused-argument
   return exr_layers["rgba"][..., :3]
 
@@ -13,3 +13,6 @@
 # limitations under the License.
 
 from kubric.simulator.pybullet import PyBullet
+from kubric.simulator.batch import SceneSpec
+from kubric.simulator.batch import simulate_scene
+from kubric.simulator.batch import simulate_scenes
@@ -0,0 +1,118 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Simulate many (physics-only) scenes in parallel, each in its own PyBullet client."""
+
+import concurrent.futures
+import os
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from kubric.core import scene as kubric_scene
+from kubric.simulator.pybullet import PyBullet
+
+
+class SceneSpec(NamedTuple):
+  """The seed of the random number generator and the keyword arguments for a scene builder."""
+  seed: int
+  config: Optional[Dict[str, Any]] = None
+
+
+def simulate_scene(scene_builder: Callable, spec: SceneSpec, scene_kwargs=None,
+                   simulate_kwargs=None):
+  """Builds a single scene with scene_builder and simulates it (without inserting keyframes).
+
+  Args:
+    scene_builder: Function `scene_builder(scene, simulator, rng, **spec.config)` that populates
+      the (empty) scene, e.g. by adding objects and placing them with kb.move_until_no_overlap.
+    spec: The seed and configuration of the scene.
+    scene_kwargs: Keyword arguments for kb.Scene (e.g. frame_end, frame_rate, step_rate).
+    simulate_kwargs: Keyword arguments for PyBullet.simulate (e.g. frame_start, rest_frames).
+
+  Returns:
+    A dict with the "names" of all simulated assets, their "states" (as returned by
+    PyBullet.simulate), the "collisions" (with body_a and body_b as indices into the names), and
+    the scene "metadata".
+  """
+  scene = kubric_scene.Scene(**(scene_kwargs or {}))
+  simulator = PyBullet(scene)
+  scene.metadata["seed"] = spec.seed
+  scene_builder(scene, simulator, np.random.RandomState(spec.seed), **(spec.config or {}))
+
+  body_ids, states, collisions, _ = simulator.simulate(**(simulate_kwargs or {}))
+  body_to_asset = simulator._body_to_asset_map()  # pylint: disable=protected-access
+  body_index = {body_id: i for i, body_id in enumerate(body_ids)}
+  for key in ["body_a", "body_b"]:
+    collisions[key] = [body_index[body_id] for body_id in collisions[key]]
+  # bodies without a linked asset (e.g. added to the simulator directly) get a placeholder name
+  names = [body_to_asset[body_id].name if body_id in body_to_asset else f"body_{body_id}"
+           for body_id in body_ids]
+  return {
+      "names": names,
+      "states": states,
+      "collisions": collisions,
+      "metadata": scene.metadata,
+  }
+
+
+def simulate_scenes(scene_builder: Callable, specs: Sequence[SceneSpec],
+                    scene_kwargs: Optional[Dict[str, Any]] = None,
+                    simulate_kwargs: Optional[Dict[str, Any]] = None,
+                    num_workers: Optional[int] = None):
+  """Simulates a batch of scenes in parallel using a pool of processes.
+
+  Every scene is built and simulated in its own process (and thus PyBullet DIRECT client), so the
+  results only depend on the spec of each scene and not on the number of workers. Bodies are
+  identified by the names of their assets (uids depend on per-process counters), so scene
+  builders should name their assets.
+
+  Args:
+    scene_builder: Function `scene_builder(scene, simulator, rng, **spec.config)` that populates
+      a scene. Has to be picklable (i.e. defined at the top level of a module).
+    specs: The seed and configuration of each scene.
+    scene_kwargs: Keyword arguments for kb.Scene, shared by all scenes.
+    simulate_kwargs: Keyword arguments for PyBullet.simulate, shared by all scenes.
+    num_workers: Number of processes (defaults to the number of CPUs). With 0 all scenes are
+      simulated one after the other in the current process.
+
+  Returns:
+    A dict with the stacked "states" of shape (num_scenes, num_frames, max_num_bodies, 13),
+    padded with NaN for scenes with fewer bodies or frames (see STATE_LAYOUT for the last axis), the
+    "num_bodies" of shape (num_scenes,), and per scene lists of the asset "names", the
+    "collisions" (structured arrays with COLLISION_DTYPE, body_a and body_b index the bodies),
+    and the scene "metadata".
+  """
+  args = (scene_kwargs, simulate_kwargs)
+  if num_workers == 0:
+    results = [simulate_scene(scene_builder, spec, *args) for spec in specs]
+  else:
+    num_workers = num_workers or os.cpu_count()
+    with concurrent.futures.ProcessPoolExecutor(num_workers) as pool:
+      futures = [pool.submit(simulate_scene, scene_builder, spec, *args) for spec in specs]
+      results = [future.result() for future in futures]
+
+  num_bodies = np.array([len(result["names"]) for result in results], dtype=np.int64)
+  num_frames = max((result["states"].shape[0] for result in results), default=0)
+  states = np.full((len(results), num_frames, max(num_bodies, default=0), 13), np.nan)
+  for i, result in enumerate(results):
+    states[i, :result["states"].shape[0], :num_bodies[i]] = result["states"]
+
+  return {
+      "states": states,
+      "num_bodies": num_bodies,
+      "names": [result["names"] for result in results],
+      "collisions": [result["collisions"] for result in results],
+      "metadata": [result["metadata"] for result in results],
+  }
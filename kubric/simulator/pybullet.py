@@ -20,10 +20,13 @@ import logging
 import pathlib
 import sys
 import tempfile
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from xml.etree import ElementTree
 
 from kubric import core
 from kubric.redirect_io import RedirectStream
+import munch
+import numpy as np
 import tensorflow as tf
 
 # --- hides the "pybullet build time: May 26 2021 18:52:36" message on import
@@ -57,10 +60,22 @@ class _BulletClient:
 
 
 class PyBullet(core.View):
-  """Adds physics simulation on top of kb.Scene using PyBullet."""
-
-  def __init__(self, scene: core.Scene, scratch_dir=tempfile.mkdtemp()):
+  """Adds physics simulation on top of kb.Scene using PyBullet.
+
+  A single PyBullet view can be reused for many scenes by assigning `simulator.scene = scene`,
+  which removes the bodies of the previous scene from the (warm) physics world.
+  With `cache_collision_shapes=True` the collision shapes of cubes, spheres and (single link)
+  URDF files are created only once per file and scale, and shared by all bodies using them (also
+  across scenes). Note that the shapes are then created with `createCollisionShapeArray` instead
+  of `loadURDF`, which uses a slightly different collision margin (and thus inertia).
+  """
+
+  def __init__(self, scene: core.Scene, scratch_dir=tempfile.mkdtemp(),
+               cache_collision_shapes: bool = False):
     self.scratch_dir = scratch_dir
+    self.cache_collision_shapes = cache_collision_shapes
+    self._collision_shapes = {}
+    self._setters = {}
     self._physics_client = _BulletClient(pb.DIRECT)  # pb.GUI
 
     # --- Set some parameters to fix the sticky-walls problem; see
@@ -91,7 +106,17 @@ class PyBullet(core.View):
   def remove_asset(self, asset: core.Asset) -> None:
     if self in asset.linked_objects:
       self._physics_client.removeBody(asset.linked_objects[self])
-    # TODO(klausg): unobserve
+    # stop forwarding changes of the asset (its body id might be reused by another body)
+    for setter, trait_name in self._setters.pop(asset, []):
+      asset.unobserve(setter, trait_name)
+
+  def _get_collision_shape(self, key, create_fn):
+    """Creates a collision shape with create_fn (or reuses the one cached for key)."""
+    if not self.cache_collision_shapes:
+      return create_fn()
+    if key not in self._collision_shapes:
+      self._collision_shapes[key] = create_fn()
+    return self._collision_shapes[key]
 
   @add_asset.register(core.Camera)
   def _add_object(self, obj: core.Camera) -> None:
@@ -107,8 +132,9 @@ class PyBullet(core.View):
 
   @add_asset.register(core.Cube)
   def _add_object(self, obj: core.Cube) -> Optional[int]:
-    collision_idx = self._physics_client.createCollisionShape(
-        pb.GEOM_BOX, halfExtents=obj.scale)
+    collision_idx = self._get_collision_shape(
+        ("box", tuple(obj.scale)),
+        lambda: self._physics_client.createCollisionShape(pb.GEOM_BOX, halfExtents=obj.scale))
     visual_idx = -1
     mass = 0 if obj.static else obj.mass
     # useMaximalCoordinates and contactProcessingThreshold are required to
@@ -123,7 +149,7 @@ class PyBullet(core.View):
         useMaximalCoordinates=True)
     self._physics_client.changeDynamics(
         box_idx, -1, contactProcessingThreshold=0)
-    register_physical_object_setters(obj, box_idx, self._physics_client)
+    self._setters[obj] = register_physical_object_setters(obj, box_idx, self._physics_client)
 
     return box_idx
 
@@ -131,8 +157,9 @@ class PyBullet(core.View):
   def _add_object(self, obj: core.Sphere) -> Optional[int]:
     radius = obj.scale[0]
     assert radius == obj.scale[1] == obj.scale[2], obj.scale  # only uniform scaling
-    collision_idx = self._physics_client.createCollisionShape(
-        pb.GEOM_SPHERE, radius=radius)
+    collision_idx = self._get_collision_shape(
+        ("sphere", radius),
+        lambda: self._physics_client.createCollisionShape(pb.GEOM_SPHERE, radius=radius))
     visual_idx = -1
     mass = 0 if obj.static else obj.mass
     # useMaximalCoordinates and contactProcessingThreshold are required to
@@ -147,7 +174,7 @@ class PyBullet(core.View):
         useMaximalCoordinates=True)
     self._physics_client.changeDynamics(
         sphere_idx, -1, contactProcessingThreshold=0)
-    register_physical_object_setters(obj, sphere_idx, self._physics_client)
+    self._setters[obj] = register_physical_object_setters(obj, sphere_idx, self._physics_client)
 
     return sphere_idx
 
@@ -168,7 +195,25 @@ class PyBullet(core.View):
     # useMaximalCoordinates and contactProcessingThreshold are required to
     # fix the sticky walls issue;
     # see https://github.com/bulletphysics/bullet3/issues/3094
-    if path.suffix == ".urdf":
+    urdf = None
+    if self.cache_collision_shapes and path.suffix == ".urdf":
+      urdf = _parse_urdf(path, scale)
+    if urdf is not None:
+      collision_idx = self._get_collision_shape(
+          (str(path), scale),
+          lambda: self._physics_client.createCollisionShapeArray(**urdf.collision))
+      obj_idx = self._physics_client.createMultiBody(
+          0 if obj.static else urdf.mass,
+          collision_idx,
+          -1,
+          obj.position,
+          wxyz2xyzw(obj.quaternion),
+          baseInertialFramePosition=urdf.inertial_position,
+          baseInertialFrameOrientation=urdf.inertial_orientation,
+          useMaximalCoordinates=True)
+      if obj_idx >= 0 and urdf.contact:
+        self._physics_client.changeDynamics(obj_idx, -1, **urdf.contact)
+    elif path.suffix == ".urdf":
       obj_idx = self._physics_client.loadURDF(
           str(path),
           useFixedBase=obj.static,
@@ -184,16 +229,21 @@ class PyBullet(core.View):
     self._physics_client.changeDynamics(
         obj_idx, -1, contactProcessingThreshold=0)
 
-    register_physical_object_setters(obj, obj_idx, self._physics_client)
+    self._setters[obj] = register_physical_object_setters(obj, obj_idx, self._physics_client)
     return obj_idx
 
-  def check_overlap(self, obj: core.PhysicalObject) -> bool:
+  def check_overlap(self, obj: core.PhysicalObject,
+                    others: Optional[Sequence[core.PhysicalObject]] = None) -> bool:
+    """Whether obj overlaps with any other body (or only with `others` if given)."""
     obj_idx = obj.linked_objects[self]
 
-    body_ids = [
-        self._physics_client.getBodyUniqueId(i)
-        for i in range(self._physics_client.getNumBodies())
-    ]
+    if others is None:
+      body_ids = [
+          self._physics_client.getBodyUniqueId(i)
+          for i in range(self._physics_client.getNumBodies())
+      ]
+    else:
+      body_ids = [other.linked_objects[self] for other in others]
     for body_id in body_ids:
       if body_id == obj_idx:
         continue
@@ -218,100 +268,268 @@ class PyBullet(core.View):
     self._physics_client.saveBullet(str(self.scratch_dir / "scene.bullet"))
     tf.io.gfile.copy(self.scratch_dir / "scene.bullet", path, overwrite=True)
 
-  def run(
+  def simulate(
       self,
       frame_start: int = 0,
-      frame_end: Optional[int] = None
-  ) -> Tuple[Dict[core.PhysicalObject, Dict[str, list]], List[dict]]:
+      frame_end: Optional[int] = None,
+      rest_frames: Optional[int] = None,
+      rest_velocity: float = 1e-3,
+  ) -> Tuple[List[int], np.ndarray, np.ndarray, Dict[str, Any]]:
     """
-    Run the physics simulation.
+    Run the physics simulation and return the raw results as arrays.
 
-    The resulting animation is saved directly as keyframes in the assets,
-    and also returned (together with the collision events).
+    Unlike run(), this does not modify the assets (no keyframes are inserted).
+
+    If rest_frames is given, the simulation stops early once all dynamic (non-static) bodies
+    have been at rest (linear and angular speed below rest_velocity) for rest_frames consecutive
+    frames (not counting the initial frame, before the first simulation step). The states of the
+    remaining frames are then filled with the last (resting) state, and no collisions are
+    recorded for them. The number of simulation steps saved this way (0 if the simulation did
+    not stop early) is returned in the metadata and added to
+    `scene.metadata["saved_simulation_steps"]`.
 
     Args:
       frame_start: The first frame from which to start the simulation (inclusive).
-        Also the first frame for which keyframes are stored.
-      frame_end: The last frame (inclusive) that is simulated (and for which animations
-        are computed).
+      frame_end: The last frame (inclusive) that is simulated.
+      rest_frames: Number of frames that all bodies have to be at rest before stopping early.
+        Disabled (i.e. always simulate all frames) if None.
+      rest_velocity: Threshold on the linear and angular speeds below which a body is at rest.
 
     Returns:
-      A dict of all animations and a list of all collision events.
+      body_ids: The pybullet ids of all simulated bodies.
+      states: Array of shape (nr_frames, nr_bodies, 13) with the state of each body at the start
+        of each frame. The last axis is laid out as described by STATE_LAYOUT
+        (position, WXYZ quaternion, velocity, angular_velocity).
+      collisions: Structured array (with dtype COLLISION_DTYPE) of all contact points with a
+        non-zero normal force, recorded at every simulation step.
+      metadata: A dict with the number of "saved_simulation_steps" if rest_frames is given
+        (empty otherwise).
     """
-
     frame_end = self.scene.frame_end if frame_end is None else frame_end
     steps_per_frame = self.scene.step_rate // self.scene.frame_rate
-    max_step = (frame_end - frame_start + 1) * steps_per_frame
-
-    obj_idxs = [
-        self._physics_client.getBodyUniqueId(i)
-        for i in range(self._physics_client.getNumBodies())
-    ]
-    animation = {obj_id: {"position": [], "quaternion": [], "velocity": [], "angular_velocity": []}
-                 for obj_id in obj_idxs}
-
+    nr_frames = frame_end - frame_start + 1
+    max_step = nr_frames * steps_per_frame
+
+    client = self._physics_client
+    # look up the pybullet functions only once (each lookup creates a new partial)
+    get_base_position_and_orientation = client.getBasePositionAndOrientation
+    get_base_velocity = client.getBaseVelocity
+    get_contact_points = client.getContactPoints
+    step_simulation = client.stepSimulation
+
+    body_ids = [client.getBodyUniqueId(i) for i in range(client.getNumBodies())]
+    states = np.empty((nr_frames, len(body_ids), 13), dtype=np.float64)
     collisions = []
+    # static bodies (mass 0) are ignored when checking whether everything is at rest
+    is_dynamic = np.array([client.getDynamicsInfo(body_id, -1)[0] > 0 for body_id in body_ids],
+                          dtype=bool)
+    frames_at_rest = 0
+    saved_steps = 0
     for current_step in range(max_step):
-
-      contact_points = self._physics_client.getContactPoints()
-      for collision in contact_points:
-        (contact_flag,
-         body_a, body_b,
-         link_a, link_b,
-         position_a, position_b, contact_normal_b,
-         contact_distance, normal_force,
-         lateral_friction1, lateral_friction_dir1,
-         lateral_friction2, lateral_friction_dir2) = collision
-        del link_a, link_b  # < unused
-        del contact_flag, contact_distance, position_a  # < unused
-        del lateral_friction1, lateral_friction2  # < unused
-        del lateral_friction_dir1, lateral_friction_dir2  # < unused
+      for contact in get_contact_points():
+        # see pybullet docs of getContactPoints for the layout of the contact tuple
+        normal_force = contact[9]
         if normal_force > 1e-6:
-          collisions.append({
-              "instances": (self._obj_idx_to_asset(body_b), self._obj_idx_to_asset(body_a)),
-              "position": position_b,
-              "contact_normal": contact_normal_b,
-              "frame": current_step / steps_per_frame,
-              "force": normal_force,
-          })
+          collisions.append((contact[1], contact[2], current_step / steps_per_frame,
+                             normal_force, contact[6], contact[7]))
 
       if current_step % steps_per_frame == 0:
-        for obj_idx in obj_idxs:
-          position, quaternion = self.get_position_and_rotation(obj_idx)
-          velocity, angular_velocity = self.get_velocities(obj_idx)
+        frame_states = states[current_step // steps_per_frame]
+        for i, body_id in enumerate(body_ids):
+          position, (x, y, z, w) = get_base_position_and_orientation(body_id)
+          velocity, angular_velocity = get_base_velocity(body_id)
+          frame_states[i] = (*position, w, x, y, z, *velocity, *angular_velocity)
+
+        # the initial frame does not count (bodies often start without any velocity)
+        if rest_frames is not None and current_step > 0:
+          speeds = np.stack([
+              np.linalg.norm(frame_states[is_dynamic, STATE_LAYOUT["velocity"]], axis=-1),
+              np.linalg.norm(frame_states[is_dynamic, STATE_LAYOUT["angular_velocity"]], axis=-1)])
+          frames_at_rest = frames_at_rest + 1 if np.all(speeds < rest_velocity) else 0
+          if frames_at_rest >= rest_frames:
+            frame = current_step // steps_per_frame
+            states[frame + 1:] = frame_states
+            saved_steps = max_step - current_step
+            logger.info("All bodies at rest since frame %d. Skipped %d simulation steps.",
+                        frame_start + frame - rest_frames + 1, saved_steps)
+            break
+
+      step_simulation()
+
+    metadata = {}
+    if rest_frames is not None:
+      metadata["saved_simulation_steps"] = saved_steps
+      self.scene.metadata["saved_simulation_steps"] = (
+          self.scene.metadata.get("saved_simulation_steps", 0) + saved_steps)
+    return body_ids, states, np.array(collisions, dtype=COLLISION_DTYPE), metadata
 
-          animation[obj_idx]["position"].append(position)
-          animation[obj_idx]["quaternion"].append(quaternion)
-          animation[obj_idx]["velocity"].append(velocity)
-          animation[obj_idx]["angular_velocity"].append(angular_velocity)
+  def run(
+      self,
+      frame_start: int = 0,
+      frame_end: Optional[int] = None,
+      rest_frames: Optional[int] = None,
+      rest_velocity: float = 1e-3,
+  ) -> Tuple[Dict[core.PhysicalObject, Dict[str, list]], List[dict]]:
+    """
+    Run the physics simulation.
 
-      self._physics_client.stepSimulation()
+    The resulting animation is saved directly as keyframes in the assets,
+    and also returned (together with the collision events).
+
+    Args:
+      frame_start: The first frame from which to start the simulation (inclusive).
+        Also the first frame for which keyframes are stored.
+      frame_end: The last frame (inclusive) that is simulated (and for which animations
+        are computed).
+      rest_frames: Stop the simulation early once all bodies have been at rest for this many
+        frames (see simulate()). Disabled if None.
+      rest_velocity: Threshold on the linear and angular speeds below which a body is at rest.
 
-    animation = {asset: animation[asset.linked_objects[self]] for asset in self.scene.assets
-                 if asset.linked_objects.get(self) in obj_idxs}
+    Returns:
+      A dict of all animations and a list of all collision events.
+      The animation of each asset is a dict with a list of tuples (one per frame) for each
+      state, as in earlier versions. Use simulate() to get the states as a single array.
+    """
+    body_ids, states, collision_events, _ = self.simulate(frame_start, frame_end,
+                                                          rest_frames, rest_velocity)
+    body_to_asset = self._body_to_asset_map()
+    body_column = {body_id: i for i, body_id in enumerate(body_ids)}
+
+    asset_states = {asset: states[:, body_column[asset.linked_objects[self]]]
+                    for asset in self.scene.assets
+                    if asset.linked_objects.get(self) in body_column}
+
+    # same format as before (instances are None for bodies without an asset)
+    collisions = [{
+        "instances": (body_to_asset.get(event["body_b"]), body_to_asset.get(event["body_a"])),
+        "position": tuple(event["position"].tolist()),
+        "contact_normal": tuple(event["contact_normal"].tolist()),
+        "frame": event["frame"].item(),
+        "force": event["force"].item(),
+    } for event in collision_events]
 
     # --- Transfer simulation to renderer keyframes
-    for obj in animation.keys():
-      for frame_id in range(frame_end - frame_start + 1):
-        obj.position = animation[obj]["position"][frame_id]
-        obj.quaternion = animation[obj]["quaternion"][frame_id]
-        obj.velocity = animation[obj]["velocity"][frame_id]
-        obj.angular_velocity = animation[obj]["angular_velocity"][frame_id]
-        obj.keyframe_insert("position", frame_id + frame_start)
-        obj.keyframe_insert("quaternion", frame_id + frame_start)
-        obj.keyframe_insert("velocity", frame_id + frame_start)
-        obj.keyframe_insert("angular_velocity", frame_id + frame_start)
+    frames = range(frame_start, frame_start + states.shape[0])
+    animation = {}
+    for obj, obj_states in asset_states.items():
+      animation[obj] = {}
+      for key, layout in STATE_LAYOUT.items():
+        values = obj_states[:, layout]
+        setattr(obj, key, values[-1])  # leave the asset in its final state
+        obj.set_keyframes(key, frames, values)
+        animation[obj][key] = [tuple(value) for value in values.tolist()]
 
     return animation, collisions
 
-  def _obj_idx_to_asset(self, idx):
-    assets = [asset for asset in self.scene.assets if asset.linked_objects.get(self) == idx]
-    if len(assets) == 1:
-      return assets[0]
-    elif len(assets) == 0:
+  def _body_to_asset_map(self) -> Dict[int, core.Asset]:
+    body_to_asset = {}
+    for asset in self.scene.assets:
+      if self in asset.linked_objects:
+        body_id = asset.linked_objects[self]
+        if body_id in body_to_asset:
+          raise RuntimeError("Multiple assets linked to same pybullet object. "
+                             "That should never happen")
+        body_to_asset[body_id] = asset
+    return body_to_asset
+
+
+# Layout of the last axis of the states array returned by PyBullet.simulate
+STATE_LAYOUT = {
+    "position": slice(0, 3),
+    "quaternion": slice(3, 7),
+    "velocity": slice(7, 10),
+    "angular_velocity": slice(10, 13),
+}
+
+# A single collision (contact point) event as returned by PyBullet.simulate
+COLLISION_DTYPE = np.dtype([
+    ("body_a", np.int32),
+    ("body_b", np.int32),
+    ("frame", np.float64),
+    ("force", np.float64),
+    ("position", np.float64, (3,)),  # position on body_b
+    ("contact_normal", np.float64, (3,)),  # contact normal on body_b
+])
+
+
+# contact parameters of an URDF link and the corresponding arguments of changeDynamics
+URDF_CONTACT_PARAMETERS = {
+    "lateral_friction": "lateralFriction",
+    "rolling_friction": "rollingFriction",
+    "spinning_friction": "spinningFriction",
+    "restitution": "restitution",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_urdf(path: pathlib.Path, scale: float):
+  """Parses a (single link) URDF file into the arguments for createCollisionShapeArray.
+
+  Returns None for URDF files that cannot be represented by a single multi-body without links
+  (e.g. multiple links, joints, concave meshes), which then have to be loaded with loadURDF.
+  """
+  links = ElementTree.parse(path).getroot().findall("link")
+  if len(links) != 1 or links[0].get("concave") == "yes":
+    return None
+  link = links[0]
+
+  def get_origin(element):
+    origin = element.find("origin") if element is not None else None
+    origin = {} if origin is None else origin.attrib
+    xyz = [float(x) * scale for x in origin.get("xyz", "0 0 0").split()]
+    rpy = [float(x) for x in origin.get("rpy", "0 0 0").split()]
+    return xyz, pb.getQuaternionFromEuler(rpy)
+
+  collision = {"shapeTypes": [], "radii": [], "halfExtents": [], "lengths": [], "fileNames": [],
+               "meshScales": [], "collisionFramePositions": [],
+               "collisionFrameOrientations": []}
+  for element in link.findall("collision"):
+    geometry = element.find("geometry")
+    shape = geometry[0] if geometry is not None and len(geometry) == 1 else None
+    half_extents, radius, length, filename, mesh_scale = [0.5] * 3, 0.5, 1., "", [1.] * 3
+    if shape is None:
       return None
+    elif shape.tag == "mesh":
+      shape_type = pb.GEOM_MESH
+      filename = str(path.parent / shape.get("filename"))
+      mesh_scale = [float(x) * scale for x in shape.get("scale", "1 1 1").split()]
+    elif shape.tag == "box":
+      shape_type = pb.GEOM_BOX
+      half_extents = [float(x) * scale / 2 for x in shape.get("size").split()]
+    elif shape.tag == "sphere":
+      shape_type = pb.GEOM_SPHERE
+      radius = float(shape.get("radius")) * scale
+    elif shape.tag == "cylinder":
+      shape_type = pb.GEOM_CYLINDER
+      radius = float(shape.get("radius")) * scale
+      length = float(shape.get("length")) * scale
     else:
-      raise RuntimeError("Multiple assets linked to same pybullet object. That should never happen")
+      return None
+    position, orientation = get_origin(element)
+    for key, value in [("shapeTypes", shape_type), ("radii", radius),
+                       ("halfExtents", half_extents), ("lengths", length),
+                       ("fileNames", filename), ("meshScales", mesh_scale),
+                       ("collisionFramePositions", position),
+                       ("collisionFrameOrientations", orientation)]:
+      collision[key].append(value)
+  if not collision["shapeTypes"]:
+    return None
+
+  inertial = link.find("inertial")
+  mass = inertial.find("mass") if inertial is not None else None
+  inertial_position, inertial_orientation = get_origin(inertial)
+
+  contact = {}
+  for element in link.findall("contact/*"):
+    if element.tag not in URDF_CONTACT_PARAMETERS:
+      return None
+    contact[URDF_CONTACT_PARAMETERS[element.tag]] = float(element.get("value"))
+
+  return munch.Munch(collision=collision,
+                     mass=1. if mass is None else float(mass.get("value")),
+                     inertial_position=inertial_position,
+                     inertial_orientation=inertial_orientation,
+                     contact=contact)
 
 
 def xyzw2wxyz(xyzw):
@@ -328,6 +546,7 @@ def wxyz2xyzw(wxyz):
 
 def register_physical_object_setters(obj: core.PhysicalObject, obj_idx,
                                      physics_client: _BulletClient):
+  """Observes the physical traits of obj and returns the list of (setter, trait_name) pairs."""
   assert isinstance(obj, core.PhysicalObject), f"{obj!r} is not a PhysicalObject"
 
   def setter(object_idx, func):
@@ -335,15 +554,20 @@ def register_physical_object_setters(obj: core.PhysicalObject, obj_idx,
       return func(object_idx, change.new, change.owner, physics_client)
     return _callable
 
-  obj.observe(setter(obj_idx, set_position), "position")
-  obj.observe(setter(obj_idx, set_quaternion), "quaternion")
-  # TODO Pybullet does not support rescaling. So we should warn if scale is changed
-  obj.observe(setter(obj_idx, set_velocity), "velocity")
-  obj.observe(setter(obj_idx, set_angular_velocity), "angular_velocity")
-  obj.observe(setter(obj_idx, set_friction), "friction")
-  obj.observe(setter(obj_idx, set_restitution), "restitution")
-  obj.observe(setter(obj_idx, set_mass), "mass")
-  obj.observe(setter(obj_idx, set_static), "static")
+  setters = [
+      (setter(obj_idx, set_position), "position"),
+      (setter(obj_idx, set_quaternion), "quaternion"),
+      # TODO Pybullet does not support rescaling. So we should warn if scale is changed
+      (setter(obj_idx, set_velocity), "velocity"),
+      (setter(obj_idx, set_angular_velocity), "angular_velocity"),
+      (setter(obj_idx, set_friction), "friction"),
+      (setter(obj_idx, set_restitution), "restitution"),
+      (setter(obj_idx, set_mass), "mass"),
+      (setter(obj_idx, set_static), "static"),
+  ]
+  for obj_setter, trait_name in setters:
+    obj.observe(obj_setter, trait_name)
+  return setters
 
 
 def set_position(object_idx, position, asset, physics_client: _BulletClient):  # pylint: disable=unused-argument
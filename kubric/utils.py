@@ -111,7 +111,14 @@ def log_my_flags(flags):
   logger.info(flags_string)
 
 
-def done():
+def done(output_dir=None):
+  """Finishes a worker (and marks output_dir as complete if it is given).
+
+  The completion manifest (see file_io.write_completion_manifest) lets dataset builders know that
+  the output is complete without listing and checking every file.
+  """
+  if output_dir is not None:
+    file_io.write_completion_manifest(output_dir)
   logging.info("Done!")
 
   from kubric import assets  # pylint: disable=import-outside-toplevel
@@ -172,14 +179,9 @@ def get_instance_info(scene, assets_subset=None):
     info["friction"] = instance.friction
     info["restitution"] = instance.restitution
     frame_range = range(scene.frame_start, scene.frame_end+1)
-    info["image_positions"] = np.array([scene.camera.project_point(point3d=p, frame=f)[:2]
-                                        for f, p in zip(frame_range, info["positions"])],
-                                       dtype=np.float32)
-    bboxes3d = []
-    for frame in frame_range:
-      with instance.at_frame(frame):
-        bboxes3d.append(instance.bbox_3d)
-    info["bboxes_3d"] = np.stack(bboxes3d)
+    image_positions = scene.camera.project_points(info["positions"][:, np.newaxis], frame_range)
+    info["image_positions"] = image_positions[:, 0, :2].astype(np.float32)
+    info["bboxes_3d"] = instance.bbox_3d_over_time(frame_range)
     instance_info.append(info)
   return instance_info
 
@@ -187,11 +189,13 @@ def get_instance_info(scene, assets_subset=None):
 def process_collisions(collisions, scene, assets_subset=None):
   assets_subset = scene.foreground_assets if assets_subset is None else assets_subset
 
+  # map each asset to (the first) index in the subset instead of searching the list per collision
+  asset_indices = {}
+  for i, asset in enumerate(assets_subset):
+    asset_indices.setdefault(asset, i)
+
   def get_obj_index(obj):
-    try:
-      return assets_subset.index(obj)
-    except ValueError:
-      return -1
+    return asset_indices.get(obj, -1)
 
   return [{
       "instances": (get_obj_index(c["instances"][0]), get_obj_index(c["instances"][1])),
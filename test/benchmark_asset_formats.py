@@ -0,0 +1,88 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the cold-fetch latency of `AssetSource.fetch` for the different asset formats.
+
+Creates synthetic assets (a data.json and a mesh-like text file of the given size), packages
+them in each of the ARCHIVE_FORMATS of `asset_preprocessing` ("gztar", "tar", "dir"), and
+measures the time to fetch each asset with a fresh AssetSource (i.e. without any local copy).
+
+USAGE:
+  python3 -m test.benchmark_asset_formats --num_assets 10 --asset_size_mb 5
+"""
+
+import argparse
+import json
+import pathlib
+import tarfile
+import tempfile
+import time
+
+import numpy as np
+
+from kubric.assets import AssetSource
+
+# same as asset_preprocessing.ARCHIVE_FORMATS (which cannot be imported without bpy)
+ARCHIVE_FORMATS = {"gztar": (".tar.gz", "w:gz"), "tar": (".tar", "w"), "dir": ("", None)}
+
+
+def make_asset(asset_dir, asset_id, size, rng):
+  asset_dir.mkdir(parents=True)
+  (asset_dir / "data.json").write_text(json.dumps({"id": asset_id}))
+  num_vertices = size // 30
+  vertices = rng.uniform(-1, 1, size=(num_vertices, 3))
+  with open(asset_dir / "visual_geometry.obj", "w", encoding="utf-8") as f:
+    f.writelines(f"v {x:.6f} {y:.6f} {z:.6f}\n" for x, y, z in vertices)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_assets", type=int, default=10)
+  parser.add_argument("--asset_size_mb", type=float, default=5)
+  flags = parser.parse_args()
+
+  rng = np.random.RandomState(0)
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    tmp_dir = pathlib.Path(tmp_dir)
+    asset_ids = [f"asset_{i}" for i in range(flags.num_assets)]
+    for asset_id in asset_ids:
+      make_asset(tmp_dir / "dir" / asset_id, asset_id, int(flags.asset_size_mb * 2**20), rng)
+
+    print(f"{'format':>6} {'size [MB]':>10} {'fetch [ms]':>11}")
+    for archive_format, (suffix, mode) in ARCHIVE_FORMATS.items():
+      paths = []
+      for asset_id in asset_ids:
+        path = tmp_dir / "dir" / asset_id
+        if mode is not None:
+          (tmp_dir / archive_format).mkdir(exist_ok=True)
+          archive_path = tmp_dir / archive_format / (asset_id + suffix)
+          with tarfile.open(archive_path, mode) as tar:
+            tar.add(path, arcname=asset_id)
+          path = archive_path
+        paths.append(path)
+      size = sum(p.stat().st_size if p.is_file() else sum(f.stat().st_size for f in p.iterdir())
+                 for p in paths) / len(paths)
+
+      durations = []
+      for asset_id, path in zip(asset_ids, paths):
+        with AssetSource(name="benchmark", data_dir=tmp_dir, assets={},
+                         scratch_dir=tmp_dir) as source:
+          start = time.perf_counter()
+          source.fetch(path, asset_id)
+          durations.append(time.perf_counter() - start)
+      print(f"{archive_format:>6} {size / 2**20:>10.2f} {np.mean(durations) * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,63 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the methods of `blender_utils.replace_cryptomatte_hashes_by_asset_index`.
+
+USAGE:
+  python3 -m test.benchmark_cryptomatte --num_frames=24 --resolution=512
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from kubric import core
+from kubric.renderer import blender_utils
+
+
+def make_segmentation(num_objects, num_frames, resolution, rng):
+  assets = [core.Asset(name=f"Object_{i:02d}") for i in range(num_objects)]
+  hashes = np.array([0] + [blender_utils.mm3hash(a.uid) for a in assets], dtype=np.uint32)
+  segmentation_ids = rng.choice(hashes, size=(num_frames, resolution, resolution, 1))
+  return segmentation_ids.astype(np.uint32), assets
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_frames", type=int, default=24)
+  parser.add_argument("--resolution", type=int, default=512)
+  parser.add_argument("--object_counts", type=int, nargs="+", default=[1, 5, 10, 20, 50])
+  parser.add_argument("--repeats", type=int, default=3)
+  flags = parser.parse_args()
+
+  rng = np.random.RandomState(42)
+  print(f"{'objects':>8} {'mask [s]':>10} {'lookup [s]':>11} {'speedup':>8}")
+  for num_objects in flags.object_counts:
+    segmentation_ids, assets = make_segmentation(num_objects, flags.num_frames,
+                                                 flags.resolution, rng)
+    timings = {}
+    results = {}
+    for method in ["mask", "lookup"]:
+      def run(method=method):
+        results[method] = blender_utils.replace_cryptomatte_hashes_by_asset_index(
+            segmentation_ids, assets, method=method)
+      timings[method] = min(timeit.repeat(run, number=1, repeat=flags.repeats))
+    np.testing.assert_array_equal(results["mask"], results["lookup"])
+    print(f"{num_objects:>8} {timings['mask']:>10.3f} {timings['lookup']:>11.3f} "
+          f"{timings['mask'] / timings['lookup']:>7.1f}x")
+
+
+if __name__ == "__main__":
+  main()
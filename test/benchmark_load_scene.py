@@ -0,0 +1,154 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the per-scene time of `kubric.datasets.utils.load_scene_directory`.
+
+Writes a synthetic scene directory (random frames for all DEFAULT_LAYERS and minimal metadata),
+then compares reading and subsampling the frames one after the other (as done previously) with
+load_scene_directory (which reads them concurrently and subsamples the stacked arrays), and
+checks that both produce identical outputs. Also measures load_scene_directory for the same
+frames packed into a single scene container (see kubric.file_io.write_scene_container), and
+checks that it loads to the same example.
+
+USAGE:
+  python3 -m test.benchmark_load_scene --num_frames 24 --resolution 512 --target_size 128
+"""
+
+import argparse
+import json
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+
+from kubric import file_io
+from kubric.datasets import utils
+
+
+def make_data_stack(num_frames, resolution, rng):
+  """Random frames for all DEFAULT_LAYERS (as returned by the renderer)."""
+  shape = (num_frames, resolution, resolution)
+  return {
+      "rgba": rng.randint(0, 256, shape + (4,), dtype=np.uint8),
+      "segmentation": rng.randint(0, 5, shape + (1,), dtype=np.uint8),
+      "forward_flow": rng.uniform(-1, 1, shape + (2,)).astype(np.float32),
+      "backward_flow": rng.uniform(-1, 1, shape + (2,)).astype(np.float32),
+      "normal": rng.randint(0, 2**16, shape + (3,), dtype=np.uint16),
+      "object_coordinates": rng.randint(0, 2**16, shape + (3,), dtype=np.uint16),
+      "depth": rng.uniform(1, 20, shape + (1,)).astype(np.float32),
+  }
+
+
+def write_scene(scene_dir, data_stack, container=False):
+  """Writes the frames (one file per frame, or a single scene container) and the metadata."""
+  if container:
+    file_io.write_scene_container(data_stack, scene_dir)
+  else:
+    file_io.write_image_dict(data_stack, scene_dir)
+
+  num_frames, height, width = data_stack["rgba"].shape[:3]
+  file_io.write_json({
+      "metadata": {"num_frames": num_frames, "num_instances": 0,
+                   "resolution": [width, height]},
+      "camera": {"focal_length": 35., "sensor_width": 32., "field_of_view": 0.85,
+                 "positions": np.zeros((num_frames, 3)).tolist(),
+                 "quaternions": np.zeros((num_frames, 4)).tolist()},
+      "instances": [],
+  }, scene_dir / "metadata.json")
+  file_io.write_json({"collisions": []}, scene_dir / "events.json")
+
+
+def subsample_avg_per_frame(arr, size):
+  """Previous implementation of utils.subsample_avg (for a single frame)."""
+  src_height, src_width, channels = arr.shape
+  dst_height, dst_width = size
+  return np.round(arr.reshape((dst_height, src_height // dst_height,
+                               dst_width, src_width // dst_width,
+                               channels)).mean(axis=(1, 3))).astype(np.uint8)
+
+
+def load_frames_sequentially(scene_dir, target_size, num_frames):
+  """Reference: reads and subsamples every frame on its own (as done previously)."""
+  result = {}
+  depth = np.array([utils.subsample_nearest_neighbor(
+      file_io.read_tiff(scene_dir / f"depth_{f:05d}.tiff"), target_size)
+                    for f in range(num_frames)])
+  result["depth"] = utils.convert_float_to_uint16(depth, np.min(depth), np.max(depth))
+  for key in ["forward_flow", "backward_flow"]:
+    result[key] = [utils.subsample_nearest_neighbor(
+        file_io.read_png(scene_dir / f"{key}_{f:05d}.png")[..., :2], target_size)
+                   for f in range(num_frames)]
+  for key, name in [("normal", "normal"), ("object_coordinates", "object_coordinates"),
+                    ("segmentation", "segmentations")]:
+    result[name] = [utils.subsample_nearest_neighbor(
+        file_io.read_png(scene_dir / f"{key}_{f:05d}.png"), target_size)
+                    for f in range(num_frames)]
+  result["video"] = [subsample_avg_per_frame(
+      file_io.read_png(scene_dir / f"rgba_{f:05d}.png"), target_size)[..., :3]
+                     for f in range(num_frames)]
+  return result
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_frames", type=int, default=24)
+  parser.add_argument("--resolution", type=int, default=512)
+  parser.add_argument("--target_size", type=int, default=128)
+  parser.add_argument("--repeats", type=int, default=3)
+  flags = parser.parse_args()
+
+  target_size = (flags.target_size, flags.target_size)
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    data_stack = make_data_stack(flags.num_frames, flags.resolution, np.random.RandomState(0))
+    scene_dir = pathlib.Path(tmp_dir) / "frames" / "scene"
+    scene_dir.mkdir(parents=True)
+    write_scene(scene_dir, data_stack)
+
+    start = time.perf_counter()
+    for _ in range(flags.repeats):
+      expected = load_frames_sequentially(scene_dir, target_size, flags.num_frames)
+    sequential = (time.perf_counter() - start) / flags.repeats
+
+    start = time.perf_counter()
+    for _ in range(flags.repeats):
+      _, result, _ = utils.load_scene_directory(scene_dir, target_size)
+    concurrent = (time.perf_counter() - start) / flags.repeats
+
+    # (with the same name, which is used as the key of the example)
+    container_dir = pathlib.Path(tmp_dir) / "container" / "scene"
+    container_dir.mkdir(parents=True)
+    write_scene(container_dir, data_stack, container=True)
+    start = time.perf_counter()
+    for _ in range(flags.repeats):
+      _, container_result, _ = utils.load_scene_directory(container_dir, target_size)
+    packed = (time.perf_counter() - start) / flags.repeats
+
+  for key, frames in expected.items():
+    np.testing.assert_array_equal(np.asarray(frames), result[key], err_msg=key)
+    assert np.asarray(frames).dtype == result[key].dtype, key
+  # the same frames written into a scene container load to exactly the same example
+  for key in expected:
+    np.testing.assert_array_equal(container_result[key], result[key], err_msg=key)
+    assert container_result[key].dtype == result[key].dtype, key
+  assert container_result["metadata"] == result["metadata"]
+  print(json.dumps({"sequential [s/scene]": round(sequential, 3),
+                    "load_scene_directory [s/scene]": round(concurrent, 3),
+                    "speedup": round(sequential / concurrent, 2),
+                    "load_scene_directory from container [s/scene]": round(packed, 3),
+                    "container speedup": round(sequential / packed, 2)}, indent=2))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,74 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark placing N cubes without overlap on a floor.
+
+Compares calling `kb.move_until_no_overlap` once per object ("sequential") with the batched
+`kb.move_objects_until_no_overlap` which uses an AABB broadphase ("batched").
+
+USAGE:
+  python3 -m test.benchmark_placement --object_counts 10 50 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import kubric as kb
+from kubric.simulator.pybullet import PyBullet
+
+
+def build_scene(num_objects, region_size):
+  scene = kb.Scene()
+  simulator = PyBullet(scene)
+  scene += kb.Cube(name="floor", scale=(region_size, region_size, 0.1), position=(0, 0, -0.1),
+                   static=True)
+  cubes = [kb.Cube(name=f"cube_{i}", scale=0.3) for i in range(num_objects)]
+  scene += cubes
+  return simulator, cubes
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--object_counts", type=int, nargs="+", default=[10, 50, 100])
+  parser.add_argument("--max_trials", type=int, default=1000)
+  flags = parser.parse_args()
+
+  print(f"{'objects':>8} {'mode':>11} {'trials':>7} {'time [s]':>9}")
+  for num_objects in flags.object_counts:
+    # keep the density of objects constant
+    region_size = np.sqrt(num_objects)
+    spawn_region = ((-region_size, -region_size, 0), (region_size, region_size, 1))
+
+    simulator, cubes = build_scene(num_objects, region_size)
+    rng = np.random.RandomState(0)
+    start = time.perf_counter()
+    for cube in cubes:
+      kb.move_until_no_overlap(cube, simulator, spawn_region=spawn_region,
+                               max_trials=flags.max_trials, rng=rng)
+    duration = time.perf_counter() - start
+    print(f"{num_objects:>8} {'sequential':>11} {'-':>7} {duration:>9.3f}")
+
+    simulator, cubes = build_scene(num_objects, region_size)
+    start = time.perf_counter()
+    statistics = kb.move_objects_until_no_overlap(cubes, simulator, spawn_region=spawn_region,
+                                                  max_trials=flags.max_trials,
+                                                  rng=np.random.RandomState(0))
+    duration = time.perf_counter() - start
+    print(f"{num_objects:>8} {'batched':>11} {statistics['trials']:>7} {duration:>9.3f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,85 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Round-trip and throughput benchmark of the PNG codecs in `file_io.PNG_CODECS`.
+
+Covers every dtype / channel combination accepted by write_png (plus write_palette_png), checks
+that all codecs write byte-identical files and decode them to identical arrays, and reports the
+write and read throughput of each codec.
+
+USAGE:
+  python3 -m test.benchmark_png --resolution=512
+"""
+
+import argparse
+import pathlib
+import tempfile
+import timeit
+
+import numpy as np
+
+from kubric import file_io
+
+DTYPES = [np.uint8, np.uint16, np.uint32, np.uint64, np.float32, np.float64]
+CHANNELS = [1, 2, 3, 4]
+
+
+def make_image(dtype, channels, resolution, rng):
+  shape = (resolution, resolution, channels)
+  if np.issubdtype(dtype, np.floating):
+    return rng.uniform(size=shape).astype(dtype)
+  max_value = 256 if dtype == np.uint8 else 65536
+  return rng.randint(0, max_value, size=shape).astype(dtype)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--resolution", type=int, default=512)
+  parser.add_argument("--repeats", type=int, default=3)
+  flags = parser.parse_args()
+
+  rng = np.random.RandomState(42)
+  codecs = sorted(file_io.PNG_CODECS)
+  cases = [(f"{np.dtype(dtype).name} x{channels}", file_io.write_png,
+            make_image(dtype, channels, flags.resolution, rng), {})
+           for dtype in DTYPES for channels in CHANNELS]
+  segmentation = rng.randint(0, 24, size=(flags.resolution, flags.resolution, 1))
+  cases.append(("palette", file_io.write_palette_png, segmentation.astype(np.uint32), {}))
+
+  header = " ".join(f"{c + ' w/r [MP/s]':>24}" for c in codecs)
+  print(f"{'case':>14} {header}")
+  megapixels = flags.resolution ** 2 / 1e6
+  with tempfile.TemporaryDirectory() as tmpdir:
+    tmpdir = pathlib.Path(tmpdir)
+    for name, write_fn, data, kwargs in cases:
+      files, decoded, columns = {}, {}, []
+      for codec in codecs:
+        filename = tmpdir / f"{codec}.png"
+        write_time = min(timeit.repeat(lambda: write_fn(data, filename, codec=codec, **kwargs),
+                                       number=1, repeat=flags.repeats))
+        files[codec] = filename.read_bytes()
+        read_time = min(timeit.repeat(
+            lambda: decoded.__setitem__(codec, file_io.read_png(filename, codec=codec)),
+            number=1, repeat=flags.repeats))
+        columns.append(f"{megapixels / write_time:>11.1f} / {megapixels / read_time:>9.1f}")
+
+      reference = codecs[0]
+      for codec in codecs[1:]:
+        assert files[codec] == files[reference], f"{codec} differs from {reference} for {name}"
+        np.testing.assert_array_equal(decoded[codec], decoded[reference])
+      print(f"{name:>14} {' '.join(f'{c:>24}' for c in columns)}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,68 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the simulation throughput (steps/sec) of `PyBullet.run`.
+
+Compares the full run (state capture, contact collection and keyframing) to
+calling stepSimulation alone on an identical scene.
+
+USAGE:
+  python3 -m test.benchmark_pybullet --object_counts 5 20 50
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import kubric as kb
+from kubric.simulator.pybullet import PyBullet
+
+
+def make_scene(num_objects, num_frames, rng):
+  scene = kb.Scene(frame_start=0, frame_end=num_frames - 1)
+  simulator = PyBullet(scene)
+  scene += kb.Cube(name="floor", scale=(10, 10, 0.1), position=(0, 0, -0.1), static=True)
+  for i in range(num_objects):
+    position = rng.uniform((-4, -4, 1), (4, 4, 5))
+    velocity = rng.uniform((-2, -2, 0), (2, 2, 0))
+    scene += kb.Sphere(name=f"ball_{i}", scale=0.3, position=position, velocity=velocity)
+  return scene, simulator
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_frames", type=int, default=48)
+  parser.add_argument("--object_counts", type=int, nargs="+", default=[1, 5, 20, 50])
+  flags = parser.parse_args()
+
+  print(f"{'objects':>8} {'run [steps/s]':>14} {'stepSimulation [steps/s]':>25}")
+  for num_objects in flags.object_counts:
+    scene, simulator = make_scene(num_objects, flags.num_frames, np.random.RandomState(42))
+    num_steps = flags.num_frames * scene.step_rate // scene.frame_rate
+    start = time.perf_counter()
+    simulator.run()
+    run_time = time.perf_counter() - start
+
+    _, simulator = make_scene(num_objects, flags.num_frames, np.random.RandomState(42))
+    start = time.perf_counter()
+    for _ in range(num_steps):
+      simulator._physics_client.stepSimulation()  # pylint: disable=protected-access
+    step_time = time.perf_counter() - start
+
+    print(f"{num_objects:>8} {num_steps / run_time:>14.0f} {num_steps / step_time:>25.0f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,73 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the per-scene setup time of the PyBullet simulator for many short scenes.
+
+Compares creating a fresh `PyBullet` view for every scene ("fresh") with reusing a single
+(warm) view with cached collision shapes ("warm"). Each scene contains a number of instances of
+the same URDF object (by default the duck of pybullet_data).
+
+USAGE:
+  python3 -m test.benchmark_pybullet_setup --num_scenes 20 --objects_per_scene 10
+"""
+
+import argparse
+import os
+import time
+
+import pybullet_data
+
+import kubric as kb
+from kubric.simulator.pybullet import PyBullet
+
+
+def setup_scene(urdf_path, num_objects, simulator=None):
+  scene = kb.Scene(frame_start=0, frame_end=0)
+  if simulator is None:
+    simulator = PyBullet(scene)
+  else:
+    simulator.scene = scene
+  scene += kb.Cube(name="floor", scale=(10, 10, 0.1), position=(0, 0, -0.1), static=True)
+  for i in range(num_objects):
+    scene += kb.FileBasedObject(name=f"object_{i}", simulation_filename=urdf_path, scale=2,
+                                position=(i, 0, 1))
+  return simulator
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--urdf", type=str,
+                      default=os.path.join(pybullet_data.getDataPath(), "duck_vhacd.urdf"))
+  parser.add_argument("--num_scenes", type=int, default=20)
+  parser.add_argument("--objects_per_scene", type=int, default=10)
+  flags = parser.parse_args()
+
+  start = time.perf_counter()
+  for _ in range(flags.num_scenes):
+    setup_scene(flags.urdf, flags.objects_per_scene)
+  fresh_time = (time.perf_counter() - start) / flags.num_scenes
+
+  simulator = PyBullet(kb.Scene(), cache_collision_shapes=True)
+  start = time.perf_counter()
+  for _ in range(flags.num_scenes):
+    setup_scene(flags.urdf, flags.objects_per_scene, simulator)
+  warm_time = (time.perf_counter() - start) / flags.num_scenes
+
+  print(f"{'mode':>6} {'setup per scene [s]':>20}")
+  print(f"{'fresh':>6} {fresh_time:>20.4f}")
+  print(f"{'warm':>6} {warm_time:>20.4f}")
+
+
+if __name__ == "__main__":
+  main()
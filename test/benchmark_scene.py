@@ -0,0 +1,77 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the asset bookkeeping of a Scene with many assets.
+
+Measures the time for adding N assets (a fraction of them background clutter), for repeatedly
+querying the foreground/background partitions, for mapping N collisions to asset indices with
+`kb.process_collisions`, and for removing all assets again.
+
+USAGE:
+  python3 -m test.benchmark_scene --asset_counts 100 1000 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import kubric as kb
+
+
+def timed(fn):
+  start = time.perf_counter()
+  fn()
+  return time.perf_counter() - start
+
+
+def benchmark(num_assets, num_queries):
+  scene = kb.Scene()
+  scene.camera = kb.PerspectiveCamera(position=(0, -10, 0), look_at=(0, 0, 0))
+  # asset creation is not part of the measurement
+  cubes = [kb.Cube(name=f"cube_{i}", background=(i % 4 == 0)) for i in range(num_assets)]
+
+  results = {"add": timed(lambda: [scene.add(cube) for cube in cubes])}
+
+  def query():
+    for _ in range(num_queries):
+      _ = scene.foreground_assets
+      _ = scene.background_assets
+  results["partitions"] = timed(query)
+
+  rng = np.random.RandomState(0)
+  collisions = [{"instances": (cubes[i], cubes[j]), "contact_normal": (0., 0., 1.),
+                 "frame": 0, "force": 1., "position": (0., 0., 0.)}
+                for i, j in rng.randint(0, num_assets, size=(num_assets, 2))]
+  results["collisions"] = timed(lambda: kb.process_collisions(collisions, scene))
+
+  results["remove"] = timed(lambda: [scene.remove(cube) for cube in cubes])
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--asset_counts", type=int, nargs="+", default=[100, 1000, 10000])
+  parser.add_argument("--num_queries", type=int, default=100)
+  flags = parser.parse_args()
+
+  columns = ["add", "partitions", "collisions", "remove"]
+  print(f"{'assets':>8} " + " ".join(f"{c + ' [s]':>15}" for c in columns))
+  for num_assets in flags.asset_counts:
+    results = benchmark(num_assets, flags.num_queries)
+    print(f"{num_assets:>8} " + " ".join(f"{results[c]:>15.4f}" for c in columns))
+
+
+if __name__ == "__main__":
+  main()
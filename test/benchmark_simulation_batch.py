@@ -0,0 +1,61 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the throughput (scenes/sec) of kubric.simulator.simulate_scenes.
+
+Simulates a batch of MOVi-like physics-only scenes (balls thrown onto a floor) with an
+increasing number of worker processes.
+
+USAGE:
+  python3 -m test.benchmark_simulation_batch --num_scenes 32 --worker_counts 0 1 2 4 8
+"""
+
+import argparse
+import os
+import time
+
+import kubric as kb
+from kubric.simulator import SceneSpec
+from kubric.simulator import simulate_scenes
+
+
+def build_scene(scene, simulator, rng, num_objects=10):
+  scene += kb.Cube(name="floor", scale=(10, 10, 0.1), position=(0, 0, -0.1), static=True)
+  for i in range(num_objects):
+    ball = kb.Sphere(name=f"ball_{i}", scale=0.3, velocity=rng.uniform((-4, -4, 0), (4, 4, 0)))
+    scene += ball
+    kb.move_until_no_overlap(ball, simulator, spawn_region=((-4, -4, 1), (4, 4, 5)), rng=rng)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--num_scenes", type=int, default=32)
+  parser.add_argument("--num_objects", type=int, default=10)
+  parser.add_argument("--num_frames", type=int, default=24)
+  parser.add_argument("--worker_counts", type=int, nargs="+",
+                      default=sorted({0, 1, 2, 4, os.cpu_count()}))
+  flags = parser.parse_args()
+
+  specs = [SceneSpec(seed=i, config={"num_objects": flags.num_objects})
+           for i in range(flags.num_scenes)]
+  print(f"{'workers':>8} {'scenes/s':>9}")
+  for num_workers in flags.worker_counts:
+    start = time.perf_counter()
+    simulate_scenes(build_scene, specs, {"frame_end": flags.num_frames - 1},
+                    {"frame_start": 0}, num_workers=num_workers)
+    print(f"{num_workers:>8} {flags.num_scenes / (time.perf_counter() - start):>9.2f}")
+
+
+if __name__ == "__main__":
+  main()
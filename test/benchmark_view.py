@@ -0,0 +1,101 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark adding N objects to a scene that is linked to two views.
+
+Counts the setter invocations of both views and the wall time, for `View.add` (which only
+initializes the setters of the view that links the asset) and for the previous behaviour of
+re-notifying all observers of all views ("broadcast").
+
+USAGE:
+  python3 -m test.benchmark_view --object_counts 10 100
+"""
+
+import argparse
+import collections
+import time
+from unittest import mock
+
+import munch
+
+import kubric as kb
+from kubric import core
+from kubric.core.view import View
+
+
+class CountingView(View):
+  """A renderer-like view that registers one (counting) setter per trait of every asset."""
+
+  def __init__(self, scene, name, counter):
+    self.name = name
+    self.counter = counter
+    super().__init__(scene)
+
+  def add_asset(self, asset):
+    for trait_name in asset.trait_names():
+      asset.observe(self._setter, trait_name)
+    return object()
+
+  def remove_asset(self, asset):
+    pass
+
+  def _setter(self, change):  # pylint: disable=unused-argument
+    self.counter[self.name] += 1
+
+
+def broadcast_add(self, asset):
+  """View.add as it used to be: notifies all observers of all views for every trait."""
+  if self in asset.linked_objects or isinstance(asset, core.UndefinedAsset):
+    return
+  view_obj = self.add_asset(asset)
+  if view_obj is None:
+    return
+  asset.linked_objects[self] = view_obj
+  for trait_name in asset.trait_names():
+    value = getattr(asset, trait_name)
+    if isinstance(value, core.Asset):
+      self.add(value)
+    asset.notify_change(munch.Munch(owner=asset, type="change",
+                                    name=trait_name, new=value, old=value))
+
+
+def build_scene(num_objects):
+  counter = collections.Counter()
+  scene = kb.Scene()
+  CountingView(scene, "view_1", counter)
+  CountingView(scene, "view_2", counter)
+  start = time.perf_counter()
+  for i in range(num_objects):
+    scene += kb.Cube(name=f"cube_{i}", position=(i, 0, 0))
+  return time.perf_counter() - start, counter
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--object_counts", type=int, nargs="+", default=[10, 100, 500])
+  flags = parser.parse_args()
+
+  print(f"{'objects':>8} {'mode':>10} {'setter calls':>13} {'time [s]':>9}")
+  for num_objects in flags.object_counts:
+    for mode in ["targeted", "broadcast"]:
+      if mode == "broadcast":
+        with mock.patch.object(View, "add", broadcast_add):
+          duration, counter = build_scene(num_objects)
+      else:
+        duration, counter = build_scene(num_objects)
+      print(f"{num_objects:>8} {mode:>10} {sum(counter.values()):>13} {duration:>9.3f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,206 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import json
+import os
+import pathlib
+import tarfile
+import threading
+from unittest import mock
+
+import pytest
+
+from kubric.assets import AssetCache
+from kubric.assets import AssetSource
+from kubric.assets import ManifestIndex
+from kubric.assets import build_manifest_index
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+  data_dir = tmp_path / "data"
+  data_dir.mkdir()
+  for asset_id in ["a", "b", "c"]:
+    asset_dir = tmp_path / "src" / asset_id
+    asset_dir.mkdir(parents=True)
+    (asset_dir / "data.json").write_text(json.dumps({"id": asset_id}))
+    (asset_dir / "payload.bin").write_bytes(b"x" * 1000)
+    with tarfile.open(data_dir / f"{asset_id}.tar.gz", "w:gz") as tar:
+      tar.add(asset_dir, arcname=asset_id)
+  return data_dir
+
+
+def _make_source(data_dir, cache_dir, **kwargs):
+  assets = {asset_id: {"asset_type": "Texture", "kwargs": {"filename": "{asset_dir}/data.json"},
+                       "metadata": {}}
+            for asset_id in ["a", "b", "c"]}
+  return AssetSource(name="test", data_dir=data_dir, assets=assets, cache_dir=cache_dir,
+                     **kwargs)
+
+
+def test_asset_cache_is_shared_between_sources(data_dir, tmp_path):
+  source1 = _make_source(data_dir, tmp_path / "cache")
+  source2 = _make_source(data_dir, tmp_path / "cache")
+
+  texture = source1.create("a")
+  assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "a"}
+  assert source1.cache.stats["misses"] == 1
+  assert source1.cache.stats["bytes_fetched"] == (data_dir / "a.tar.gz").stat().st_size
+
+  assert source2.create("a").filename == texture.filename
+  assert source2.cache.stats["hits"] == 1
+  assert source2.cache.stats["misses"] == 0
+
+  # the content of the shared cache stays when the sources are closed
+  source1.close()
+  source2.close()
+  assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "a"}
+
+
+def test_asset_cache_concurrent_fetch(data_dir, tmp_path):
+  cache = AssetCache(tmp_path / "cache")
+  with concurrent.futures.ThreadPoolExecutor(8) as pool:
+    paths = list(pool.map(lambda _: cache.fetch(data_dir / "b.tar.gz", "b"), range(16)))
+  assert len(set(paths)) == 1
+  assert cache.stats["misses"] == 1
+  assert cache.stats["hits"] == 15
+  assert not list((tmp_path / "cache" / "tmp").iterdir())
+
+
+def test_asset_cache_lru_eviction(data_dir, tmp_path):
+  cache = AssetCache(tmp_path / "cache", max_size=2500, min_age=0)
+  path_a = cache.fetch(data_dir / "a.tar.gz", "a")
+  path_b = cache.fetch(data_dir / "b.tar.gz", "b")
+  cache.fetch(data_dir / "a.tar.gz", "a")  # a is now used more recently than b
+  path_c = cache.fetch(data_dir / "c.tar.gz", "c")
+
+  assert cache.stats["evictions"] == 1
+  assert path_a.exists() and path_c.exists()
+  assert not path_b.exists()
+
+
+def test_prefetch(data_dir):
+  source = _make_source(data_dir, cache_dir=None)
+  original_fetch = source.fetch
+  release_b = threading.Event()
+
+  def fetch(asset_path, asset_id, checksum=None):
+    if asset_id == "b":
+      assert release_b.wait(timeout=10)
+    return original_fetch(asset_path, asset_id, checksum)
+
+  with mock.patch.object(source, "fetch", side_effect=fetch) as mock_fetch:
+    source.prefetch(["a", "b"])
+    # create only waits for the asset it needs (and does not fetch it again)
+    texture = source.create("a")
+    assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "a"}
+    release_b.set()
+    source.create("b")
+    source.create("c")
+    source.prefetch(["a", "c"])
+    assert sorted(call.args[1] for call in mock_fetch.call_args_list) == ["a", "b", "c"]
+  source.close()
+
+
+def test_prefetch_failure_is_retried(data_dir):
+  source = _make_source(data_dir, cache_dir=None)
+  original_fetch = source.fetch
+  failures = ["a", "b"]
+
+  def fetch(asset_path, asset_id, checksum=None):
+    if asset_id in failures:
+      failures.remove(asset_id)
+      raise IOError(f"failed to fetch {asset_id}")
+    return original_fetch(asset_path, asset_id, checksum)
+
+  with mock.patch.object(source, "fetch", side_effect=fetch):
+    source.prefetch(["a", "b"])
+    with pytest.raises(IOError):
+      source.create("a")
+    texture = source.create("a")
+    assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "a"}
+
+    source._fetches["b"].exception(timeout=10)  # pylint: disable=protected-access
+    source.prefetch(["b"])  # a failed prefetch is started again
+    texture = source.create("b")
+    assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "b"}
+  source.close()
+
+
+def _write_manifest(data_dir, path):
+  assets = {asset_id: {"asset_type": "Texture", "kwargs": {"filename": "{asset_dir}/data.json"},
+                       "metadata": {"category": category}}
+            for asset_id, category in [("c", "cat"), ("a", "cat"), ("b", "dog")]}
+  path.write_text(json.dumps({"name": "test", "data_dir": str(data_dir), "assets": assets}))
+  return path
+
+
+def test_manifest_index(data_dir, tmp_path):
+  manifest_path = _write_manifest(data_dir, tmp_path / "test.json")
+  json_source = AssetSource.from_manifest(manifest_path)
+
+  index_path = build_manifest_index(manifest_path)
+  assert index_path.name == "test.index.sqlite"
+  index_source = AssetSource.from_manifest(manifest_path)
+  assert isinstance(index_source._assets, ManifestIndex)  # pylint: disable=protected-access
+
+  for source in [json_source, index_source]:
+    assert source.name == "test"
+    assert source.all_asset_ids == ["a", "b", "c"]
+    assert source.categories == ["cat", "dog"]
+    assert source.get_asset_ids("cat") == ["a", "c"]
+  train_ids, test_ids = index_source.get_test_split(fraction=0.4)
+  expected_train_ids, expected_test_ids = json_source.get_test_split(fraction=0.4)
+  assert train_ids == expected_train_ids
+  assert list(test_ids) == list(expected_test_ids)
+
+  texture = index_source.create("b")
+  assert json.loads(pathlib.Path(texture.filename).read_text()) == {"id": "b"}
+  assert texture.metadata["category"] == "dog"
+
+  # an outdated index is ignored
+  _write_manifest(data_dir, manifest_path).write_text(manifest_path.read_text() + "\n")
+  assert isinstance(AssetSource.from_manifest(manifest_path)._assets, dict)  # pylint: disable=protected-access
+
+  # also if the manifest was edited without changing its size
+  build_manifest_index(manifest_path)
+  manifest_path.write_text(manifest_path.read_text().replace('"dog"', '"cow"'))
+  mtime_ns = manifest_path.stat().st_mtime_ns + 10**9  # (the file system clock can be coarse)
+  os.utime(manifest_path, ns=(mtime_ns, mtime_ns))
+  source = AssetSource.from_manifest(manifest_path)
+  assert isinstance(source._assets, dict)  # pylint: disable=protected-access
+  assert source.categories == ["cat", "cow"]
+
+
+def test_asset_formats(data_dir, tmp_path):
+  with tarfile.open(data_dir / "a.tar", "w") as tar:
+    tar.add(tmp_path / "src" / "a", arcname="a")
+  source = _make_source(data_dir, cache_dir=None)
+  cache = AssetCache(tmp_path / "cache")
+
+  expected = {"id": "a"}
+  for path in [data_dir / "a.tar.gz", data_dir / "a.tar", tmp_path / "src" / "a"]:
+    asset_dir = source.fetch(path, "a")
+    assert json.loads((asset_dir / "data.json").read_text()) == expected
+    if path.is_dir():
+      # plain directories are used in place
+      assert asset_dir == path
+    source.close()
+    source = _make_source(data_dir, cache_dir=None)
+
+  # the cache can also copy asset directories (e.g. from remote storage)
+  asset_dir = cache.fetch(tmp_path / "src" / "a", "a")
+  assert json.loads((asset_dir / "data.json").read_text()) == expected
+  assert asset_dir.parent.parent == tmp_path / "cache" / "entries"
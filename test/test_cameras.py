@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import pytest
 
 from kubric.core import cameras
+from kubric.core import scene
 
 
 def test_orthographic_camera_constructor():
@@ -33,3 +35,18 @@ def test_perspective_camera_field_of_view():
   assert cam.field_of_view == pytest.approx(1.1427, abs=1e-4)  # ca 65.5°
 
 
+def test_project_points_matches_project_point():
+  camera = cameras.PerspectiveCamera(position=(3, -4, 5), look_at=(0, 0, 0))
+  scene.Scene(camera=camera, frame_start=0, frame_end=3)
+  camera.keyframe_insert("position", 0)
+  camera.position = (4, -2, 6)
+  camera.keyframe_insert("position", 3)
+
+  points = np.random.RandomState(0).uniform(-1, 1, size=(4, 5, 3))
+  projected = camera.project_points(points)
+
+  assert projected.shape == (4, 5, 3)
+  for frame in range(4):
+    for i in range(5):
+      np.testing.assert_allclose(projected[frame, i], camera.project_point(points[frame, i], frame),
+                                 atol=1e-6)
@@ -257,6 +257,20 @@ def test_object_aabbox_rotation():
   np.testing.assert_allclose(upper, (sqrt2, sqrt2, 1), atol=1e-5)
 
 
+def test_bbox_3d_over_time():
+  cube = objects.Cube(scale=(1, 2, 0.5))
+  cube.set_keyframes("position", [0, 2], [(0, 0, 0), (2, 4, 6)])
+  cube.set_keyframes("quaternion", [0, 2], [(1, 0, 0, 0), (0, 0, 0, 1)])
+
+  bboxes = cube.bbox_3d_over_time([0, 1, 2])
+
+  assert bboxes.shape == (3, 8, 3)
+  for i, frame in enumerate([0, 1, 2]):
+    with cube.at_frame(frame):
+      assert_allclose(bboxes[i], cube.bbox_3d, atol=1e-6)
+  assert_allclose(cube.position, (0, 0, 0))  # state is unchanged
+
+
 def test_keyframe_insert_raises_for_unknown_trait():
   obj = objects.Object3D()
   with pytest.raises(KeyError):
@@ -278,3 +292,59 @@ def test_keyframe_insert():
   assert change_argument.frame == 7
   assert change_argument.type == "keyframe"
 
+
+def test_set_keyframes():
+  obj = objects.Object3D(position=(1, 1, 1))
+  handler = mock.Mock()
+  obj.observe(handler, "position", type="keyframe")
+
+  obj.set_keyframes("position", [2, 3], [(0, 0, 0), (1, 2, 3)])
+
+  assert handler.call_count == 1
+  change_argument = handler.call_args[0][0]
+  assert change_argument.type == "keyframe"
+  assert change_argument.frames == [2, 3]
+  assert_allclose(np.stack(change_argument.new), [(0, 0, 0), (1, 2, 3)])
+  assert_allclose(obj.keyframes["position"][3], (1, 2, 3))
+  assert_allclose(obj.position, (1, 1, 1))  # current value is unchanged
+
+
+def test_set_keyframes_raises_for_invalid_input():
+  obj = objects.Object3D()
+  with pytest.raises(KeyError):
+    obj.set_keyframes("doesnotexist", [0], [1.])
+  with pytest.raises(ValueError):
+    obj.set_keyframes("position", [0, 1], [(0, 0, 0)])
+  with pytest.raises(TraitError):
+    obj.set_keyframes("position", [0], [(0, 0)])
+
+
+@pytest.mark.parametrize("interpolation, expected", [
+    ("linear", [[0, 0, 0], [0, 0, 0], [2, 0, 0], [4, 0, 0], [4, 0, 0]]),
+    ("const", [[0, 0, 0], [0, 0, 0], [0, 0, 0], [4, 0, 0], [4, 0, 0]]),
+    ("nearest", [[0, 0, 0], [0, 0, 0], [0, 0, 0], [4, 0, 0], [4, 0, 0]]),
+])
+def test_get_values_over_time(interpolation, expected):
+  obj = objects.Object3D()
+  obj.set_keyframes("position", [0, 4], [(0, 0, 0), (4, 0, 0)])
+
+  values = obj.get_values_over_time("position", [-1, 0, 2, 4, 5], interpolation=interpolation)
+  assert values.dtype == np.float32
+  assert_allclose(values, expected)
+  for frame, value in zip([-1, 0, 2, 4, 5], expected):
+    assert_allclose(obj.get_value_at("position", frame, interpolation=interpolation), value)
+
+
+def test_get_values_over_time_updates_after_keyframe_insert():
+  obj = objects.Object3D()
+  obj.keyframe_insert("position", 0)
+  assert_allclose(obj.get_values_over_time("position", [2]), [(0, 0, 0)])
+
+  obj.position = (4, 0, 0)
+  obj.keyframe_insert("position", 4)
+  assert_allclose(obj.get_values_over_time("position", [2]), [(2, 0, 0)])
+
+
+def test_get_values_over_time_without_keyframes():
+  obj = objects.Object3D(position=(1, 2, 3))
+  assert_allclose(obj.get_values_over_time("position", [0, 1]), [(1, 2, 3), (1, 2, 3)])
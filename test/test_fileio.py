@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import numpy as np
+import PIL.Image
 import pytest
 
 from kubric import file_io
@@ -73,6 +74,41 @@ def test_write_read_2_layer_png(tmpdir):
   np.testing.assert_array_equal(img_data_recovered, img_data_padded)
 
 
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16])
+@pytest.mark.parametrize("channels", [1, 2, 3, 4])
+def test_png_codecs_write_identical_files(tmpdir, dtype, channels):
+  # large enough for pypng to split the data into multiple IDAT chunks
+  img_data = np.random.RandomState(0).randint(0, np.iinfo(dtype).max, size=(300, 600, channels))
+  img_data = img_data.astype(dtype)
+  for codec in file_io.PNG_CODECS:
+    file_io.write_png(img_data, tmpdir / f"{codec}.png", codec=codec)
+  reference = (tmpdir / "pypng.png").read_binary()
+  for codec in file_io.PNG_CODECS:
+    assert (tmpdir / f"{codec}.png").read_binary() == reference
+    img_data_recovered = file_io.read_png(tmpdir / "pypng.png", codec=codec)
+    np.testing.assert_array_equal(img_data_recovered[..., :channels], img_data)
+
+
+def test_write_palette_png_codecs_write_identical_files(tmpdir):
+  img_data = np.arange(256, dtype=np.uint32).reshape((16, 16, 1)) % 7
+  for codec in file_io.PNG_CODECS:
+    file_io.write_palette_png(img_data, tmpdir / f"{codec}.png", codec=codec)
+    np.testing.assert_array_equal(file_io.read_png(tmpdir / f"{codec}.png"), img_data)
+  reference = (tmpdir / "pypng.png").read_binary()
+  for codec in file_io.PNG_CODECS:
+    assert (tmpdir / f"{codec}.png").read_binary() == reference
+
+
+def test_read_filtered_png(tmpdir):
+  """PNGs written by other tools (e.g. Blender) typically use scanline filters."""
+  filename = tmpdir / "filtered.png"
+  img_data = np.random.RandomState(0).randint(0, 255, size=(32, 32, 4)).astype(np.uint8)
+  img_data[::2] = 0
+  PIL.Image.fromarray(img_data, "RGBA").save(str(filename))
+  for codec in file_io.PNG_CODECS:
+    np.testing.assert_array_equal(file_io.read_png(filename, codec=codec), img_data)
+
+
 def test_write_float32_png_fails_for_values_not_between_0_and_1(tmpdir):
   img_data = np.linspace(0, 2., 8*8, dtype=np.float32).reshape((8, 8, 1))
   with pytest.raises(ValueError):
@@ -146,3 +182,97 @@ def test_write_image_dict(tmpdir):
 
       assert img.shape == img_recovered.shape
       np.testing.assert_allclose(img_recovered, img, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_multi_write_image(tmpdir, executor):
+  data = np.arange(5*8*8*3, dtype=np.uint8).reshape((5, 8, 8, 3))
+  file_io.multi_write_image(data, str(tmpdir / "img_{:02d}.png"), executor=executor)
+  for i, img in enumerate(data):
+    np.testing.assert_array_equal(file_io.read_png(tmpdir / f"img_{i:02d}.png"), img)
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_multi_write_image_raises_errors(tmpdir, executor):
+  data = np.linspace(0, 2., 2*8*8*3, dtype=np.float32).reshape((2, 8, 8, 3))
+  with pytest.raises(ValueError):
+    file_io.multi_write_image(data, str(tmpdir / "img_{:02d}.png"), executor=executor)
+
+
+def test_multi_write_image_raises_for_unknown_executor(tmpdir):
+  data = np.zeros((2, 8, 8, 3), dtype=np.uint8)
+  with pytest.raises(ValueError):
+    file_io.multi_write_image(data, str(tmpdir / "img_{:02d}.png"), executor="gpu")
+
+
+def test_write_image_dict_concurrent_layers(tmpdir):
+  img_dict = {
+      "rgba": np.arange(3*4*4*4, dtype=np.uint8).reshape((3, 4, 4, 4)),
+      "forward_flow": np.linspace(0, 10., 3*4*4*2, dtype=np.float32).reshape((3, 4, 4, 2)),
+      "backward_flow": np.linspace(-10, 0., 3*4*4*2, dtype=np.float32).reshape((3, 4, 4, 2)),
+  }
+  file_io.write_image_dict(img_dict, tmpdir, concurrent_layers=True)
+
+  data_ranges = file_io.read_json(tmpdir / "data_ranges.json")
+  assert set(data_ranges) == {"forward_flow", "backward_flow"}
+  for i in range(3):
+    assert (tmpdir / f"rgba_{i:05d}.png").exists()
+    assert (tmpdir / f"forward_flow_{i:05d}.png").exists()
+    assert (tmpdir / f"backward_flow_{i:05d}.png").exists()
+
+
+def test_write_read_completion_manifest(tmpdir):
+  assert file_io.read_completion_manifest(tmpdir) is None
+  file_io.write_json({"a": 1}, tmpdir / "metadata.json")
+  file_io.write_png(np.zeros((4, 4, 3), dtype=np.uint8), tmpdir / "rgba_00000.png")
+  (tmpdir / "subdir").mkdir()
+
+  manifest = file_io.write_completion_manifest(tmpdir)
+  assert sorted(manifest["files"]) == ["metadata.json", "rgba_00000.png"]
+  assert manifest["files"]["metadata.json"] == (tmpdir / "metadata.json").size()
+  assert file_io.read_completion_manifest(tmpdir) == manifest
+  assert not (tmpdir / (file_io.COMPLETION_MANIFEST + ".tmp")).exists()
+
+  # the manifest itself is not listed and the checksum only changes with the content
+  assert file_io.write_completion_manifest(tmpdir) == manifest
+  file_io.write_json({"a": 2}, tmpdir / "metadata.json")
+  assert file_io.write_completion_manifest(tmpdir)["checksum"] != manifest["checksum"]
+
+
+def test_write_scene_container(tmpdir):
+  rng = np.random.RandomState(0)
+  img_dict = {
+      "rgba": rng.randint(0, 256, size=(3, 4, 4, 4)).astype(np.uint8),
+      "segmentation": rng.randint(0, 5, size=(3, 4, 4, 1)).astype(np.uint32),
+      "forward_flow": rng.uniform(-10, 10, size=(3, 4, 4, 2)).astype(np.float32),
+      "depth": rng.uniform(1, 20, size=(3, 4, 4, 1)).astype(np.float32),
+      "normal": rng.uniform(0, 1, size=(3, 4, 4, 3)).astype(np.float32),
+  }
+  file_io.write_image_dict(img_dict, tmpdir / "frames")
+  data_ranges = file_io.write_scene_container(img_dict, tmpdir / "packed")
+  assert data_ranges == file_io.read_json(tmpdir / "frames" / "data_ranges.json")
+
+  container = file_io.SceneContainer(tmpdir / "packed" / file_io.SCENE_CONTAINER)
+  assert container.is_local
+  assert sorted(container.layers) == sorted(img_dict)
+  assert container.data_ranges == data_ranges
+  for key in img_dict:
+    if key == "depth":
+      frames = np.stack([file_io.read_tiff(tmpdir / "frames" / f"depth_{i:05d}.tiff")
+                         for i in range(3)])
+    else:
+      frames = np.stack([file_io.read_png(tmpdir / "frames" / f"{key}_{i:05d}.png")
+                         for i in range(3)])
+    if key == "forward_flow":
+      frames = frames[..., :2]
+    np.testing.assert_array_equal(container[key], frames)
+    assert container[key].dtype == frames.dtype
+    np.testing.assert_array_equal(container.read_frame(key, 1), frames[1])
+
+  # the container is a regular (uncompressed) npz file
+  with np.load(str(tmpdir / "packed" / file_io.SCENE_CONTAINER)) as npz:
+    np.testing.assert_array_equal(npz["rgba"], img_dict["rgba"])
+
+  container.is_local = False  # read with (ranged) requests instead of memory mapping
+  np.testing.assert_array_equal(container["depth"], img_dict["depth"])
+  np.testing.assert_array_equal(container.read_frame("rgba", 2), img_dict["rgba"][2])
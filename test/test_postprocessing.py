@@ -12,13 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from unittest import mock
+
+from kubric import post_processing
 from kubric.renderer import blender_utils
 
+from kubric import core
 from kubric.core.scene import Scene
 from kubric.core import cameras
 from kubric.core import objects
 from kubric.renderer.blender import Blender
+import Imath
 import numpy as np
+import OpenEXR
 import pytest
 
 # a large list of cryptomatte ids that were manually extracted
@@ -65,6 +71,39 @@ def test_mm3hash():
     assert blender_utils.mm3hash(name) == expected
 
 
+@pytest.mark.parametrize("method", ["lookup", "mask"])
+def test_replace_cryptomatte_hashes_by_asset_index(method):
+  # use mocks with fixed uids, since uids of real assets depend on previously created instances
+  assets = [mock.Mock(core.Asset, uid=name) for name, _ in name_to_crypto[:5]]
+  hashes = np.array([crypto for _, crypto in name_to_crypto[:5]], dtype=np.uint32)
+  rng = np.random.RandomState(42)
+  segmentation_ids = rng.choice(np.append(hashes, [0, 12345]), size=(3, 7, 5, 1))
+  segmentation_ids = segmentation_ids.astype(np.uint32)
+
+  expected = np.zeros_like(segmentation_ids)
+  for idx, crypto in enumerate(hashes, start=1):
+    expected[segmentation_ids == crypto] = idx
+
+  result = blender_utils.replace_cryptomatte_hashes_by_asset_index(
+      segmentation_ids, assets, method=method)
+  assert result.dtype == segmentation_ids.dtype
+  np.testing.assert_array_equal(result, expected)
+
+
+def test_replace_cryptomatte_hashes_by_asset_index_binary_search_fallback():
+  assets = [mock.Mock(core.Asset, uid=name) for name, _ in name_to_crypto[:3]]
+  segmentation_ids = np.array([0, 3498399415, 2711523813, 7, 991243257], dtype=np.uint32)
+  with mock.patch.object(blender_utils, "_find_unique_hash_window", return_value=None):
+    result = blender_utils.replace_cryptomatte_hashes_by_asset_index(segmentation_ids, assets)
+  np.testing.assert_array_equal(result, [0, 1, 3, 0, 2])
+
+
+def test_replace_cryptomatte_hashes_without_assets():
+  segmentation_ids = np.full((2, 3, 3, 1), 991243257, dtype=np.uint32)
+  result = blender_utils.replace_cryptomatte_hashes_by_asset_index(segmentation_ids, [])
+  np.testing.assert_array_equal(result, 0)
+
+
 @pytest.mark.skip(reason="TODO(klausg)")
 def test_optical_flow():
   # --- create scene and attach a renderer to it
@@ -119,3 +158,88 @@ def test_depth(tmpdir):
   # the depth map should give a constant value equal to the radius of the sphere
   frames = renderer.render_still()
   np.testing.assert_allclose(frames["depth"], 10, atol=0.01)
+
+
+def test_depth_streaming(tmpdir):
+  scene = Scene(resolution=(5, 7), frame_end=2)
+
+  renderer = Blender(scene, scratch_dir=tmpdir)
+
+  scene += objects.Sphere(scale=10, position=(0, 0, 0.))
+  scene += cameras.PerspectiveCamera(name="camera", position=(0, 0, 0), look_at=(1, 0, 0))
+
+  frames = renderer.render(return_layers=("rgba", "depth"), streaming=True)
+  assert frames["rgba"].shape == (2, 7, 5, 4)
+  np.testing.assert_allclose(frames["depth"], 10, atol=0.01)
+  # the intermediate files are removed once they have been processed
+  assert not list((renderer.scratch_dir / "exr").glob("*.exr"))
+
+
+def _write_exr(filename, channels):
+  height, width = next(iter(channels.values())).shape
+  header = OpenEXR.Header(width, height)
+  float_type = Imath.Channel(Imath.PixelType(Imath.PixelType.FLOAT))
+  header["channels"] = {name: float_type for name in channels}
+  exr = OpenEXR.OutputFile(str(filename), header)
+  exr.writePixels({name: data.astype(np.float32).tobytes() for name, data in channels.items()})
+  exr.close()
+
+
+def test_get_render_layers_from_exr(tmpdir):
+  rng = np.random.RandomState(0)
+  channels = {f"{layer}.{c}": rng.uniform(-1, 1, size=(3, 4))
+              for layer, cs in [("Depth", "V"), ("Vector", "RGBA"), ("Normal", "XYZ")]
+              for c in cs}
+  filename = tmpdir / "frame_0001.exr"
+  _write_exr(filename, channels)
+
+  layers = blender_utils.get_render_layers_from_exr(filename)
+  assert set(layers) == {"depth", "backward_flow", "forward_flow", "normal"}
+  np.testing.assert_allclose(layers["backward_flow"][..., 0], channels["Vector.G"], rtol=1e-6)
+  np.testing.assert_allclose(layers["backward_flow"][..., 1], -channels["Vector.R"], rtol=1e-6)
+  np.testing.assert_allclose(layers["forward_flow"][..., 0], channels["Vector.A"], rtol=1e-6)
+  np.testing.assert_allclose(layers["forward_flow"][..., 1], -channels["Vector.B"], rtol=1e-6)
+
+  timings = {}
+  layers = blender_utils.get_render_layers_from_exr(filename, layers={"depth"}, timings=timings)
+  assert set(layers) == {"depth"}
+  assert set(timings) == {"Depth"}
+  assert layers["depth"].shape == (3, 4, 1)
+
+
+def test_segmentation_statistics():
+  segmentation = np.zeros((2, 4, 5, 1), dtype=np.uint32)
+  segmentation[0, 1:3, 2:4] = 1
+  segmentation[1, 0, 0] = 1
+  segmentation[1, 3, 4] = 2
+
+  stats = post_processing.segmentation_statistics(segmentation)
+
+  np.testing.assert_array_equal(stats["visibility"], [[16, 18], [4, 1], [0, 1]])
+  np.testing.assert_allclose(stats["bboxes"][1], [(0.25, 0.4, 0.75, 0.8), (0., 0., 0.25, 0.2)])
+  np.testing.assert_allclose(stats["bboxes"][2, 1], (0.75, 0.8, 1., 1.))
+  assert np.all(np.isnan(stats["bboxes"][2, 0]))
+
+
+def test_segmentation_statistics_single_pass_matches_separate_passes():
+  rng = np.random.RandomState(0)
+  segmentation = rng.randint(0, 6, size=(3, 16, 16, 1)).astype(np.uint32)
+  assets = [mock.Mock(core.PhysicalObject, segmentation_id=None, metadata={}) for _ in range(5)]
+  new_assets = [assets[3], assets[0]]
+  new_segmentation = post_processing.adjust_segmentation_idxs(segmentation, assets, new_assets)
+  for i, asset in enumerate(assets, start=1):
+    np.testing.assert_array_equal(new_segmentation[segmentation == i],
+                                  new_assets.index(asset) + 1 if asset in new_assets else 0)
+
+  stats = post_processing.segmentation_statistics(segmentation)
+  post_processing.compute_visibility(segmentation, assets, statistics=stats)
+  assert assets[2].metadata["visibility"] == [int(np.sum(segmentation[t] == 3)) for t in range(3)]
+
+  lut = post_processing.segmentation_remap_lut(assets, new_assets)
+  remapped = post_processing.remap_segmentation_statistics(stats, lut)
+  direct = post_processing.segmentation_statistics(new_segmentation)
+  np.testing.assert_array_equal(
+      post_processing.adjust_segmentation_idxs(segmentation, assets, new_assets, lut=lut),
+      new_segmentation)
+  np.testing.assert_array_equal(remapped["visibility"], direct["visibility"])
+  np.testing.assert_array_equal(remapped["bboxes"], direct["bboxes"])
@@ -16,6 +16,7 @@
 
 import kubric as kb
 from kubric.simulator.pybullet import PyBullet as KubricSimulator
+from kubric.simulator.pybullet import COLLISION_DTYPE, STATE_LAYOUT
 import numpy as np
 
 
@@ -50,3 +51,147 @@ def test_simulator_in_loop():
     scene.add(cube)
     simulator.run()
     np.testing.assert_allclose(cube.position[1], -0.5 * 10, atol=0.1)
+
+
+def test_simulate_returns_arrays():
+  scene = kb.Scene(gravity=(0, 0, -10), frame_start=0, frame_end=9)
+  simulator = KubricSimulator(scene)
+  floor = kb.Cube(name="floor", scale=(5, 5, 0.1), position=(0, 0, -0.1), static=True)
+  ball = kb.Sphere(name="ball", scale=0.5, position=(0, 0, 0.6), velocity=(1, 0, 0))
+  scene.add([floor, ball])
+
+  body_ids, states, collisions, metadata = simulator.simulate()
+  assert body_ids == [floor.linked_objects[simulator], ball.linked_objects[simulator]]
+  assert states.shape == (10, 2, 13)
+  ball_states = states[:, 1]
+  np.testing.assert_allclose(ball_states[0, STATE_LAYOUT["position"]],
+                             (0, 0, 0.6), atol=1e-6)
+  np.testing.assert_allclose(ball_states[0, STATE_LAYOUT["velocity"]],
+                             (1, 0, 0), atol=1e-6)
+  assert collisions.dtype == COLLISION_DTYPE
+  assert len(collisions) > 0
+  assert metadata == {}
+  # simulate does not insert keyframes
+  assert not ball.keyframes
+
+  animation, collision_dicts = simulator.run()
+  assert set(animation) == {floor, ball}
+  assert len(animation[ball]["position"]) == 10
+  assert all(isinstance(position, tuple) and len(position) == 3
+             for position in animation[ball]["position"])
+  assert collision_dicts[0]["instances"] in [(floor, ball), (ball, floor)]
+  assert set(ball.keyframes["position"]) == set(range(10))
+
+
+def _place_cubes(seed, num_cubes=10):
+  scene = kb.Scene(gravity=(0, 0, -10))
+  simulator = KubricSimulator(scene)
+  floor = kb.Cube(name="floor", scale=(5, 5, 0.1), position=(0, 0, -0.1), static=True)
+  cubes = [kb.Cube(name=f"cube_{i}", scale=0.3) for i in range(num_cubes)]
+  scene.add([floor] + cubes)
+  statistics = kb.move_objects_until_no_overlap(
+      cubes, simulator, spawn_region=((-3, -3, 0), (3, 3, 2)), rng=np.random.RandomState(seed))
+  return simulator, floor, cubes, statistics
+
+
+def test_move_objects_until_no_overlap():
+  simulator, floor, cubes, statistics = _place_cubes(seed=42)
+  for cube in cubes:
+    assert not simulator.check_overlap(cube)
+  assert statistics["trials"] == sum(statistics["trials_per_asset"])
+  assert statistics["rejections"] == statistics["trials"] - len(cubes)
+  # the broadphase skips most pairs: all cubes are above the floor and mostly far apart
+  assert statistics["narrow_phase_checks"] < statistics["trials"] * len(cubes)
+  assert not simulator.check_overlap(cubes[0], others=[floor])
+
+  # deterministic for a given seed
+  _, _, other_cubes, other_statistics = _place_cubes(seed=42)
+  assert other_statistics == statistics
+  for cube, other_cube in zip(cubes, other_cubes):
+    np.testing.assert_array_equal(cube.position, other_cube.position)
+
+
+_BOX_URDF = """
+<robot name="box">
+  <link name="base">
+    <contact>
+      <lateral_friction value="0.8" />
+    </contact>
+    <inertial>
+      <origin xyz="0 0 0" />
+      <mass value="2.0" />
+      <inertia ixx="1" ixy="0" ixz="0" iyy="1" iyz="0" izz="1" />
+    </inertial>
+    <collision>
+      <origin xyz="0 0 0" />
+      <geometry>
+        <box size="0.5 0.5 0.5" />
+      </geometry>
+    </collision>
+  </link>
+</robot>
+"""
+
+
+def _simulate_boxes(urdf_path, simulator=None, cache_collision_shapes=False):
+  scene = kb.Scene(gravity=(0, 0, -10), frame_start=0, frame_end=12)
+  if simulator is None:
+    simulator = KubricSimulator(scene, cache_collision_shapes=cache_collision_shapes)
+  else:
+    simulator.scene = scene
+  scene += kb.Cube(name="floor", scale=(5, 5, 0.1), position=(0, 0, -0.1), static=True)
+  boxes = [kb.FileBasedObject(name=f"box_{i}", simulation_filename=str(urdf_path), scale=2,
+                              position=(i, 0, 1 + 0.5 * i), velocity=(0, 0, -i))
+           for i in range(3)]
+  scene += boxes
+  animation, _ = simulator.run()
+  return simulator, boxes, np.stack([animation[box]["position"] for box in boxes])
+
+
+def test_reuse_simulator_with_cached_collision_shapes(tmp_path):
+  urdf_path = tmp_path / "box.urdf"
+  urdf_path.write_text(_BOX_URDF)
+
+  _, _, positions = _simulate_boxes(urdf_path)
+  simulator, boxes, cached_positions = _simulate_boxes(urdf_path, cache_collision_shapes=True)
+  np.testing.assert_allclose(cached_positions, positions, atol=1e-3)
+  # one shape for the floor and one for all three boxes
+  assert len(simulator._collision_shapes) == 2  # pylint: disable=protected-access
+
+  # reusing the (warm) simulator for another scene removes the old bodies and reuses the shapes
+  _, _, reused_positions = _simulate_boxes(urdf_path, simulator=simulator)
+  np.testing.assert_array_equal(reused_positions, cached_positions)
+  assert simulator._physics_client.getNumBodies() == 4  # pylint: disable=protected-access
+  assert len(simulator._collision_shapes) == 2  # pylint: disable=protected-access
+  # assets of the old scene are no longer linked to the simulator
+  boxes[0].position = (10, 10, 10)
+  assert simulator not in boxes[0].linked_objects
+
+
+def _drop_box(rest_frames=None, frame_end=47):
+  scene = kb.Scene(gravity=(0, 0, -10), frame_start=0, frame_end=frame_end)
+  simulator = KubricSimulator(scene)
+  floor = kb.Cube(name="floor", scale=(5, 5, 0.1), position=(0, 0, -0.1), static=True)
+  box = kb.Cube(name="box", scale=0.2, position=(0, 0, 0.3), restitution=0., friction=1.)
+  scene.add([floor, box])
+  animation, _ = simulator.run(rest_frames=rest_frames)
+  return scene, animation[box]
+
+
+def test_run_stops_early_when_at_rest():
+  scene, animation = _drop_box()
+  assert "saved_simulation_steps" not in scene.metadata
+
+  rest_scene, rest_animation = _drop_box(rest_frames=5)
+  saved_steps = rest_scene.metadata["saved_simulation_steps"]
+  assert 0 < saved_steps < 48 * 10
+  assert len(rest_animation["position"]) == 48
+  # the skipped frames hold the resting state
+  np.testing.assert_array_equal(rest_animation["position"][-1],
+                                rest_animation["position"][-saved_steps // 10])
+  np.testing.assert_allclose(rest_animation["position"], animation["position"], atol=1e-3)
+
+  # the box starts without any velocity, which does not count as being at rest
+  short_scene, short_animation = _drop_box(rest_frames=1, frame_end=3)
+  assert short_scene.metadata["saved_simulation_steps"] == 0
+  assert short_animation["position"][-1][2] < short_animation["position"][0][2]
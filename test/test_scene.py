@@ -135,4 +135,62 @@ def test_recursive_asset_adding():
   assert asset.material == mat
   assert mat in scene1.assets
   assert mat in scene2.assets
-  view1.add.assert_called_once_with(mat)
\ No newline at end of file
+  view1.add.assert_called_once_with(mat)
+
+
+class _ObservingView(view.View):
+  """Minimal view that registers one (mock) setter for the position of every asset."""
+
+  def __init__(self, scene):
+    self.setter = mock.Mock()
+    super().__init__(scene)
+
+  def add_asset(self, asset):
+    asset.observe(self.setter, "position")
+    return object()
+
+  def remove_asset(self, asset):
+    pass
+
+
+def test_view_add_only_initializes_setters_of_the_new_view():
+  scene = Scene()
+  view1 = _ObservingView(scene)
+  view2 = _ObservingView(scene)
+
+  scene.add(objects.Object3D(position=(1, 2, 3)))
+
+  # each view initializes its own setter exactly once
+  assert view1.setter.call_count == 1
+  assert view2.setter.call_count == 1
+  change = view2.setter.call_args[0][0]
+  assert change.name == "position"
+  assert tuple(change.new) == (1, 2, 3)
+
+
+def test_asset_partitions_follow_changes():
+  scene = Scene()
+  cube = objects.Cube()
+  floor = objects.Cube(background=True)
+  mat = materials.FlatMaterial()
+  scene.add([cube, floor, mat])
+
+  assert scene.assets == (cube, floor, mat)
+  assert scene.foreground_assets == (cube,)
+  assert scene.background_assets == (floor,)
+  assert scene.get_asset(floor.uid) is floor
+  assert cube in scene
+
+  # changing the background flag of an asset invalidates the cached partitions
+  cube.background = True
+  assert scene.foreground_assets == ()
+  assert scene.background_assets == (cube, floor)
+
+  scene.remove(cube)
+  assert cube not in scene
+  assert scene.assets == (floor, mat)
+  assert scene.background_assets == (floor,)
+
+  # removed assets no longer affect the scene
+  cube.background = False
+  assert scene.foreground_assets == ()
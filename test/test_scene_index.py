@@ -0,0 +1,62 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from kubric import file_io
+from kubric.datasets import scene_index
+
+
+def make_job_dir(job_dir):
+  for i in range(3):
+    file_io.write_json({"scene": i}, job_dir / str(i) / "metadata.json")
+  file_io.write_completion_manifest(job_dir / "0")
+  file_io.write_completion_manifest(job_dir / "2")
+  return job_dir
+
+
+def test_list_scene_dirs_without_index(tmpdir):
+  job_dir = make_job_dir(tmpdir)
+  scene_dirs, complete_dirs = scene_index.list_scene_dirs(job_dir)
+  assert sorted(scene_dirs) == [str(job_dir / str(i)) for i in range(3)]
+  assert complete_dirs is None
+
+
+def test_build_scene_index(tmpdir):
+  job_dir = make_job_dir(tmpdir)
+  index_path = scene_index.build_scene_index(job_dir)
+  assert index_path == file_io.as_path(job_dir) / scene_index.INDEX_FILENAME
+
+  scenes = scene_index.read_scene_index(job_dir)
+  assert sorted(scenes) == ["0", "1", "2"]
+  assert scenes["0"] == file_io.read_completion_manifest(job_dir / "0")
+  assert scenes["1"] is None
+
+  scene_dirs, complete_dirs = scene_index.list_scene_dirs(job_dir)
+  assert scene_dirs == [str(job_dir / str(i)) for i in range(3)]
+  assert complete_dirs == {str(job_dir / "0"), str(job_dir / "2")}
+
+  # rebuilding the index does not list the index itself
+  scene_index.build_scene_index(job_dir)
+  assert sorted(scene_index.read_scene_index(job_dir)) == ["0", "1", "2"]
+
+
+def test_build_scene_index_warns_without_manifests(tmpdir, caplog):
+  for i in range(2):
+    file_io.write_json({"scene": i}, tmpdir / str(i) / "metadata.json")
+  with caplog.at_level(logging.WARNING):
+    scene_index.build_scene_index(tmpdir)
+  assert "completion manifest" in caplog.text
+  _, complete_dirs = scene_index.list_scene_dirs(tmpdir)
+  assert complete_dirs == set()
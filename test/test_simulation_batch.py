@@ -0,0 +1,58 @@
+# Copyright 2024 The Kubric Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+import kubric as kb
+from kubric.simulator import SceneSpec
+from kubric.simulator import simulate_scenes
+
+
+def build_balls(scene, simulator, rng, num_balls=1, frame_end=None):
+  if frame_end is not None:
+    scene.frame_end = frame_end
+  scene += kb.Cube(name="floor", scale=(5, 5, 0.1), position=(0, 0, -0.1), static=True)
+  for i in range(num_balls):
+    ball = kb.Sphere(name=f"ball_{i}", scale=0.2, velocity=rng.uniform((-1, -1, 0), (1, 1, 0)))
+    scene += ball
+    kb.move_until_no_overlap(ball, simulator, spawn_region=((-2, -2, 0.5), (2, 2, 2)), rng=rng)
+
+
+def test_simulate_scenes():
+  specs = [SceneSpec(seed=1, config={"num_balls": 2}), SceneSpec(seed=2, config={"num_balls": 4})]
+  scene_kwargs = {"frame_end": 4, "gravity": (0, 0, -10)}
+
+  serial = simulate_scenes(build_balls, specs, scene_kwargs, num_workers=0)
+  assert serial["states"].shape == (2, 5, 5, 13)
+  np.testing.assert_array_equal(serial["num_bodies"], [3, 5])
+  assert serial["names"][0] == ["floor", "ball_0", "ball_1"]
+  assert np.all(np.isnan(serial["states"][0, :, 3:]))
+  assert not np.any(np.isnan(serial["states"][1]))
+  assert [metadata["seed"] for metadata in serial["metadata"]] == [1, 2]
+
+  parallel = simulate_scenes(build_balls, specs, scene_kwargs, num_workers=2)
+  np.testing.assert_array_equal(parallel["states"], serial["states"])
+  assert parallel["names"] == serial["names"]
+  for parallel_collisions, serial_collisions in zip(parallel["collisions"],
+                                                    serial["collisions"]):
+    np.testing.assert_array_equal(parallel_collisions, serial_collisions)
+
+
+def test_simulate_scenes_with_different_lengths():
+  specs = [SceneSpec(seed=1, config={"num_balls": 2, "frame_end": 2}), SceneSpec(seed=2)]
+  result = simulate_scenes(build_balls, specs, {"frame_end": 4}, num_workers=0)
+  assert result["states"].shape == (2, 5, 3, 13)
+  assert np.all(np.isnan(result["states"][0, 3:]))
+  assert not np.any(np.isnan(result["states"][0, :3]))
+  assert not np.any(np.isnan(result["states"][1, :, :2]))